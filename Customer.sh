@@ -5,9 +5,24 @@
 python3 -m pip install --upgrade pip
 python3 -m venv venv
 . venv/bin/activate
-pip3 install flask flask-wtf wtforms requests
+pip3 install flask flask-wtf wtforms requests aiohttp
 
 # Execute TB desktop app on local machine
+#
+# WORKERS=4 ./Customer.sh serves the app from that many gunicorn worker processes instead of the Flask development
+# server. The workers share cached Dashboard reads, the API rate limit and job status through the SQLite file in
+# MERAKI_SHARED_STORE. Each worker still loads its own network index, dropdown lists and serial index once on first use.
+
+# Dropdown choices are snapshotted under MERAKI_SNAPSHOT_DIR so a restart serves them without waiting on the Dashboard
+export MERAKI_SNAPSHOT_DIR=${MERAKI_SNAPSHOT_DIR:-$PWD/snapshots}
+
+WORKERS=${WORKERS:-1}
+
+if [ "$WORKERS" -gt 1 ]; then
+    pip3 install gunicorn
+    export MERAKI_SHARED_STORE=${MERAKI_SHARED_STORE:-$PWD/meraki-shared.db}
+    exec gunicorn --workers "$WORKERS" --threads 8 --bind 0.0.0.0:5000 add_device_webapp:app
+fi
 
 export FLASK_APP=add_device_webapp.py
-flask run --host=0.0.0.0
\ No newline at end of file
+flask run --host=0.0.0.0
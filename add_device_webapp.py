@@ -15,8 +15,14 @@
 #flask run --host=0.0.0.0
 #
 
-import merakiapi, config
-from flask import Flask, render_template, redirect, flash, Markup
+import csv, functools, json, os, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+import merakiapi, config, bulkupload, validation
+from choices import ChoiceProvider
+from jobs import JobQueue
+from mirror import Mirror
+from sharedstore import SharedStore, SharedResponseCache, SharedRateLimiter
+from flask import Flask, render_template, redirect, flash, Markup, jsonify, abort, request, send_from_directory, Response
 from flask_wtf import FlaskForm
 from wtforms import StringField, SelectField, SubmitField, TextAreaField, validators
 
@@ -24,6 +30,39 @@ from wtforms import StringField, SelectField, SubmitField, TextAreaField, valida
 apikey = config.apikey
 organizationid = config.organizationid
 
+#SERVE REPEATED DASHBOARD READS FROM A SHORT-LIVED CACHE, WRITES INVALIDATE AFFECTED ENTRIES
+#WITH SEVERAL WORKER PROCESSES (SEE Customer.sh) SET MERAKI_SHARED_STORE TO A FILE PATH SO ALL WORKERS SHARE ONE
+#CACHE, ONE RATE LIMIT AND ONE JOB LIST THROUGH A SQLITE DATABASE INSTEAD OF KEEPING THEIR OWN
+store = SharedStore(os.environ['MERAKI_SHARED_STORE']) if os.environ.get('MERAKI_SHARED_STORE') else None
+if store is not None:
+    merakiapi.setclient(merakiapi.DashboardClient(cache=SharedResponseCache(store, ttl=60), ratelimiter=SharedRateLimiter(store)))
+else:
+    merakiapi.setclient(merakiapi.DashboardClient(cache=merakiapi.ResponseCache(ttl=60)))
+
+#RECORD LATENCY, STATUS CODES, RETRIES AND BYTES FOR EVERY DASHBOARD CALL, SERVED AT /metrics
+metrics = merakiapi.Metrics()
+merakiapi.setmetrics(metrics)
+
+#STRUCTURED LOG LINES FOR DASHBOARD CALLS ON STDERR, WRITTEN FROM A BACKGROUND THREAD SO REQUESTS NEVER WAIT ON OUTPUT
+#SET MERAKI_LOG_LEVEL=INFO FOR EVERY CALL RESULT AND RETRY, OR DEBUG FOR EVERY HTTP ATTEMPT WITH ITS DURATION
+merakiapi.enablelogging(os.environ.get('MERAKI_LOG_LEVEL', 'WARNING').upper())
+
+#DROPDOWN CHOICES LOAD ON FIRST FORM USE AND REFRESH IN THE BACKGROUND EVERY 5 MINUTES
+#THE LAST GOOD LISTS ARE SNAPSHOTTED TO MERAKI_SNAPSHOT_DIR, A RESTARTED APP SERVES THEM AT ONCE AND RECONCILES WITH THE
+#DASHBOARD IN THE BACKGROUND, SO THE FORMS STAY USABLE WHILE THE DASHBOARD IS SLOW OR DOWN
+snapshotdir = os.environ.get('MERAKI_SNAPSHOT_DIR', os.path.join(tempfile.gettempdir(), 'meraki-snapshots'))
+networkchoices = ChoiceProvider(lambda: merakiapi.getnetworklist(apikey, organizationid), [None, '* Choose...'], interval=300,
+                                snapshot=os.path.join(snapshotdir, '{}-networks.json'.format(organizationid)))
+templatechoices = ChoiceProvider(lambda: merakiapi.gettemplates(apikey, organizationid), ["", '* No Template'], interval=300,
+                                 snapshot=os.path.join(snapshotdir, '{}-templates.json'.format(organizationid)))
+
+#WITH MERAKI_MIRROR SET TO A FILE PATH, KEEP A LOCAL SQLITE COPY OF THE ORG'S NETWORKS, INVENTORY AND DEVICES, SYNCED IN
+#THE BACKGROUND EVERY 5 MINUTES, AND ANSWER /inventory/<serial> FROM IT WITHOUT CALLING THE DASHBOARD
+#EVERY WORKER STARTS THE SYNC LOOP BUT ONLY THE ONE HOLDING THE MIRROR'S LEASE SYNCS, THE OTHERS JUST READ THE FILE
+inventory = Mirror(os.environ['MERAKI_MIRROR'], apikey, organizationid) if os.environ.get('MERAKI_MIRROR') else None
+if inventory is not None:
+    inventory.start(interval=300)
+
 #BUILD FORM FIELDS AND POPULATE DROPDOWN 
 class AddProvisionForm(FlaskForm):
     #ADDRESS FIELD
@@ -51,20 +90,11 @@ class AddProvisionForm(FlaskForm):
     submitField = SubmitField('Submit')
       
     #NETWORK DROPDOWN
-    networks = merakiapi.getnetworklist(apikey, organizationid)
-    cleannetworks = []
-    for network in networks:
-        for key, value in network.items():
-            if key == 'id':
-                net_id = value
-            elif key == 'name':
-                net_name = value
-            else:
-                continue
-        cleannetworks.append([net_id,net_name])
-    cleannetworks.sort(key=lambda x:x[1])
-    cleannetworks.insert(0, [None, '* Choose...'])
-    networkField = SelectField(u'Network Name', choices = cleannetworks)
+    networkField = SelectField(u'Network Name')
+
+    def __init__(self, *args, **kwargs):
+        super(AddProvisionForm, self).__init__(*args, **kwargs)
+        self.networkField.choices = networkchoices.choices()
 
 class CreateProvisionForm(FlaskForm):
     #ADDRESS FIELD
@@ -74,20 +104,7 @@ class CreateProvisionForm(FlaskForm):
     networkTextField = StringField('New Network Name*', [validators.InputRequired()])
     
     #TEMPLATE DROPDOWN
-    templates = merakiapi.gettemplates(apikey, organizationid)
-    cleantemplates = []
-    for template in templates:
-        for key, value in template.items():
-            if key == 'id':
-                template_id = value
-            elif key == 'name':
-                template_name = value
-            else:
-                continue
-        cleantemplates.append([template_id,template_name])
-    cleantemplates.sort(key=lambda x:x[1])
-    cleantemplates.insert(0, ["", '* No Template'])
-    templateField = SelectField(u'Template to bind to*', choices = cleantemplates)
+    templateField = SelectField(u'Template to bind to*')
 
     #SERIAL NUMBER FIELDS
     serialField1 = StringField('Serial Number 1*:&nbsp;', [validators.InputRequired(), validators.Length(min=14, max=14, message='Invalid format. Must be Q2XX-XXXX-XXXX')])
@@ -110,39 +127,306 @@ class CreateProvisionForm(FlaskForm):
     
     submitField = SubmitField('Submit')
 
+    def __init__(self, *args, **kwargs):
+        super(CreateProvisionForm, self).__init__(*args, **kwargs)
+        self.templateField.choices = templatechoices.choices()
+
+#SERIALS ARE MATCHED IN UPPER CASE LIKE THE ADD AND CREATE FORMS DO, SO LOWER CASE INPUT KEEPS WORKING
+def serialfilter(value):
+    return value.strip().upper() if value else value
+
 class ReplaceDevice(FlaskForm):
-    #NETWORK DROPDOWN
-    networks = merakiapi.getnetworklist(apikey, organizationid)
-    cleannetworks = []
-    for network in networks:
-        for key, value in network.items():
-            if key == 'id':
-                net_id = value
-            elif key == 'name':
-                net_name = value
-            else:
-                continue
-        cleannetworks.append([net_id,net_name])
-    cleannetworks.sort(key=lambda x:x[1])
-    cleannetworks.insert(0, [None, '* Choose...'])
-    networkField = SelectField(u'Network Name', choices = cleannetworks)
+    #NETWORK DROPDOWN, OPTIONAL SINCE THE SERIAL INDEX KNOWS WHICH NETWORK EACH OLD DEVICE IS IN
+    networkField = SelectField(u'Network Name')
     
     #SERIAL NUMBER FIELDS
-    oldMX = StringField('MX to Replace:&nbsp;&nbsp;', [validators.Optional(), validators.Length(min=14, max=14, message='Invalid format. Must be Q2XX-XXXX-XXXX')])
-    newMX = StringField('New MX:&nbsp;&nbsp;', [validators.Optional(), validators.Length(min=14, max=14, message='Invalid format. Must be Q2XX-XXXX-XXXX')])
+    oldMX = StringField('MX to Replace:&nbsp;&nbsp;', [validators.Optional(), validators.Regexp(validation.serialpattern, message='Invalid format. Must be Q2XX-XXXX-XXXX')], filters=[serialfilter])
+    newMX = StringField('New MX:&nbsp;&nbsp;', [validators.Optional(), validators.Regexp(validation.serialpattern, message='Invalid format. Must be Q2XX-XXXX-XXXX')], filters=[serialfilter])
     
-    oldSwitch = StringField('Switch to Replace:&nbsp;&nbsp;', [validators.Optional(), validators.Length(min=14, max=14, message='Invalid format. Must be Q2XX-XXXX-XXXX')])
-    newSwitch = StringField('New Switch:&nbsp;&nbsp;', [validators.Optional(), validators.Length(min=14, max=14, message='Invalid format. Must be Q2XX-XXXX-XXXX')])
+    oldSwitch = StringField('Switch to Replace:&nbsp;&nbsp;', [validators.Optional(), validators.Regexp(validation.serialpattern, message='Invalid format. Must be Q2XX-XXXX-XXXX')], filters=[serialfilter])
+    newSwitch = StringField('New Switch:&nbsp;&nbsp;', [validators.Optional(), validators.Regexp(validation.serialpattern, message='Invalid format. Must be Q2XX-XXXX-XXXX')], filters=[serialfilter])
     
-    oldAP = StringField('AP to Replace:&nbsp;&nbsp;', [validators.Optional(), validators.Length(min=14, max=14, message='Invalid format. Must be Q2XX-XXXX-XXXX')])
-    newAP = StringField('New AP:&nbsp;&nbsp;', [validators.Optional(), validators.Length(min=14, max=14, message='Invalid format. Must be Q2XX-XXXX-XXXX')])
+    oldAP = StringField('AP to Replace:&nbsp;&nbsp;', [validators.Optional(), validators.Regexp(validation.serialpattern, message='Invalid format. Must be Q2XX-XXXX-XXXX')], filters=[serialfilter])
+    newAP = StringField('New AP:&nbsp;&nbsp;', [validators.Optional(), validators.Regexp(validation.serialpattern, message='Invalid format. Must be Q2XX-XXXX-XXXX')], filters=[serialfilter])
     
     submitField = SubmitField('Submit')
 
+    def __init__(self, *args, **kwargs):
+        super(ReplaceDevice, self).__init__(*args, **kwargs)
+        self.networkField.choices = [['', '* Find from serials']] + networkchoices.choices()[1:]
+        warmdeviceindex()
+
+#BUILD THE SERIAL INDEX IN THE BACKGROUND THE FIRST TIME THE REPLACE FORM IS OPENED, SO THE SWAPS SUBMITTED FROM IT FIND
+#EVERY OLD DEVICE'S NETWORK, MODEL, NAME, TAGS AND LOCATION WITHOUT ASKING THE DASHBOARD. WITH A MIRROR THE SWAPS READ IT
+#INSTEAD AND THE IN-MEMORY INDEX IS ONLY BUILT IF THEY NEED IT BEFORE THE MIRROR'S FIRST SYNC
+deviceindexwarming = threading.Lock()
+
+def warmdeviceindex():
+    if inventory is not None or merakiapi.devicesindexed(organizationid) or not deviceindexwarming.acquire(blocking=False):
+        return
+    def build():
+        try:
+            merakiapi.loaddevices(apikey, organizationid)
+        except Exception as e:
+            merakiapi.logger.warning('Could not index devices of organization %s: %s', organizationid, e)
+        finally:
+            deviceindexwarming.release()
+    threading.Thread(target=build, name='deviceindex', daemon=True).start()
+
+#CLAIM SERIALS CONCURRENTLY AND REPORT ONE MESSAGE PER FORM ENTRY AS SOON AS IT FINISHES
+def provisiondevices(networkid, postSerials, postNames, address, report):
+    devices = []
+    for i,serial in enumerate(postSerials):
+        #SKIP EMPTY SERIAL NUMBER TEXT BOXES
+        if serial == '':
+            continue
+        #EASTER EGG
+        elif "ILOVEMERAKI" in serial:
+            report(Markup("<img src='/static/meraki.png' />"))
+            continue
+        devices.append((serial, postNames[i], address))
+    if not devices:
+        return
+    #IF THE NETWORK DETAIL CANNOT BE READ THE MESSAGES NAME THE NETWORK BY ITS ID, THE DEVICES ARE STILL ADDED
+    detail = merakiapi.getnetworkdetail(apikey, networkid)
+    netname = detail['name'] if isinstance(detail, dict) and 'name' in detail else networkid
+
+    def devicemessage(outcome):
+        #API RETURNS EMPTY ON SUCCESS, POPULATE SUCCESS MESSAGE MANUALLY
+        if outcome.status == 'added':
+            report(Markup('Device with serial <strong>{}</strong> successfully added to Network: <strong>{}</strong>'.format(outcome.serial, netname)))
+        #CLAIMED BUT THE NAME AND ADDRESS UPDATE FAILED, THE DEVICE IS IN THE NETWORK WITHOUT THEM
+        elif outcome.status == 'unnamed':
+            report(Markup('Device with serial <strong>{}</strong> added to Network: <strong>{}</strong>, but setting its name and address failed: {}'.format(outcome.serial, netname, outcome.detail)))
+        #404 MESSAGE FOR INVALID SERIAL IS BLANK, POPULATE ERROR MESSAGE MANUALLY
+        elif outcome.status == 'invalid':
+            report(Markup('Invalid serial <strong>{}</strong>'.format(outcome.serial)))
+        else:
+            report(outcome.detail)
+
+    merakiapi.bulkadddevices(apikey, networkid, devices, progress=devicemessage)
+
+#TAG EVERY DASHBOARD CALL A JOB MAKES WITH THE JOB ID IN THE LOGS
+def correlated(work):
+    @functools.wraps(work)
+    def run(job, *args, **kwargs):
+        with merakiapi.correlation(job.id):
+            return work(job, *args, **kwargs)
+    return run
+
+#BACKGROUND WORK FOR EACH FORM, EVERY MESSAGE IS RECORDED ON THE JOB
+@correlated
+def adddevicejob(job, networkid, postSerials, postNames, address):
+    provisiondevices(networkid, postSerials, postNames, address, job.step)
+
+@correlated
+def createnetworkjob(job, postNetwork, postTemplate, postSerials, postNames, address):
+    #CREATE NETWORK AND BIND TO TEMPLATE, THE CREATED NETWORK COMES BACK WITH ITS ID
+    network = merakiapi.addnetworkandbind(apikey, organizationid, postNetwork, "appliance switch wireless", "", "America/Los_Angeles", templateid=postTemplate)
+    if isinstance(network, dict) and 'id' in network:
+        newnetwork = network['id']
+        job.step(Markup("New Network created: <strong>{}</strong> with ID: <strong>{}</strong>".format(postNetwork, newnetwork)))
+        #SHOW THE NEW NETWORK IN DROPDOWNS WITHOUT WAITING FOR THE NEXT REFRESH
+        networkchoices.add(newnetwork, postNetwork)
+    else:
+        #NAME ALREADY TAKEN, PROVISION INTO THE EXISTING NETWORK OF THAT NAME
+        newnetwork = merakiapi.networkidforname(apikey, organizationid, postNetwork)
+        if newnetwork is None:
+            job.step(Markup("Network <strong>{}</strong> could not be created: {}".format(postNetwork, network)))
+            return
+        job.step(Markup("Using existing Network: <strong>{}</strong> with ID: <strong>{}</strong>".format(postNetwork, newnetwork)))
+        network = {}
+    if 'configTemplateId' in network:
+        job.step(Markup("Network: <strong>{}</strong> bound to Template: <strong>{}</strong>".format(postNetwork, postTemplate)))
+
+    #ADD SERIALS TO NETWORK
+    provisiondevices(newnetwork, postSerials, postNames, address, job.step)
+
+#SWAP AN MX OR AP: REMOVE THE OLD ONE, ADD THE NEW ONE AND GIVE IT THE OLD DEVICE'S NAME, TAGS AND LOCATION FROM THE INDEX
+def replacedevice(kind, postNetwork, netname, old, newserial, report):
+    result = merakiapi.removedevfromnet(apikey, postNetwork, old.serial)
+    if result == None:
+        report(Markup('{} with serial <strong>{}</strong> successfully deleted from Network: <strong>{}</strong>'.format(kind, old.serial, netname)))
+    merakiapi.claim(apikey, organizationid, serial=newserial)
+    result = merakiapi.adddevtonet(apikey, postNetwork, newserial)
+    if result == None:
+        merakiapi.updatedevice(apikey, postNetwork, newserial, name=old.name, tags=old.tags, lat=old.lat, lng=old.lng, address=old.address, move='true')
+        report(Markup('{} with serial <strong>{}</strong> successfully added to Network: <strong>{}</strong>'.format(kind, newserial, netname)))
+    #404 MESSAGE FOR INVALID SERIAL IS BLANK, POPULATE ERROR MESSAGE MANUALLY
+    elif result == 'noserial':
+        report(Markup('Invalid serial <strong>{}</strong>'.format(newserial)))
+    else:
+        report(result)
+
+#SWAP A SWITCH: ADD THE NEW ONE, COPY DEVICE SETTINGS AND PORT CONFIGS, THEN REMOVE THE OLD ONE
+def replaceswitch(postNetwork, netname, old, newSwitch, report):
+    #READ THE OLD SWITCH'S PORT TABLE FIRST, IF IT CANNOT BE READ NOTHING IS CHANGED AND THE OLD SWITCH STAYS IN PLACE
+    ports = merakiapi.getswitchports(apikey, old.serial, suppressprint=True)
+    if not isinstance(ports, list):
+        report(Markup('Unable to read the ports of switch <strong>{}</strong>, switch <strong>{}</strong> was not added and the old switch was left in Network: <strong>{}</strong>'.format(old.serial, newSwitch, netname)))
+        return
+    #ADD NEW SWITCH TO NETWORK
+    merakiapi.claim(apikey, organizationid, serial=newSwitch)
+    result = merakiapi.adddevtonet(apikey, postNetwork, newSwitch)
+    if result == None:
+        merakiapi.updatedevice(apikey, postNetwork, newSwitch, name=old.name, tags=old.tags, lat=old.lat, lng=old.lng, address=old.address, move='true')
+        report(Markup('Switch with serial <strong>{}</strong> successfully added to Network: <strong>{}</strong>'.format(newSwitch, netname)))
+        #CLONE L2 PORT CONFIGS, ONE PORT TABLE READ AND PARALLEL PORT UPDATES
+        def portmessage(outcome):
+            report('Port {} {}{}'.format(outcome.number, outcome.status, ': {}'.format(outcome.detail) if outcome.detail else ''))
+        failed = [outcome for outcome in merakiapi.cloneswitchports(apikey, old.serial, newSwitch, progress=portmessage, ports=ports) if outcome.status == 'error']
+        if failed:
+            report(Markup('Switch with serial <strong>{}</strong> added to Network: <strong>{}</strong>, {} ports failed to clone'.format(newSwitch, netname, len(failed))))
+
+    #404 MESSAGE FOR INVALID SERIAL IS BLANK, POPULATE ERROR MESSAGE MANUALLY
+    elif result == 'noserial':
+        report(Markup('Invalid serial <strong>{}</strong>'.format(newSwitch)))
+    else:
+        report(result)
+    #REMOVE OLD SWITCH FROM NETWORK
+    merakiapi.removedevfromnet(apikey, postNetwork, old.serial)
+
+#MODEL FAMILY EACH KIND OF SWAP EXPECTS THE OLD DEVICE TO BE
+swapmodels = {'MX': 'MX', 'Switch': 'MS', 'AP': 'MR'}
+
+#LOOK A SERIAL UP IN THE MIRROR ONCE IT HAS SYNCED, OTHERWISE IN MERAKIAPI'S IN-MEMORY SERIAL INDEX. A RECORD OLDER THAN
+#merakiapi.deviceindexttl SECONDS, OR A MISS, IS READ AGAIN FROM THE DASHBOARD UNLESS refresh IS FALSE, force ALWAYS READS
+def lookupdevice(serial, refresh=True, force=False):
+    if inventory is None or inventory.synced() is None:
+        if force:
+            return merakiapi.refreshdevice(apikey, organizationid, serial)
+        return merakiapi.deviceforserial(apikey, organizationid, serial, refresh=refresh)
+    record = inventory.record(serial)
+    if force or (refresh and (record is None or record.checked < time.time() - merakiapi.deviceindexttl)):
+        record = merakiapi.refreshdevice(apikey, organizationid, serial, record)
+    return record
+
+#CHECK EVERY SWAP BEFORE ANY CHANGE IS MADE, RETURNS THE NETWORK, THE OLD DEVICES' RECORDS BY KIND AND A LIST OF PROBLEMS.
+#WITHOUT A CHOSEN NETWORK THE OLD DEVICES' NETWORK IS USED, THEY MUST ALL BE IN THE SAME ONE. OLD DEVICES ARE READ AGAIN IF
+#THEIR RECORDS ARE STALE SO THEIR SETTINGS ARE CURRENT, AND A SWAP IS ONLY REJECTED AFTER EVERY SERIAL IN IT HAS BEEN READ
+#AGAIN, SINCE ANOTHER WORKER OR A DASHBOARD USER MAY HAVE MOVED DEVICES SINCE THEY WERE INDEXED
+def checkswaps(postNetwork, pairs):
+    problems = []
+    for kind, oldserial, newserial in pairs:
+        if not newserial:
+            problems.append('No new serial given for the {} swap'.format(kind))
+            continue
+        messages = [(serial, validation.checkserial(serial)) for serial in (oldserial, newserial)]
+        if any(message for serial, message in messages):
+            problems.extend(Markup('<strong>{}</strong>: {}'.format(serial, message)) for serial, message in messages if message)
+        elif oldserial == newserial:
+            problems.append(Markup('<strong>{}</strong> cannot replace itself'.format(oldserial)))
+    if problems:
+        return postNetwork, {}, problems
+    network, records, problems = checkrecords(postNetwork, pairs, lambda serial, old: lookupdevice(serial, refresh=old))
+    if problems:
+        network, records, problems = checkrecords(postNetwork, pairs, lambda serial, old: lookupdevice(serial, force=True))
+    return network, records, problems
+
+def checkrecords(postNetwork, pairs, lookup):
+    problems = []
+    records = {}
+    for kind, oldserial, newserial in pairs:
+        old = lookup(oldserial, True)
+        new = lookup(newserial, False)
+        if old is None or old.networkid is None:
+            problems.append(Markup('{} <strong>{}</strong> is not in any network of this organization'.format(kind, oldserial)))
+        elif old.model and not old.model.startswith(swapmodels[kind]):
+            problems.append(Markup('<strong>{}</strong> is a {}, not an {} model'.format(oldserial, old.model, swapmodels[kind])))
+        else:
+            records[kind] = old
+        if new is not None and new.networkid is not None and (old is None or new.networkid != old.networkid):
+            problems.append(Markup('New {} <strong>{}</strong> is already in another network'.format(kind, newserial)))
+    networks = set(record.networkid for record in records.values())
+    if postNetwork and networks - {postNetwork}:
+        problems.append('The devices to replace are not all in the chosen network')
+    elif len(networks) > 1:
+        problems.append('The devices to replace are in different networks, replace them one network at a time')
+    return (postNetwork or next(iter(networks), None)), records, problems
+
+#THE MX, SWITCH AND AP SWAPS ARE INDEPENDENT, RUN THEM AT THE SAME TIME AND KEEP EACH DEVICE'S MESSAGES APART
+@correlated
+def replacedevicejob(job, postNetwork, oldMX, newMX, oldSwitch, newSwitch, oldAP, newAP):
+    pairs = [(kind, old, new) for kind, old, new in (('MX', oldMX, newMX), ('Switch', oldSwitch, newSwitch), ('AP', oldAP, newAP)) if old != '']
+    if not pairs:
+        return {}
+    postNetwork, records, problems = checkswaps(postNetwork, pairs)
+    if problems:
+        for problem in problems:
+            job.step(problem)
+        return {'invalid': [str(problem) for problem in problems]}
+    netname = merakiapi.networknameforid(apikey, organizationid, postNetwork) or postNetwork
+    swaps = []
+    for kind, old, new in pairs:
+        if kind == 'Switch':
+            swaps.append((kind, replaceswitch, (postNetwork, netname, records[kind], new)))
+        else:
+            swaps.append((kind, replacedevice, (kind, postNetwork, netname, records[kind], new)))
+
+    results = {}
+    def run(kind, swap, args):
+        messages = []
+        def report(message):
+            messages.append(str(message))
+            job.step(message)
+        results[kind] = {'state': 'done', 'messages': messages}
+        try:
+            swap(*(args + (report,)))
+        except Exception as e:
+            results[kind]['state'] = 'failed'
+            report('{} replacement failed: {}'.format(kind, e))
+
+    with ThreadPoolExecutor(max_workers=len(swaps)) as pool:
+        for future in [merakiapi.contextsubmit(pool, run, kind, swap, args) for kind, swap, args in swaps]:
+            future.result()
+    #HAVE THE MIRROR FETCH THE NETWORK'S DEVICES AGAIN ON ITS NEXT SYNC
+    if inventory is not None:
+        inventory.invalidate(postNetwork)
+    return results
+
+#PROVISION EVERY ROW OF AN UPLOADED FILE, PER-ROW RESULTS ARE WRITTEN TO A CSV AS THEY COMPLETE
+@correlated
+def uploadjob(job, path, fmt):
+    provisioner = bulkupload.BulkProvisioner(apikey, organizationid)
+    processed = 0
+    try:
+        with open(path, 'rb') as rows, open(resultpath(job.id), 'w', newline='') as results:
+            writer = csv.DictWriter(results, fieldnames=bulkupload.resultfields)
+            writer.writeheader()
+
+            def report(result):
+                nonlocal processed
+                writer.writerow(result)
+                processed += 1
+                if processed % 100 == 0:
+                    results.flush()
+                    job.step('{} rows processed'.format(processed))
+
+            counts = provisioner.run(bulkupload.readrows(rows, fmt), report)
+    finally:
+        os.remove(path)
+    job.step('{} rows processed: {}'.format(processed, ', '.join('{} {}'.format(count, status) for status, count in sorted(counts.items()))))
+    #PICK UP ANY NETWORKS THE UPLOAD CREATED
+    networkchoices.refresh()
+    return counts
+
+#UPLOADS AND THEIR RESULT FILES LIVE HERE, RESULTS ARE NAMED AFTER THE JOB
+uploaddir = os.path.join(tempfile.gettempdir(), 'meraki-uploads')
+
+def resultpath(jobid):
+    return os.path.join(uploaddir, '{}.results.csv'.format(jobid))
+
+#LINK TO A QUEUED JOB'S STATUS FOR THE SUBMIT PAGE
+def queuedmessage(job):
+    return Markup('{} job <strong>{}</strong> queued, follow its progress at <a href="/jobs/{}">/jobs/{}</a> or live from /jobs/{}/events'.format(job.title, job.id, job.id, job.id, job.id))
+
 #MAIN PROGRAM
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'Ikarem123'
 
+#PROVISIONING WORK RUNS ON A BACKGROUND POOL, FORM POSTS RETURN AS SOON AS IT IS QUEUED
+jobqueue = JobQueue(workers=4, store=store)
+
 @app.route('/', methods=['GET', 'POST'])
 def homepage():
     return render_template('CustomerFE.html')
@@ -151,12 +435,10 @@ def homepage():
 def provision():
     form = AddProvisionForm()
     if form.validate_on_submit():
-        message = []
         postSerials = []
         postNames = []
         
         postNetwork = form.networkField.data
-        print(postNetwork)
         
         #BUILD ARRAY OF SERIAL NUMBERS FROM FORM
         postSerials.append(form.serialField1.data)
@@ -179,28 +461,9 @@ def provision():
         postNames.append(form.nameField8.data)
         #print(postSerials)
         
-        for i,serial in enumerate(postSerials):
-            #SKIP EMPTY SERIAL NUMBER TEXT BOXES
-            if serial is '':
-                continue
-            #EASTER EGG
-            elif "ILOVEMERAKI" in serial:
-                message = Markup("<img src='/static/meraki.png' />")
-            else:
-                result = merakiapi.adddevtonet(apikey, postNetwork, serial)
-                if result == None:
-                    #SET ADDRESS AND NAME
-                    merakiapi.updatedevice(apikey, postNetwork, serial, name=postNames[i], address=form.addressField.data, move='true')
-                    #API RETURNS EMPTY ON SUCCESS, POPULATE SUCCESS MESSAGE MANUALLY
-                    netname = merakiapi.getnetworkdetail(apikey, postNetwork)
-                    message = Markup('Device with serial <strong>{}</strong> successfully added to Network: <strong>{}</strong>'.format(serial, netname['name']))
-                #404 MESSAGE FOR INVALID SERIAL IS BLANK, POPULATE ERROR MESSAGE MANUALLY
-                elif result == 'noserial':
-                    message = 'Invalid serial {}'.format(serial)
-                else:
-                    message = result
-            #SEND MESSAGE TO SUBMIT PAGE
-            flash(message)
+        #ADD SERIALS TO NETWORK IN THE BACKGROUND
+        job = jobqueue.submit('AddDevice', adddevicejob, postNetwork, postSerials, postNames, form.addressField.data)
+        flash(queuedmessage(job))
         return redirect('/submit')
     return render_template('AddDevice.html', title='Meraki Device Provisioning', form=form)
     
@@ -208,7 +471,6 @@ def provision():
 def provisionNetwork():
     form = CreateProvisionForm()
     if form.validate_on_submit():
-        message = []
         postSerials = []
         postNames = []
         
@@ -237,47 +499,9 @@ def provisionNetwork():
         postNames.append(form.nameField7.data)
         postNames.append(form.nameField8.data)
 
-        #CREATE NETWORK AND BIND TO TEMPLATE
-        result = merakiapi.addnetwork(apikey, organizationid, postNetwork, "appliance switch wireless", "", "America/Los_Angeles")
-        
-        #GET NEW NETWORK ID
-        networks = merakiapi.getnetworklist(apikey, organizationid)
-        for network in networks:
-            if network['name'] == postNetwork:
-                newnetwork = network['id']
-                break;
-        message = Markup("New Network created: <strong>{}</strong> with ID: <strong>{}</strong>".format(postNetwork, newnetwork))
-        flash(message)
-        
-        #BIND TO TEMPLATE
-        if form.templateField.data is not "":
-            bindresult = merakiapi.bindtotemplate(apikey, newnetwork, postTemplate)
-            message = Markup("Network: <strong>{}</strong> bound to Template: <strong>{}</strong>".format(postNetwork, postTemplate))
-            flash(message)
-
-        #ADD SERIALS TO NETWORK
-        for i,serial in enumerate(postSerials):
-            #SKIP EMPTY SERIAL NUMBER TEXT BOXES
-            if serial is '':
-                continue
-            #EASTER EGG
-            elif "ILOVEMERAKI" in serial:
-                message = Markup("<img src='/static/meraki.png' />")
-            else:
-                result = merakiapi.adddevtonet(apikey, newnetwork, serial)
-                if result == None:
-                    #SET ADDRESS AND NAME
-                    merakiapi.updatedevice(apikey, newnetwork, serial, name=postNames[i], address=form.addressField.data, move='true')
-                    #API RETURNS EMPTY ON SUCCESS, POPULATE SUCCESS MESSAGE MANUALLY
-                    netname = merakiapi.getnetworkdetail(apikey, newnetwork)
-                    message = Markup('Device with serial <strong>{}</strong> successfully added to Network: <strong>{}</strong>'.format(serial, netname['name']))
-                #404 MESSAGE FOR INVALID SERIAL IS BLANK, POPULATE ERROR MESSAGE MANUALLY
-                elif result == 'noserial':
-                    message = Markup('Invalid serial <strong>{}</strong>'.format(serial))
-                else:
-                    message = result
-            #SEND MESSAGE TO SUBMIT PAGE
-            flash(message)
+        #CREATE NETWORK, BIND TO TEMPLATE AND ADD SERIALS IN THE BACKGROUND
+        job = jobqueue.submit('CreateNetwork', createnetworkjob, postNetwork, postTemplate, postSerials, postNames, form.addressField.data)
+        flash(queuedmessage(job))
         return redirect('/submit')
     return render_template('CreateNetwork.html', title='Meraki Device Provisioning', form=form)
 
@@ -285,98 +509,101 @@ def provisionNetwork():
 def replaceForm():
     form = ReplaceDevice()
     if form.validate_on_submit():
-        message = []
         
         postNetwork = form.networkField.data
-        netname = merakiapi.getnetworkdetail(apikey, postNetwork)
         oldMX = form.oldMX.data
         newMX = form.newMX.data
         oldSwitch = form.oldSwitch.data
         newSwitch = form.newSwitch.data
         oldAP = form.oldAP.data
         newAP = form.newAP.data
-        
-        if oldMX is not '':
-            oldconfig = merakiapi.getdevicedetail(apikey, postNetwork, oldMX)
-            merakiapi.updatedevice(apikey, postNetwork, newMX, name=oldconfig['name'], tags=oldconfig['tags'], lat=oldconfig['lat'],
-                 lng=oldconfig['lng'], address=oldconfig['address'], move='true')
-            result = merakiapi.removedevfromnet(apikey, postNetwork, oldMX)
-            if result == None:
-                message = Markup('MX with serial <strong>{}</strong> successfully deleted from Network: <strong>{}</strong>'.format(oldMX, netname['name']))
-            merakiapi.claim(apikey, organizationid, serial=newMX)
-            result = merakiapi.adddevtonet(apikey, postNetwork, newMX)
-            if result == None:
-                message = Markup('MX with serial <strong>{}</strong> successfully added to Network: <strong>{}</strong>'.format(newMX, netname['name']))
-        
-        if oldSwitch is not '':
-            #ADD NEW SWITCH TO NETWORK
-            merakiapi.claim(apikey, organizationid, serial=newSwitch)
-            result = merakiapi.adddevtonet(apikey, postNetwork, newSwitch)
-            oldconfig = merakiapi.getdevicedetail(apikey, postNetwork, oldSwitch)
-            merakiapi.updatedevice(apikey, postNetwork, newSwitch, name=oldconfig['name'], tags=oldconfig['tags'], lat=oldconfig['lat'], lng=oldconfig['lng'], address=oldconfig['address'], move='true')
-            if result == None:
-                message = Markup('Switch with serial <strong>{}</strong> successfully added to Network: <strong>{}</strong>'.format(newSwitch, netname['name']))
-                #CLONE L2 PORT CONFIGS
-                if '24' in oldconfig['model']:
-                    numports = 30
-                elif '48' in oldconfig['model']:
-                    numports = 54
-                elif '16' in oldconfig['model']:
-                    numports = 22
-                elif '32' in oldconfig['model']:
-                    numports = 38
-                elif '8' in oldconfig['model']:
-                    numports = 10
-                for port in range(1, numports):
-                    config = merakiapi.getswitchportdetail(apikey, oldSwitch, port)
-                    print(config)
-                    # Clone corresponding new switch
-                    # Tags needed to be input as a list
-                    #if config['tags'] is not '':
-                    #    tags = config['tags'].split()
-                    #else:
-                    tags = []
-
-                    # Access type port
-                    if config['type'] == 'access':
-                        merakiapi.updateswitchport(apikey, newSwitch, port,
-                            name=config['name'], tags=tags, enabled=config['enabled'],
-                            porttype=config['type'], vlan=config['vlan'], voicevlan=config['voiceVlan'],
-                            poe='true', isolation=config['isolationEnabled'], rstp=config['rstpEnabled'],
-                            stpguard=config['stpGuard'], accesspolicynum=config['accessPolicyNumber'])
-                    # Trunk type port
-                    elif config['type'] == 'trunk':
-                        merakiapi.updateswitchport(apikey, newSwitch, port,
-                            name=config['name'], tags=tags, enabled=config['enabled'],
-                            porttype=config['type'], vlan=config['vlan'], allowedvlans=config['allowedVlans'],
-                            poe='true', isolation=config['isolationEnabled'], rstp=config['rstpEnabled'],
-                            stpguard=config['stpGuard'])
-
-            #404 MESSAGE FOR INVALID SERIAL IS BLANK, POPULATE ERROR MESSAGE MANUALLY
-            elif result == 'noserial':
-                message = Markup('Invalid serial <strong>{}</strong>'.format(serial))
-            else:
-                message = result
-            #REMOVE OLD SWITCH FROM NETWORK
-            merakiapi.removedevfromnet(apikey, postNetwork, oldSwitch)
-        
-        if oldAP is not '':
-            oldconfig = merakiapi.getdevicedetail(apikey, postNetwork, oldAP)
-            merakiapi.updatedevice(apikey, postNetwork, newAP, name=oldconfig['name'], tags=oldconfig['tags'], lat=oldconfig['lat'],
-                 lng=oldconfig['lng'], address=oldconfig['address'], move='true')
-            result = merakiapi.removedevfromnet(apikey, postNetwork, oldAP)
-            if result == None:
-                message = Markup('AP with serial <strong>{}</strong> successfully deleted from Network: <strong>{}</strong>'.format(oldMX, netname['name']))
-            merakiapi.claim(apikey, organizationid, serial=newAP)
-            result = merakiapi.adddevtonet(apikey, postNetwork, newAP)
-            if result == None:
-                message = Markup('AP with serial <strong>{}</strong> successfully added to Network: <strong>{}</strong>'.format(newMX, netname['name']))
-
-        #SEND MESSAGE TO SUBMIT PAGE
-        flash(message)
+
+        #SWAP DEVICES IN THE BACKGROUND, AN EMPTY NETWORK IS LOOKED UP FROM THE OLD SERIALS
+        job = jobqueue.submit('ReplaceDevice', replacedevicejob, postNetwork or None, oldMX, newMX, oldSwitch, newSwitch, oldAP, newAP)
+        flash(queuedmessage(job))
         return redirect('/submit')
     return render_template('ReplaceDevice.html', title='Meraki Device Provisioning', form=form)
 
 @app.route('/submit')
 def submit():
-   return render_template('submit.html')
\ No newline at end of file
+   return render_template('submit.html')
+
+@app.route('/jobs')
+def joblist():
+    return jsonify([job.status() for job in jobqueue.recent()])
+
+@app.route('/jobs/<jobid>')
+def jobstatus(jobid):
+    job = jobqueue.get(jobid)
+    if job is None:
+        abort(404)
+    return jsonify(job.status())
+
+#LIVE PROGRESS AS SERVER-SENT EVENTS: ONE 'step' EVENT PER JOB STEP, THEN AN 'end' EVENT WITH THE OUTCOME
+#new EventSource('/jobs/<id>/events') RESUMES FROM Last-Event-ID AFTER A DROPPED CONNECTION
+@app.route('/jobs/<jobid>/events')
+def jobevents(jobid):
+    job = jobqueue.get(jobid)
+    if job is None:
+        abort(404)
+    try:
+        sent = int(request.headers.get('Last-Event-ID', -1)) + 1
+    except ValueError:
+        sent = 0
+
+    def stream(sent):
+        while True:
+            steps, finished = job.updates(sent, timeout=15)
+            for step in steps:
+                yield 'id: {}\nevent: step\ndata: {}\n\n'.format(sent, json.dumps(step))
+                sent += 1
+            if finished:
+                status = job.status()
+                yield 'event: end\ndata: {}\n\n'.format(json.dumps({'state': status['state'], 'result': status['result'], 'error': status['error']}))
+                return
+            if not steps:
+                #KEEP PROXIES FROM CLOSING AN IDLE STREAM
+                yield ': keepalive\n\n'
+
+    return Response(stream(sent), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs/<jobid>/results')
+def jobresults(jobid):
+    if jobqueue.get(jobid) is None or not os.path.exists(resultpath(jobid)):
+        abort(404)
+    return send_from_directory(uploaddir, os.path.basename(resultpath(jobid)), mimetype='text/csv', as_attachment=True)
+
+#BULK PROVISIONING: POST A CSV OR NDJSON FILE AS THE 'file' FORM FIELD
+#curl -F file=@sites.csv http://localhost:5000/upload
+@app.route('/upload', methods=['POST'])
+def upload():
+    upload = request.files.get('file')
+    if upload is None or upload.filename == '':
+        return jsonify({'error': "No file uploaded, send it as the 'file' form field"}), 400
+    fmt = request.form.get('format') or bulkupload.formatfor(upload.filename)
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': "Format must be 'csv' or 'ndjson'"}), 400
+
+    #SAVE THE UPLOAD SO THE JOB CAN STREAM IT AFTER THIS REQUEST RETURNS
+    os.makedirs(uploaddir, exist_ok=True)
+    handle, path = tempfile.mkstemp(suffix='.' + fmt, dir=uploaddir)
+    with os.fdopen(handle, 'wb') as saved:
+        upload.save(saved)
+
+    job = jobqueue.submit('Upload', uploadjob, path, fmt)
+    return jsonify({'id': job.id, 'status': '/jobs/{}'.format(job.id), 'results': '/jobs/{}/results'.format(job.id)}), 202
+
+#WHICH NETWORK IS A SERIAL IN AND WHAT IS IT, SERVED FROM THE LOCAL MIRROR
+@app.route('/inventory/<serial>')
+def inventorylookup(serial):
+    if inventory is None:
+        return jsonify({'error': 'Inventory mirror is off, set MERAKI_MIRROR to enable it'}), 404
+    device = inventory.device(serial.upper())
+    if device is None:
+        return jsonify({'error': 'Serial {} is not in the organization inventory'.format(serial)}), 404
+    return jsonify(device)
+
+#PROMETHEUS SCRAPE TARGET, COUNTS ARE PER WORKER PROCESS
+@app.route('/metrics')
+def metricsroute():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
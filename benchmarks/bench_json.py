@@ -0,0 +1,80 @@
+#
+# Micro-benchmark for Dashboard response decoding on large organization inventory payloads
+#
+# Compares the previous return handler path, which validated a body with one json.loads and then parsed it again,
+# against merakiapi.decoderesponse with every JSON backend installed on this machine.
+#
+#   python benchmarks/bench_json.py [devices] [repeat]
+#
+
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import merakiapi
+
+
+def inventorypayload(devices):
+    models = ['MX68', 'MS220-8P', 'MS225-48LP', 'MR33', 'MR42', 'MV12W']
+    inventory = []
+    for i in range(devices):
+        inventory.append({
+            'mac': '00:18:0a:{0:02x}:{1:02x}:{2:02x}'.format((i >> 16) & 255, (i >> 8) & 255, i & 255),
+            'serial': 'Q2XX-{0:04d}-{1:04d}'.format(i // 10000, i % 10000),
+            'networkId': 'N_{0}'.format(646829496481090000 + i // 20),
+            'model': models[i % len(models)],
+            'claimedAt': '2019-05-20T17:30:{0:02d}.000000Z'.format(i % 60),
+            'publicIp': '203.0.113.{0}'.format(i % 254 + 1),
+            'name': 'Store {0} device {1}'.format(i // 20, i % 20)
+        })
+    return json.dumps(inventory)
+
+
+def doubleparse(text):
+    #
+    # Decode path used before decoderesponse: __isjson parsed the body, then __returnhandler parsed it again
+    #
+    try:
+        json.loads(text)
+    except ValueError:
+        return None
+    return json.loads(text)
+
+
+def backends():
+    found = [('json', json.loads, json.dumps)]
+    try:
+        import ujson
+        found.append(('ujson', ujson.loads, ujson.dumps))
+    except ImportError:
+        pass
+    try:
+        import orjson
+        found.append(('orjson', orjson.loads, lambda obj: orjson.dumps(obj).decode('utf-8')))
+    except ImportError:
+        pass
+    return found
+
+
+def main():
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    text = inventorypayload(devices)
+    print('Inventory payload: {0} devices, {1:.1f} MB, best of {2} runs\n'.format(
+        devices, len(text) / 1e6, repeat))
+
+    baseline = min(timeit.repeat(lambda: doubleparse(text), number=1, repeat=repeat))
+    print('{0:<28}{1:>10.2f} ms{2:>10}'.format('double parse (json)', baseline * 1000, '1.00x'))
+
+    for name, loads, dumps in backends():
+        merakiapi.setjsonbackend(loads, dumps, name)
+        best = min(timeit.repeat(lambda: merakiapi.decoderesponse(200, text), number=1, repeat=repeat))
+        print('{0:<28}{1:>10.2f} ms{2:>9.2f}x'.format('decoderesponse ({0})'.format(name), best * 1000,
+                                                      baseline / best))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#
+# Benchmark for the local SQLite mirror of organization inventory, networks and devices
+#
+# Starts mockdashboard in-process and reports the Dashboard calls and time taken by the first sync, by a sync with
+# nothing changed and by a sync after a few devices were claimed into networks, then compares lookups served by the
+# mirror with the Dashboard round trips they replace. Runs entirely offline.
+#
+#   python benchmarks/bench_mirror.py --networks 200 --latency 0.02
+#
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import merakiapi
+import mirror
+import mockdashboard
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline inventory mirror benchmark')
+    parser.add_argument('--networks', type=int, default=200)
+    parser.add_argument('--spares', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.02, help='mock Dashboard latency per call in seconds')
+    parser.add_argument('--lookups', type=int, default=20000)
+    args = parser.parse_args()
+
+    mock = mockdashboard.MockDashboard(latency=args.latency, seed=1)
+    mock.seed(networks=args.networks, spares=args.spares)
+    server = mockdashboard.start(mock)
+    merakiapi.base_url = server.base_url
+    merakiapi.getclient().ratelimiter = merakiapi.RateLimiter(rate=1000)
+    apikey = 'mock-api-key'
+    directory = tempfile.mkdtemp(prefix='bench-mirror-')
+    inventory = mirror.Mirror(os.path.join(directory, 'mirror.db'), apikey, mockdashboard.orgid)
+
+    def timedsync(name):
+        mock.resetstats()
+        result = inventory.sync()
+        print('{0:<22}{1:>8}{2:>10.3f} s{3:>11}{4:>11}{5:>11}'.format(
+            name, mock.stats()['calls'], result['seconds'], result['refreshed'],
+            sum(result['inventory'].values()), sum(result['devices'].values())))
+
+    print('{0} networks, {1} inventory serials, {2:.0f} ms mock latency\n'.format(
+        args.networks, len(mock.devices), args.latency * 1000))
+    print('{0:<22}{1:>8}{2:>12}{3:>11}{4:>11}{5:>11}'.format(
+        'sync', 'calls', 'time', 'networks', 'inventory', 'devices'))
+    timedsync('first')
+    timedsync('nothing changed')
+    networks = list(mock.networks)
+    spares = [s for s, d in mock.devices.items() if d['networkId'] is None]
+    with mock.lock:
+        for i, serial in enumerate(spares[:5]):
+            mock.devices[serial]['networkId'] = networks[i * 7 % len(networks)]
+    timedsync('5 devices claimed')
+
+    serials = [s for s, d in mock.devices.items() if d['networkId'] is not None]
+    serial = serials[len(serials) // 2]
+    networkid = mock.devices[serial]['networkId']
+    best = min(timeit.repeat(lambda: inventory.networkforserial(serial), number=args.lookups, repeat=3))
+    print('\n{0:<34}{1:>12.1f} us'.format('mirror networkforserial', best / args.lookups * 1e6))
+    best = min(timeit.repeat(lambda: inventory.device(serial), number=args.lookups, repeat=3))
+    print('{0:<34}{1:>12.1f} us'.format('mirror device', best / args.lookups * 1e6))
+    started = time.monotonic()
+    merakiapi.getdevicedetail(apikey, networkid, serial, suppressprint=True)
+    print('{0:<34}{1:>12.1f} us'.format('Dashboard getdevicedetail', (time.monotonic() - started) * 1e6))
+    started = time.monotonic()
+    next(d for d in merakiapi.iterorginventory(apikey, mockdashboard.orgid) if d['serial'] == serial)
+    print('{0:<34}{1:>12.1f} us'.format('Dashboard inventory scan', (time.monotonic() - started) * 1e6))
+
+    inventory.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#
+# Micro-benchmark for validating a large bulk import
+#
+# Compares the previous per-value validators, which scanned the timezone list linearly and compiled their patterns on
+# every call, against the validation module's per-value checks and its one-pass validaterows batch API.
+#
+#   python benchmarks/bench_validation.py [rows] [repeat]
+#
+
+import os
+import random
+import re
+import sys
+import timeit
+from ipaddress import ip_address
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import validation
+
+fields = {'serial': 'serial', 'tz': 'tz', 'subnet': 'subnet', 'ip': 'ip', 'email': 'email'}
+
+
+def importrows(rows, seed=1):
+    #
+    # One store per row: a serial, its timezone, LAN subnet, WAN IP and contact, about 1% of each field invalid
+    #
+    rand = random.Random(seed)
+    zones = [zone for zone in validation.tzlist if zone.startswith(('America/', 'US/', 'Europe/'))]
+    bad = {
+        'serial': 'Q2XX-000', 'tz': 'Mars/Olympus_Mons', 'subnet': '10.0.0.0/31', 'ip': '300.1.1.1',
+        'email': 'nobody.example.com'
+    }
+    result = []
+    for i in range(rows):
+        row = {
+            'serial': 'Q2{0}-{1:04d}-{2:04d}'.format(rand.choice(['MX', 'MS', 'MR']), i // 10000, i % 10000),
+            'tz': rand.choice(zones),
+            'subnet': '10.{0}.{1}.0/24'.format((i >> 8) & 255, i & 255),
+            'ip': '198.51.{0}.{1}'.format((i >> 8) & 255, i % 254 + 1),
+            'email': 'store{0}@example.com'.format(i)
+        }
+        for field in fields:
+            if rand.random() < 0.01:
+                row[field] = bad[field]
+        result.append(row)
+    return result
+
+
+def legacytz(tz):
+    validtz = False
+    for zone in validation.tzlist:
+        if validtz is False and format(str(tz)) == zone:
+            validtz = True
+            break
+        else:
+            validtz = False
+    if validtz is False:
+        raise ValueError('Please enter a valid tz value')
+
+
+def legacysubnet(subnetip):
+    if not re.match(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}[/]\d{1,2}$", subnetip):
+        raise ValueError('Invalid Subnet IP Address {0}'.format(str(subnetip)))
+    ip, netmask = str.split(subnetip, '/')
+    if int(netmask) < 1 or int(netmask) > 30:
+        raise ValueError('Invalid Subnet Mask Length {0}'.format(str(subnetip)))
+    ip_address(ip)
+
+
+def legacyip(ip):
+    ip_address(ip)
+
+
+def legacyemail(emailaddress):
+    if not re.match(r"[^@]+@[^@]+\.[^@]+", emailaddress):
+        raise ValueError('Incorrect E-mail Address Format Entered')
+
+
+def legacyserial(serial):
+    if not re.match(r'^Q2[A-Z0-9]{2}-[A-Z0-9]{4}-[A-Z0-9]{4}$', serial):
+        raise ValueError('Invalid serial format')
+
+
+def pervalue(rows, checks):
+    #
+    # Check each field of each row with its own call, collecting every error like the batch API does
+    #
+    problems = 0
+    for row in rows:
+        for field, check in checks:
+            try:
+                check(row[field])
+            except ValueError:
+                problems += 1
+    return problems
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    data = importrows(rows)
+    legacy = [('serial', legacyserial), ('tz', legacytz), ('subnet', legacysubnet), ('ip', legacyip),
+              ('email', legacyemail)]
+    current = [(field, validation.checks[kind]) for field, kind in fields.items()]
+
+    expected = pervalue(data, legacy)
+    found = len(validation.validaterows(data, fields))
+    if found != expected:
+        raise RuntimeError('validaterows found {0} problems, legacy validators found {1}'.format(found, expected))
+    print('Bulk import: {0} rows, {1} fields each, {2} invalid values, best of {3} runs\n'.format(
+        rows, len(fields), expected, repeat))
+
+    baseline = min(timeit.repeat(lambda: pervalue(data, legacy), number=1, repeat=repeat))
+    print('{0:<28}{1:>10.1f} ms{2:>12.0f} rows/s{3:>10}'.format('legacy per value', baseline * 1000,
+                                                                rows / baseline, '1.00x'))
+    for name, run in [('validation per value', lambda: pervalue(data, current)),
+                      ('validaterows', lambda: validation.validaterows(data, fields))]:
+        best = min(timeit.repeat(run, number=1, repeat=repeat))
+        print('{0:<28}{1:>10.1f} ms{2:>12.0f} rows/s{3:>9.2f}x'.format(name, best * 1000, rows / best,
+                                                                       baseline / best))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+#
+# End-to-end benchmark of the webapp's AddDevice, CreateNetwork and ReplaceDevice workflows
+#
+# Starts mockdashboard in-process, imports add_device_webapp against it and submits each form through Flask's test
+# client, reporting Dashboard API calls, wall time and throughput per workflow. Each run is timed until its background
+# job finishes, post s is how long the form POST itself took and max is the most calls any single run sent. Runs
+# entirely offline. With --budget it exits with an error if a run sends more calls than its workflow's budget, which
+# catches a call creeping back into a per-device loop.
+#
+#   python benchmarks/bench_workflows.py --iterations 5 --latency 0.02
+#   python benchmarks/bench_workflows.py --iterations 2 --budget --profile
+#
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import merakiapi
+import mockdashboard
+
+
+#
+# Most Dashboard calls a single run of each workflow may send with --budget. AddDevice is one network lookup plus a
+# claim and an update per device for eight devices, CreateNetwork adds the create and bind calls, and ReplaceDevice
+# swaps an MX, a 24 port switch and an AP, reading the old devices' settings from the serial index. Building that index
+# is not counted in the ReplaceDevice budget: it happens once per process and is measured and printed on its own.
+# Retries are not counted. Lower these when a change saves calls, never raise them to make a regression pass.
+#
+budgets = {
+    'AddDevice': 17,
+    'CreateNetwork': 19,
+    'ReplaceDevice': 42
+}
+
+
+class Workbench(object):
+    def __init__(self, args):
+        self.args = args
+        self.mock = mockdashboard.MockDashboard(latency=args.latency, jitter=args.jitter, ratelimit=args.ratelimit,
+                                                errorrate=args.errorrate, seed=1)
+        self.mock.seed(networks=args.iterations + 1, spares=args.iterations * 16)
+        self.server = mockdashboard.start(self.mock)
+        merakiapi.base_url = self.server.base_url
+        config.apikey = 'mock-api-key'
+        config.organizationid = mockdashboard.orgid
+
+        #
+        # Importing the webapp should not touch the Dashboard, dropdowns load on first form use. Snapshots go to a
+        # fresh directory unless MERAKI_SNAPSHOT_DIR is set, so the first form waits on the mock Dashboard unless a
+        # snapshot from an earlier run is pointed at.
+        #
+        os.environ.setdefault('MERAKI_SNAPSHOT_DIR', tempfile.mkdtemp(prefix='bench-snapshots-'))
+        started = time.monotonic()
+        import add_device_webapp
+        self.startup = time.monotonic() - started
+        self.startupcalls = self.mock.stats()['calls']
+        started = time.monotonic()
+        add_device_webapp.networkchoices.choices()
+        add_device_webapp.templatechoices.choices()
+        self.firstform = time.monotonic() - started
+
+        if args.clientrate:
+            merakiapi.getclient().ratelimiter = merakiapi.RateLimiter(rate=args.clientrate)
+        if args.loglevel:
+            #
+            # Format every record at loglevel through the queued handler and discard it, to measure logging overhead
+            #
+            self.devnull = open(os.devnull, 'w')
+            merakiapi.enablelogging(args.loglevel.upper(), handler=logging.StreamHandler(self.devnull))
+        else:
+            #
+            # The webapp logs failed calls to stderr, keep them out of the results
+            #
+            merakiapi.disablelogging()
+        self.webapp = add_device_webapp
+        self.webapp.app.config['WTF_CSRF_ENABLED'] = False
+        self.client = self.webapp.app.test_client()
+        self.networks = list(self.mock.networks.values())
+        self.templates = list(self.mock.templates.values())
+        self.spares = [s for s, d in self.mock.devices.items() if d['networkId'] is None]
+        self.profiles = []
+
+    def take(self, count):
+        serials, self.spares = self.spares[:count], self.spares[count:]
+        return serials
+
+    def adddevice(self, i):
+        form = {'networkField': self.networks[i]['id'], 'addressField': '500 Terry Francois St, San Francisco'}
+        for n, serial in enumerate(self.take(8)):
+            form['serialField{0}'.format(n + 1)] = serial
+            form['nameField{0}'.format(n + 1)] = 'AP {0}'.format(n + 1)
+        return form, '/AddDevice', 8
+
+    def createnetwork(self, i):
+        form = {'networkTextField': 'Benchmark Site {0:04d}'.format(i), 'templateField': self.templates[0]['id'],
+                'addressField': '500 Terry Francois St, San Francisco'}
+        for n, serial in enumerate(self.take(8)):
+            form['serialField{0}'.format(n + 1)] = serial
+            form['nameField{0}'.format(n + 1)] = 'AP {0}'.format(n + 1)
+        return form, '/CreateNetwork', 8
+
+    def replacedevice(self, i):
+        network = self.networks[i]
+        current = dict((d['model'][:2], s) for s, d in self.mock.devices.items() if d['networkId'] == network['id'])
+        form = {
+            'networkField': network['id'],
+            'oldMX': current['MX'], 'newMX': 'Q2MX-9{0:03d}-0001'.format(i),
+            'oldSwitch': current['MS'], 'newSwitch': 'Q2SW-9{0:03d}-0002'.format(i),
+            'oldAP': current['MR'], 'newAP': 'Q2AP-9{0:03d}-0003'.format(i)
+        }
+        #
+        # Every other run leaves the network to be found from the old serials
+        #
+        if i % 2:
+            form['networkField'] = ''
+        return form, '/ReplaceDevice', 3
+
+    def indexdevices(self):
+        #
+        # The webapp builds the serial index once, in the background when the replace form is first opened. Build it
+        # cold here and report its own calls and time, the ReplaceDevice runs then find it ready.
+        #
+        self.mock.resetstats()
+        started = time.monotonic()
+        merakiapi.loaddevices(config.apikey, config.organizationid)
+        self.indexbuild = {'calls': self.mock.stats()['calls'], 'seconds': time.monotonic() - started}
+
+    def waitforjob(self, timeout=300):
+        #
+        # Form posts only queue a job, poll its status endpoint the way a browser would until it finishes
+        #
+        jobid = json.loads(self.client.get('/jobs').data)[0]['id']
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = json.loads(self.client.get('/jobs/{0}'.format(jobid)).data)
+            if status['state'] == 'failed':
+                raise RuntimeError('job {0} failed: {1}'.format(jobid, status['error']))
+            if status['state'] == 'done':
+                return status
+            time.sleep(0.005)
+        raise RuntimeError('job {0} did not finish within {1} s'.format(jobid, timeout))
+
+    def run(self, name, workflow):
+        self.mock.resetstats()
+        merakiapi.getclient().invalidate()
+        elapsed = []
+        posted = []
+        devices = 0
+        sent = 0
+        repeated = {}
+        for i in range(self.args.iterations):
+            form, path, count = workflow(i)
+            started = time.monotonic()
+            with merakiapi.profile(name, budgets[name] if self.args.budget else None) as calls:
+                response = self.client.post(path, data=form)
+                posted.append(time.monotonic() - started)
+                if response.status_code not in (200, 302):
+                    raise RuntimeError('{0} returned HTTP {1}'.format(path, response.status_code))
+                self.waitforjob()
+            elapsed.append(time.monotonic() - started)
+            sent = max(sent, calls.count())
+            for key, repeats in calls.repeated().items():
+                repeated[key] = repeated.get(key, 0) + repeats
+            if self.args.profile and i == 0:
+                self.profiles.append(calls.render())
+            devices += count
+        stats = self.mock.stats()
+        total = sum(elapsed)
+        return {
+            'workflow': name,
+            'iterations': self.args.iterations,
+            'calls': stats['calls'],
+            'callsperrun': stats['calls'] / float(self.args.iterations),
+            'maxcalls': sent,
+            'repeated': dict(('{0} {1}'.format(*key), count) for key, count in repeated.items()),
+            'wall': total,
+            'mean': total / self.args.iterations,
+            'max': max(elapsed),
+            'post': sum(posted) / self.args.iterations,
+            'devicespersec': devices / total if total else 0.0,
+            'callspersec': stats['calls'] / total if total else 0.0,
+            'endpoints': stats['endpoints'],
+            'statuses': stats['statuses']
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline end-to-end workflow benchmark')
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.02, help='mock Dashboard latency per call in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--ratelimit', type=float, default=None, help='mock Dashboard requests per second')
+    parser.add_argument('--errorrate', type=float, default=0.0, help='fraction of mock responses that are 5xx')
+    parser.add_argument('--clientrate', type=float, default=None, help='override the client rate limiter')
+    parser.add_argument('--loglevel', default=None, help='log Dashboard calls at this level, e.g. DEBUG')
+    parser.add_argument('--budget', action='store_true', help='fail if any run sends more calls than its budget')
+    parser.add_argument('--profile', action='store_true', help='print the call tree of each workflow\'s first run')
+    parser.add_argument('--json', action='store_true', help='print results as JSON for regression tracking')
+    args = parser.parse_args()
+
+    bench = Workbench(args)
+    results = [
+        bench.run('AddDevice', bench.adddevice),
+        bench.run('CreateNetwork', bench.createnetwork)
+    ]
+    bench.indexdevices()
+    results.append(bench.run('ReplaceDevice', bench.replacedevice))
+    bench.webapp.jobqueue.shutdown()
+    merakiapi.disablelogging()
+    bench.server.shutdown()
+
+    if args.json:
+        print(json.dumps({'startup': bench.startup, 'startupcalls': bench.startupcalls, 'firstform': bench.firstform,
+                          'indexbuild': bench.indexbuild, 'results': results}, indent=2))
+        return
+
+    print('Webapp import: {0:.3f} s, {1} API calls, first form choices: {2:.3f} s'.format(
+        bench.startup, bench.startupcalls, bench.firstform))
+    print('Serial index build: {0:.3f} s, {1} API calls, before the ReplaceDevice runs\n'.format(
+        bench.indexbuild['seconds'], bench.indexbuild['calls']))
+    print('{0:<15}{1:>6}{2:>10}{3:>11}{4:>9}{5:>11}{6:>11}{7:>11}{8:>12}{9:>11}'.format(
+        'workflow', 'runs', 'calls', 'calls/run', 'max', 'wall s', 'mean s', 'post s', 'devices/s', 'calls/s'))
+    for r in results:
+        print('{0:<15}{1:>6}{2:>10}{3:>11.1f}{4:>9}{5:>11.3f}{6:>11.3f}{7:>11.3f}{8:>12.1f}{9:>11.1f}'.format(
+            r['workflow'], r['iterations'], r['calls'], r['callsperrun'], r['maxcalls'], r['wall'], r['mean'],
+            r['post'], r['devicespersec'], r['callspersec']))
+    for r in results:
+        for url, count in sorted(r['repeated'].items()):
+            print('{0}: {1} sent {2} times in one run'.format(r['workflow'], url, count))
+    for tree in bench.profiles:
+        print('\n' + tree)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+#
+# Title: Customer | Meraki Full-stack Deployment
+#
+#  Streaming bulk provisioning from CSV or NDJSON uploads
+#
+# Overview
+# Each row names a network, a serial and optionally a device name, street address and configuration template. Rows
+# are read and validated one at a time from the uploaded file and handed to a thread pool with at most window rows in
+# flight, so memory stays flat however many rows the file holds. Networks that do not exist yet are created, and bound
+# to the row's template, the first time a row asks for them. One result per row is reported as it completes.
+#
+# CSV files need a header row naming the columns, NDJSON files hold one JSON object per line with the same keys:
+#
+#   network,serial,name,address,template
+#   Store 0042,Q2XX-AAAA-0001,Store 0042 MX,500 Terry Francois St,Retail Template
+#
+
+import csv
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+
+import merakiapi
+import validation
+
+fields = ['network', 'serial', 'name', 'address', 'template']
+resultfields = ['row', 'network', 'serial', 'name', 'status', 'detail']
+
+
+def formatfor(filename):
+    #
+    # Pick the row format from an upload's file name, anything that is not NDJSON is read as CSV
+    #
+    if filename and filename.lower().endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return 'csv'
+
+
+def readrows(stream, fmt='csv'):
+    #
+    # Yield (row number, row dict) from a binary stream, or (row number, error message) for lines that cannot be read
+    #
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='' if fmt == 'csv' else None)
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        reader.fieldnames = [str(name).strip().lower() for name in reader.fieldnames or []]
+        for number, row in enumerate(reader, 1):
+            yield number, row
+        return
+    for number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            row = merakiapi.jsondecode(line)
+        except ValueError as e:
+            yield number, 'Invalid JSON: {0}'.format(e)
+            continue
+        if not isinstance(row, dict):
+            yield number, 'Row must be a JSON object'
+            continue
+        yield number, dict((str(key).strip().lower(), value) for key, value in row.items())
+
+
+def validaterow(row):
+    #
+    # Return the row with every field present and trimmed, raises ValueError naming the first problem
+    #
+    clean = dict((field, str(row.get(field) or '').strip()) for field in fields)
+    clean['serial'] = clean['serial'].upper()
+    if not clean['network']:
+        raise ValueError('Network is required')
+    validation.validserial(clean['serial'])
+    return clean
+
+
+class BulkProvisioner(object):
+    #
+    # Provisions rows into organization orgid with up to maxworkers rows being worked on and at most window rows
+    # read ahead of the results. New networks are created with nettype and tz, like the CreateNetwork form does.
+    #
+    def __init__(self, apikey, orgid, maxworkers=8, window=64, nettype='appliance switch wireless',
+                 tz='America/Los_Angeles'):
+        self.apikey = apikey
+        self.orgid = orgid
+        self.maxworkers = maxworkers
+        self.window = max(window, maxworkers)
+        self.nettype = nettype
+        self.tz = tz
+        self.lock = threading.Lock()
+        self.networks = {}
+        self.networklocks = {}
+        self.templates = None
+
+    def run(self, rows, report):
+        #
+        # Provision every (row number, row) from readrows, calling report(result) with a dict keyed by resultfields
+        # for each row as it finishes. Returns the number of rows per result status.
+        #
+        counts = {}
+
+        def finish(result):
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+            report(result)
+
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.maxworkers) as pool:
+            for number, row in rows:
+                if not isinstance(row, dict):
+                    finish(self.__result(number, {}, 'rejected', row))
+                    continue
+                try:
+                    row = validaterow(row)
+                except ValueError as e:
+                    finish(self.__result(number, row, 'rejected', str(e)))
+                    continue
+                pending.add(merakiapi.contextsubmit(pool, self.__provision, number, row))
+                if len(pending) >= self.window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finish(future.result())
+            for future in pending:
+                finish(future.result())
+        return counts
+
+    def networkfor(self, name, template):
+        #
+        # Return (network ID, None), creating the network on first use, or (None, error message). Rows for the same
+        # network wait on each other here so it is only looked up or created once. Only a resolved network or an
+        # unknown template is remembered, later rows try a network again after a failed lookup or create.
+        #
+        with self.lock:
+            lock = self.networklocks.setdefault(name, threading.Lock())
+        with lock:
+            if name in self.networks:
+                return self.networks[name]
+            networkid, error, final = self.__resolvenetwork(name, template)
+            if final:
+                self.networks[name] = networkid, error
+            return networkid, error
+
+    def templatefor(self, template):
+        #
+        # Accept a template by ID or by name, returns None if no template matches
+        #
+        with self.lock:
+            if self.templates is None:
+                templates = merakiapi.gettemplates(self.apikey, self.orgid, suppressprint=True)
+                if not isinstance(templates, list):
+                    raise merakiapi.Error('Unable to list templates: {0}'.format(templates))
+                self.templates = {}
+                for entry in templates:
+                    self.templates[entry['id']] = entry['id']
+                    self.templates.setdefault(entry['name'], entry['id'])
+            return self.templates.get(template)
+
+    def __resolvenetwork(self, name, template):
+        #
+        # Returns (network ID, error message, whether the answer holds for later rows of the same network)
+        #
+        networkid = merakiapi.networkidforname(self.apikey, self.orgid, name)
+        if networkid is not None:
+            return networkid, None, True
+        templateid = None
+        if template:
+            templateid = self.templatefor(template)
+            if templateid is None:
+                return None, 'Unknown template {0}'.format(template), True
+        network = merakiapi.addnetworkandbind(self.apikey, self.orgid, name, self.nettype, '', self.tz,
+                                              templateid=templateid, suppressprint=True)
+        if not isinstance(network, dict) or 'id' not in network:
+            return None, 'Network could not be created: {0}'.format(network), False
+        if templateid and 'configTemplateId' not in network:
+            return network['id'], 'Network created but not bound to template {0}'.format(template), True
+        return network['id'], None, True
+
+    def __provision(self, number, row):
+        try:
+            networkid, error = self.networkfor(row['network'], row['template'])
+        except (merakiapi.Error, ValueError, KeyError, requests.exceptions.RequestException) as e:
+            networkid, error = None, str(e)
+        if networkid is None:
+            return self.__result(number, row, 'error', error)
+        outcome = merakiapi.adddevice(self.apikey, networkid, row['serial'], row['name'], row['address'])
+        return self.__result(number, row, outcome.status, outcome.detail or error)
+
+    def __result(self, number, row, status, detail):
+        return {
+            'row': number,
+            'network': row.get('network', ''),
+            'serial': row.get('serial', ''),
+            'name': row.get('name', ''),
+            'status': status,
+            'detail': '' if detail is None else str(detail)
+        }
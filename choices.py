@@ -0,0 +1,127 @@
+#
+# Title: Customer | Meraki Full-stack Deployment
+#
+#  Shared, lazily loaded dropdown choices for the web app forms
+#
+# Overview
+# A ChoiceProvider loads its [id, name] pairs from the Dashboard the first time a form asks for them, then keeps them
+# fresh from a background thread every interval seconds. Forms read the current list without waiting on the
+# Dashboard, so importing the app does no network I/O and new networks or templates appear without a restart.
+# Given a snapshot path, the last good list is also kept on disk. A restarted app serves the snapshot straight away
+# and reconciles it with the Dashboard in the background, so startup does not wait on the Dashboard and the forms keep
+# their choices while it is slow or down.
+#
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger('merakiapi.choices')
+
+
+class ChoiceProvider(object):
+    #
+    # loader returns a list of Dashboard objects with 'id' and 'name' keys. placeholder, when given, is the
+    # [value, label] pair listed first. Only the very first read waits for the Dashboard, for at most timeout seconds,
+    # and not at all when a snapshot could be restored.
+    #
+    def __init__(self, loader, placeholder=None, interval=300, timeout=10, snapshot=None):
+        self.loader = loader
+        self.placeholder = placeholder
+        self.interval = interval
+        self.timeout = timeout
+        self.snapshot = snapshot
+        self.items = []
+        self.updated = None
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.wakeup = threading.Event()
+        self.thread = None
+        if snapshot is not None:
+            self.restore()
+
+    def choices(self):
+        self.start()
+        self.ready.wait(self.timeout)
+        choices = list(self.items)
+        if self.placeholder is not None:
+            choices.insert(0, list(self.placeholder))
+        return choices
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.__run, name='choiceprovider')
+                self.thread.daemon = True
+                self.thread.start()
+
+    def refresh(self):
+        #
+        # Reload in the background now instead of at the next interval
+        #
+        self.start()
+        self.wakeup.set()
+
+    def add(self, objectid, name):
+        #
+        # Show an object the app just created without reloading the whole list from the Dashboard
+        #
+        items = [item for item in self.items if item[0] != objectid]
+        items.append([objectid, name])
+        self.items = sorted(items, key=lambda x: x[1])
+        self.save()
+
+    def load(self):
+        #
+        # Replace the current choices with a fresh Dashboard listing, keeping the old ones if the call fails
+        #
+        try:
+            objects = self.loader()
+            self.items = sorted([[obj['id'], obj['name']] for obj in objects], key=lambda x: x[1])
+            self.updated = time.time()
+        except Exception as e:
+            logger.warning('Could not load choices, keeping %d from %s: %s', len(self.items),
+                           'the snapshot' if self.updated is None else 'the last load', e)
+            return False
+        finally:
+            self.ready.set()
+        self.save()
+        return True
+
+    def restore(self):
+        #
+        # Serve the choices saved in the snapshot file until the first load replaces them
+        #
+        try:
+            with open(self.snapshot) as f:
+                saved = json.load(f)
+            self.items = [[item[0], item[1]] for item in saved['items']]
+        except (OSError, ValueError, KeyError, TypeError, IndexError):
+            return False
+        self.ready.set()
+        return True
+
+    def save(self):
+        #
+        # Write the current choices to the snapshot file, replaced atomically so other workers never read half a file
+        #
+        if self.snapshot is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.snapshot))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            handle, path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(handle, 'w') as f:
+                json.dump({'saved': time.time(), 'items': self.items}, f)
+            os.replace(path, self.snapshot)
+        except OSError as e:
+            logger.warning('Could not save choices snapshot %s: %s', self.snapshot, e)
+
+    def __run(self):
+        while True:
+            self.load()
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
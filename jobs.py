@@ -0,0 +1,193 @@
+#
+# Title: Customer | Meraki Full-stack Deployment
+#
+#  Background provisioning jobs for the web app
+#
+# Overview
+# A JobQueue runs provisioning work on a small thread pool so form submissions return as soon as the work is queued.
+# Each Job records the messages its work reports as it goes, and its status() is what the /jobs/<id> endpoint serves.
+# Finished jobs are kept in memory, oldest dropped first once more than keep jobs are held. Given a store, such as a
+# sharedstore.SharedStore, every job's status is also written there on each change so any worker process can serve
+# /jobs/<id> for a job another worker is running.
+#
+
+import collections
+import contextvars
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job(object):
+    #
+    # state moves from 'queued' to 'running' to 'done', or to 'failed' if the work raised
+    #
+    def __init__(self, title, store=None):
+        self.id = uuid.uuid4().hex
+        self.store = store
+        self.title = title
+        self.state = 'queued'
+        self.steps = []
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.version = 0
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+    def step(self, message):
+        #
+        # Record one progress or result message, called by the work function from its worker thread. elapsed is
+        # seconds since the job started running.
+        #
+        with self.lock:
+            now = time.time()
+            self.steps.append({'time': now, 'elapsed': round(now - (self.started or self.created), 3),
+                               'message': str(message)})
+            self.version += 1
+            self.changed.notify_all()
+        self.save()
+
+    def finish(self, result=None, error=None):
+        with self.lock:
+            self.finished = time.time()
+            self.state = 'done' if error is None else 'failed'
+            self.result = result
+            self.error = error
+            self.version += 1
+            self.changed.notify_all()
+        self.save()
+
+    def start(self):
+        with self.lock:
+            self.state = 'running'
+            self.started = time.time()
+            self.version += 1
+        self.save()
+
+    def save(self):
+        #
+        # Publish the current status to the shared store, later changes always carry a higher version
+        #
+        if self.store is not None:
+            with self.lock:
+                status, version = self.__status(), self.version
+            self.store.savejob(status, version)
+
+    def updates(self, after=0, timeout=15):
+        #
+        # Wait up to timeout seconds for steps past the first after, returns (new steps, whether the job has finished)
+        #
+        with self.lock:
+            self.changed.wait_for(lambda: len(self.steps) > after or self.finished is not None, timeout)
+            return self.steps[after:], self.finished is not None
+
+    def __status(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'state': self.state,
+            'steps': list(self.steps),
+            'result': self.result,
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished
+        }
+
+    def status(self):
+        with self.lock:
+            return self.__status()
+
+
+class StoredJob(object):
+    #
+    # Read-only view of a job submitted in another worker process, polled from the shared store
+    #
+    def __init__(self, store, status):
+        self.store = store
+        self.id = status['id']
+        self.title = status['title']
+        self.latest = status
+
+    def status(self):
+        self.latest = self.store.loadjob(self.id) or self.latest
+        return self.latest
+
+    def updates(self, after=0, timeout=15, interval=0.25):
+        deadline = time.time() + timeout
+        while True:
+            status = self.status()
+            if len(status['steps']) > after or status['finished'] is not None or time.time() >= deadline:
+                return status['steps'][after:], status['finished'] is not None
+            time.sleep(interval)
+
+
+class JobQueue(object):
+    #
+    # work is called as work(job, *args, **kwargs) on one of workers threads and reports progress with job.step(),
+    # whatever it returns becomes the job's result and must be JSON serializable. work runs in a copy of the
+    # submitter's context variables, so a merakiapi.profile() or correlation ID around submit() also covers the job.
+    #
+    def __init__(self, workers=4, keep=500, store=None):
+        self.keep = keep
+        self.store = store
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self.jobs = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, title, work, *args, **kwargs):
+        job = Job(title, self.store)
+        job.save()
+        with self.lock:
+            self.jobs[job.id] = job
+            self.__prune()
+        if self.store is not None:
+            self.store.prunejobs(self.keep)
+        self.pool.submit(contextvars.copy_context().run, self.__run, job, work, args, kwargs)
+        return job
+
+    def get(self, jobid):
+        with self.lock:
+            job = self.jobs.get(jobid)
+        if job is None and self.store is not None:
+            status = self.store.loadjob(jobid)
+            if status is not None:
+                job = StoredJob(self.store, status)
+        return job
+
+    def recent(self, count=50):
+        #
+        # Newest jobs first, from every worker when there is a store
+        #
+        if self.store is not None:
+            return [StoredJob(self.store, status) for status in self.store.recentjobs(count)]
+        with self.lock:
+            return list(reversed(self.jobs.values()))[:count]
+
+    def shutdown(self, wait=True):
+        self.pool.shutdown(wait=wait)
+
+    def __prune(self):
+        #
+        # Drop the oldest finished jobs, queued and running jobs are always kept
+        #
+        excess = len(self.jobs) - self.keep
+        for jobid in list(self.jobs):
+            if excess <= 0:
+                break
+            if self.jobs[jobid].finished is not None:
+                del self.jobs[jobid]
+                excess -= 1
+
+    def __run(self, job, work, args, kwargs):
+        job.start()
+        try:
+            result = work(job, *args, **kwargs)
+        except Exception as e:
+            job.finish(error='{0}: {1}'.format(type(e).__name__, e))
+        else:
+            job.finish(result)
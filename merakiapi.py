@@ -27,604 +27,79 @@
 #
 
 import requests
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import contextvars
+import functools
 import json
-from ipaddress import ip_address
+import logging
+import logging.handlers
+import queue
+import random
 import re
+import shelve
+import sys
+import threading
+import time
 import warnings
 
+import validation
 
-tzlist = ['Africa/Abidjan',
-          'Africa/Accra',
-          'Africa/Addis_Ababa',
-          'Africa/Algiers',
-          'Africa/Asmara',
-          'Africa/Asmera',
-          'Africa/Bamako',
-          'Africa/Bangui',
-          'Africa/Banjul',
-          'Africa/Bissau',
-          'Africa/Blantyre',
-          'Africa/Brazzaville',
-          'Africa/Bujumbura',
-          'Africa/Cairo',
-          'Africa/Casablanca',
-          'Africa/Ceuta',
-          'Africa/Conakry',
-          'Africa/Dakar',
-          'Africa/Dar_es_Salaam',
-          'Africa/Djibouti',
-          'Africa/Douala',
-          'Africa/El_Aaiun',
-          'Africa/Freetown',
-          'Africa/Gaborone',
-          'Africa/Harare',
-          'Africa/Johannesburg',
-          'Africa/Juba',
-          'Africa/Kampala',
-          'Africa/Khartoum',
-          'Africa/Kigali',
-          'Africa/Kinshasa',
-          'Africa/Lagos',
-          'Africa/Libreville',
-          'Africa/Lome',
-          'Africa/Luanda',
-          'Africa/Lubumbashi',
-          'Africa/Lusaka',
-          'Africa/Malabo',
-          'Africa/Maputo',
-          'Africa/Maseru',
-          'Africa/Mbabane',
-          'Africa/Mogadishu',
-          'Africa/Monrovia',
-          'Africa/Nairobi',
-          'Africa/Ndjamena',
-          'Africa/Niamey',
-          'Africa/Nouakchott',
-          'Africa/Ouagadougou',
-          'Africa/Porto-Novo',
-          'Africa/Sao_Tome',
-          'Africa/Timbuktu',
-          'Africa/Tripoli',
-          'Africa/Tunis',
-          'Africa/Windhoek',
-          'America/Adak',
-          'America/Anchorage',
-          'America/Anguilla',
-          'America/Antigua',
-          'America/Araguaina',
-          'America/Argentina/Buenos_Aires',
-          'America/Argentina/Catamarca',
-          'America/Argentina/ComodRivadavia',
-          'America/Argentina/Cordoba',
-          'America/Argentina/Jujuy',
-          'America/Argentina/La_Rioja',
-          'America/Argentina/Mendoza',
-          'America/Argentina/Rio_Gallegos',
-          'America/Argentina/Salta',
-          'America/Argentina/San_Juan',
-          'America/Argentina/San_Luis',
-          'America/Argentina/Tucuman',
-          'America/Argentina/Ushuaia',
-          'America/Aruba',
-          'America/Asuncion',
-          'America/Atikokan',
-          'America/Atka',
-          'America/Bahia',
-          'America/Bahia_Banderas',
-          'America/Barbados',
-          'America/Belem',
-          'America/Belize',
-          'America/Blanc-Sablon',
-          'America/Boa_Vista',
-          'America/Bogota',
-          'America/Boise',
-          'America/Buenos_Aires',
-          'America/Cambridge_Bay',
-          'America/Campo_Grande',
-          'America/Cancun',
-          'America/Caracas',
-          'America/Catamarca',
-          'America/Cayenne',
-          'America/Cayman',
-          'America/Chicago',
-          'America/Chihuahua',
-          'America/Coral_Harbour',
-          'America/Cordoba',
-          'America/Costa_Rica',
-          'America/Creston',
-          'America/Cuiaba',
-          'America/Curacao',
-          'America/Danmarkshavn',
-          'America/Dawson',
-          'America/Dawson_Creek',
-          'America/Denver',
-          'America/Detroit',
-          'America/Dominica',
-          'America/Edmonton',
-          'America/Eirunepe',
-          'America/El_Salvador',
-          'America/Ensenada',
-          'America/Fort_Nelson',
-          'America/Fort_Wayne',
-          'America/Fortaleza',
-          'America/Glace_Bay',
-          'America/Godthab',
-          'America/Goose_Bay',
-          'America/Grand_Turk',
-          'America/Grenada',
-          'America/Guadeloupe',
-          'America/Guatemala',
-          'America/Guayaquil',
-          'America/Guyana',
-          'America/Halifax',
-          'America/Havana',
-          'America/Hermosillo',
-          'America/Indiana/Indianapolis',
-          'America/Indiana/Knox',
-          'America/Indiana/Marengo',
-          'America/Indiana/Petersburg',
-          'America/Indiana/Tell_City',
-          'America/Indiana/Vevay',
-          'America/Indiana/Vincennes',
-          'America/Indiana/Winamac',
-          'America/Indianapolis',
-          'America/Inuvik',
-          'America/Iqaluit',
-          'America/Jamaica',
-          'America/Jujuy',
-          'America/Juneau',
-          'America/Kentucky/Louisville',
-          'America/Kentucky/Monticello',
-          'America/Knox_IN',
-          'America/Kralendijk',
-          'America/La_Paz',
-          'America/Lima',
-          'America/Los_Angeles',
-          'America/Louisville',
-          'America/Lower_Princes',
-          'America/Maceio',
-          'America/Managua',
-          'America/Manaus',
-          'America/Marigot',
-          'America/Martinique',
-          'America/Matamoros',
-          'America/Mazatlan',
-          'America/Mendoza',
-          'America/Menominee',
-          'America/Merida',
-          'America/Metlakatla',
-          'America/Mexico_City',
-          'America/Miquelon',
-          'America/Moncton',
-          'America/Monterrey',
-          'America/Montevideo',
-          'America/Montreal',
-          'America/Montserrat',
-          'America/Nassau',
-          'America/New_York',
-          'America/Nipigon',
-          'America/Nome',
-          'America/Noronha',
-          'America/North_Dakota/Beulah',
-          'America/North_Dakota/Center',
-          'America/North_Dakota/New_Salem',
-          'America/Ojinaga',
-          'America/Panama',
-          'America/Pangnirtung',
-          'America/Paramaribo',
-          'America/Phoenix',
-          'America/Port_of_Spain',
-          'America/Port-au-Prince',
-          'America/Porto_Acre',
-          'America/Porto_Velho',
-          'America/Puerto_Rico',
-          'America/Rainy_River',
-          'America/Rankin_Inlet',
-          'America/Recife',
-          'America/Regina',
-          'America/Resolute',
-          'America/Rio_Branco',
-          'America/Rosario',
-          'America/Santa_Isabel',
-          'America/Santarem',
-          'America/Santiago',
-          'America/Santo_Domingo',
-          'America/Sao_Paulo',
-          'America/Scoresbysund',
-          'America/Shiprock',
-          'America/Sitka',
-          'America/St_Barthelemy',
-          'America/St_Johns',
-          'America/St_Kitts',
-          'America/St_Lucia',
-          'America/St_Thomas',
-          'America/St_Vincent',
-          'America/Swift_Current',
-          'America/Tegucigalpa',
-          'America/Thule',
-          'America/Thunder_Bay',
-          'America/Tijuana',
-          'America/Toronto',
-          'America/Tortola',
-          'America/Vancouver',
-          'America/Virgin',
-          'America/Whitehorse',
-          'America/Winnipeg',
-          'America/Yakutat',
-          'America/Yellowknife',
-          'Antarctica/Casey',
-          'Antarctica/Davis',
-          'Antarctica/DumontDUrville',
-          'Antarctica/Macquarie',
-          'Antarctica/Mawson',
-          'Antarctica/McMurdo',
-          'Antarctica/Palmer',
-          'Antarctica/Rothera',
-          'Antarctica/South_Pole',
-          'Antarctica/Syowa',
-          'Antarctica/Troll',
-          'Antarctica/Vostok',
-          'Arctic/Longyearbyen',
-          'Asia/Aden',
-          'Asia/Almaty',
-          'Asia/Amman',
-          'Asia/Anadyr',
-          'Asia/Aqtau',
-          'Asia/Aqtobe',
-          'Asia/Ashgabat',
-          'Asia/Ashkhabad',
-          'Asia/Baghdad',
-          'Asia/Bahrain',
-          'Asia/Baku',
-          'Asia/Bangkok',
-          'Asia/Barnaul',
-          'Asia/Beirut',
-          'Asia/Bishkek',
-          'Asia/Brunei',
-          'Asia/Calcutta',
-          'Asia/Chita',
-          'Asia/Choibalsan',
-          'Asia/Chongqing',
-          'Asia/Chungking',
-          'Asia/Colombo',
-          'Asia/Dacca',
-          'Asia/Damascus',
-          'Asia/Dhaka',
-          'Asia/Dili',
-          'Asia/Dubai',
-          'Asia/Dushanbe',
-          'Asia/Gaza',
-          'Asia/Harbin',
-          'Asia/Hebron',
-          'Asia/Ho_Chi_Minh',
-          'Asia/Hong_Kong',
-          'Asia/Hovd',
-          'Asia/Irkutsk',
-          'Asia/Istanbul',
-          'Asia/Jakarta',
-          'Asia/Jayapura',
-          'Asia/Jerusalem',
-          'Asia/Kabul',
-          'Asia/Kamchatka',
-          'Asia/Karachi',
-          'Asia/Kashgar',
-          'Asia/Kathmandu',
-          'Asia/Katmandu',
-          'Asia/Khandyga',
-          'Asia/Kolkata',
-          'Asia/Krasnoyarsk',
-          'Asia/Kuala_Lumpur',
-          'Asia/Kuching',
-          'Asia/Kuwait',
-          'Asia/Macao',
-          'Asia/Macau',
-          'Asia/Magadan',
-          'Asia/Makassar',
-          'Asia/Manila',
-          'Asia/Muscat',
-          'Asia/Nicosia',
-          'Asia/Novokuznetsk',
-          'Asia/Novosibirsk',
-          'Asia/Omsk',
-          'Asia/Oral',
-          'Asia/Phnom_Penh',
-          'Asia/Pontianak',
-          'Asia/Pyongyang',
-          'Asia/Qatar',
-          'Asia/Qyzylorda',
-          'Asia/Rangoon',
-          'Asia/Riyadh',
-          'Asia/Saigon',
-          'Asia/Sakhalin',
-          'Asia/Samarkand',
-          'Asia/Seoul',
-          'Asia/Shanghai',
-          'Asia/Singapore',
-          'Asia/Srednekolymsk',
-          'Asia/Taipei',
-          'Asia/Tashkent',
-          'Asia/Tbilisi',
-          'Asia/Tehran',
-          'Asia/Tel_Aviv',
-          'Asia/Thimbu',
-          'Asia/Thimphu',
-          'Asia/Tokyo',
-          'Asia/Tomsk',
-          'Asia/Ujung_Pandang',
-          'Asia/Ulaanbaatar',
-          'Asia/Ulan_Bator',
-          'Asia/Urumqi',
-          'Asia/Ust-Nera',
-          'Asia/Vientiane',
-          'Asia/Vladivostok',
-          'Asia/Yakutsk',
-          'Asia/Yekaterinburg',
-          'Asia/Yerevan',
-          'Atlantic/Azores',
-          'Atlantic/Bermuda',
-          'Atlantic/Canary',
-          'Atlantic/Cape_Verde',
-          'Atlantic/Faeroe',
-          'Atlantic/Faroe',
-          'Atlantic/Jan_Mayen',
-          'Atlantic/Madeira',
-          'Atlantic/Reykjavik',
-          'Atlantic/South_Georgia',
-          'Atlantic/St_Helena',
-          'Atlantic/Stanley',
-          'Australia/ACT',
-          'Australia/Adelaide',
-          'Australia/Brisbane',
-          'Australia/Broken_Hill',
-          'Australia/Canberra',
-          'Australia/Currie',
-          'Australia/Darwin',
-          'Australia/Eucla',
-          'Australia/Hobart',
-          'Australia/LHI',
-          'Australia/Lindeman',
-          'Australia/Lord_Howe',
-          'Australia/Melbourne',
-          'Australia/North',
-          'Australia/NSW',
-          'Australia/Perth',
-          'Australia/Queensland',
-          'Australia/South',
-          'Australia/Sydney',
-          'Australia/Tasmania',
-          'Australia/Victoria',
-          'Australia/West',
-          'Australia/Yancowinna',
-          'Brazil/Acre',
-          'Brazil/DeNoronha',
-          'Brazil/East',
-          'Brazil/West',
-          'Canada/Atlantic',
-          'Canada/Central',
-          'Canada/Eastern',
-          'Canada/East-Saskatchewan',
-          'Canada/Mountain',
-          'Canada/Newfoundland',
-          'Canada/Pacific',
-          'Canada/Saskatchewan',
-          'Canada/Yukon',
-          'CET',
-          'Chile/Continental',
-          'Chile/EasterIsland',
-          'CST6CDT',
-          'Cuba',
-          'EET',
-          'Egypt',
-          'Eire',
-          'EST',
-          'EST5EDT',
-          'Etc/GMT',
-          'Etc/GMT+0',
-          'Etc/GMT+1',
-          'Etc/GMT+10',
-          'Etc/GMT+11',
-          'Etc/GMT+12',
-          'Etc/GMT+2',
-          'Etc/GMT+3',
-          'Etc/GMT+4',
-          'Etc/GMT+5',
-          'Etc/GMT+6',
-          'Etc/GMT+7',
-          'Etc/GMT+8',
-          'Etc/GMT+9',
-          'Etc/GMT0',
-          'Etc/GMT-0',
-          'Etc/GMT-1',
-          'Etc/GMT-10',
-          'Etc/GMT-11',
-          'Etc/GMT-12',
-          'Etc/GMT-13',
-          'Etc/GMT-14',
-          'Etc/GMT-2',
-          'Etc/GMT-3',
-          'Etc/GMT-4',
-          'Etc/GMT-5',
-          'Etc/GMT-6',
-          'Etc/GMT-7',
-          'Etc/GMT-8',
-          'Etc/GMT-9',
-          'Etc/Greenwich',
-          'Etc/UCT',
-          'Etc/Universal',
-          'Etc/UTC',
-          'Etc/Zulu',
-          'Europe/Amsterdam',
-          'Europe/Andorra',
-          'Europe/Astrakhan',
-          'Europe/Athens',
-          'Europe/Belfast',
-          'Europe/Belgrade',
-          'Europe/Berlin',
-          'Europe/Bratislava',
-          'Europe/Brussels',
-          'Europe/Bucharest',
-          'Europe/Budapest',
-          'Europe/Busingen',
-          'Europe/Chisinau',
-          'Europe/Copenhagen',
-          'Europe/Dublin',
-          'Europe/Gibraltar',
-          'Europe/Guernsey',
-          'Europe/Helsinki',
-          'Europe/Isle_of_Man',
-          'Europe/Istanbul',
-          'Europe/Jersey',
-          'Europe/Kaliningrad',
-          'Europe/Kiev',
-          'Europe/Kirov',
-          'Europe/Lisbon',
-          'Europe/Ljubljana',
-          'Europe/London',
-          'Europe/Luxembourg',
-          'Europe/Madrid',
-          'Europe/Malta',
-          'Europe/Mariehamn',
-          'Europe/Minsk',
-          'Europe/Monaco',
-          'Europe/Moscow',
-          'Europe/Nicosia',
-          'Europe/Oslo',
-          'Europe/Paris',
-          'Europe/Podgorica',
-          'Europe/Prague',
-          'Europe/Riga',
-          'Europe/Rome',
-          'Europe/Samara',
-          'Europe/San_Marino',
-          'Europe/Sarajevo',
-          'Europe/Simferopol',
-          'Europe/Skopje',
-          'Europe/Sofia',
-          'Europe/Stockholm',
-          'Europe/Tallinn',
-          'Europe/Tirane',
-          'Europe/Tiraspol',
-          'Europe/Ulyanovsk',
-          'Europe/Uzhgorod',
-          'Europe/Vaduz',
-          'Europe/Vatican',
-          'Europe/Vienna',
-          'Europe/Vilnius',
-          'Europe/Volgograd',
-          'Europe/Warsaw',
-          'Europe/Zagreb',
-          'Europe/Zaporozhye',
-          'Europe/Zurich',
-          'GB',
-          'GB-Eire',
-          'GMT',
-          'GMT+0',
-          'GMT0',
-          'GMT-0',
-          'Greenwich',
-          'Hongkong',
-          'HST',
-          'Iceland',
-          'Indian/Antananarivo',
-          'Indian/Chagos',
-          'Indian/Christmas',
-          'Indian/Cocos',
-          'Indian/Comoro',
-          'Indian/Kerguelen',
-          'Indian/Mahe',
-          'Indian/Maldives',
-          'Indian/Mauritius',
-          'Indian/Mayotte',
-          'Indian/Reunion',
-          'Iran',
-          'Israel',
-          'Jamaica',
-          'Japan',
-          'Kwajalein',
-          'Libya',
-          'MET',
-          'Mexico/BajaNorte',
-          'Mexico/BajaSur',
-          'Mexico/General',
-          'MST',
-          'MST7MDT',
-          'Navajo',
-          'NZ',
-          'NZ-CHAT',
-          'Pacific/Apia',
-          'Pacific/Auckland',
-          'Pacific/Bougainville',
-          'Pacific/Chatham',
-          'Pacific/Chuuk',
-          'Pacific/Easter',
-          'Pacific/Efate',
-          'Pacific/Enderbury',
-          'Pacific/Fakaofo',
-          'Pacific/Fiji',
-          'Pacific/Funafuti',
-          'Pacific/Galapagos',
-          'Pacific/Gambier',
-          'Pacific/Guadalcanal',
-          'Pacific/Guam',
-          'Pacific/Honolulu',
-          'Pacific/Johnston',
-          'Pacific/Kiritimati',
-          'Pacific/Kosrae',
-          'Pacific/Kwajalein',
-          'Pacific/Majuro',
-          'Pacific/Marquesas',
-          'Pacific/Midway',
-          'Pacific/Nauru',
-          'Pacific/Niue',
-          'Pacific/Norfolk',
-          'Pacific/Noumea',
-          'Pacific/Pago_Pago',
-          'Pacific/Palau',
-          'Pacific/Pitcairn',
-          'Pacific/Pohnpei',
-          'Pacific/Ponape',
-          'Pacific/Port_Moresby',
-          'Pacific/Rarotonga',
-          'Pacific/Saipan',
-          'Pacific/Samoa',
-          'Pacific/Tahiti',
-          'Pacific/Tarawa',
-          'Pacific/Tongatapu',
-          'Pacific/Truk',
-          'Pacific/Wake',
-          'Pacific/Wallis',
-          'Pacific/Yap',
-          'Poland',
-          'Portugal',
-          'PRC',
-          'PST8PDT',
-          'ROC',
-          'ROK',
-          'Singapore',
-          'Turkey',
-          'UCT',
-          'Universal',
-          'US/Alaska',
-          'US/Aleutian',
-          'US/Arizona',
-          'US/Central',
-          'US/Eastern',
-          'US/East-Indiana',
-          'US/Hawaii',
-          'US/Indiana-Starke',
-          'US/Michigan',
-          'US/Mountain',
-          'US/Pacific',
-          'US/Pacific-New',
-          'US/Samoa',
-          'UTC',
-          'WET',
-          'W-SU',
-          'Zulu'
-          ]
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+tzlist = validation.tzlist
 
 base_url = 'https://dashboard.meraki.com/api/v0'
 
+#
+# Seconds an API key's organization access list is memoized by __hasorgaccess
+#
+orgaccessttl = 300
+__orgaccesscache = {}
+#
+# Network name to ID index per organization, kept current by getnetworklist, addnetwork, updatenetwork and delnetwork
+#
+__networkindex = {}
+__networkindexlock = threading.Lock()
+__networkloadlock = threading.Lock()
+#
+# Serial to DeviceRecord index per organization, built by indexdevices and updated by this process's claim,
+# adddevtonet, removedevfromnet, updatedevice, getdevicedetail and delnetwork calls. Changes made elsewhere are only
+# seen when deviceforserial reads a record older than deviceindexttl seconds again.
+#
+deviceindexttl = 300
+__deviceindex = {}
+__deviceindexlock = threading.Lock()
+__deviceloadlock = threading.Lock()
+__nextlinkpattern = re.compile(r'<([^>]+)>\s*;\s*rel="?next"?')
+
+#
+# JSON backend used to decode every response body and encode every request payload. orjson or ujson are picked up
+# when installed since decoding large listings such as org inventory dominates response handling time.
+#
+if orjson is not None:
+    jsonbackend = 'orjson'
+    __jsonloads = orjson.loads
+    __jsondumps = lambda obj: orjson.dumps(obj).decode('utf-8')
+elif ujson is not None:
+    jsonbackend = 'ujson'
+    __jsonloads = ujson.loads
+    __jsondumps = ujson.dumps
+else:
+    jsonbackend = 'json'
+    __jsonloads = json.loads
+    __jsondumps = json.dumps
+
 
 class Error(Exception):
     #
@@ -677,33 +152,874 @@ class ListError(Error):
         self.message = message
 
 
-def __isjson(myjson):
+class PageError(Error):
     #
-    # Validates if passed object is valid JSON, used to prevent json.loads exceptions
+    # Raised when a page of a paginated listing does not decode to a list of records
+    #
+    def __init__(self, message):
+        self.message = message
+
+    def __str__(self):
+        return repr(self.message)
+
+
+class CallBudgetExceeded(Error):
+    #
+    # Raised when a profile() block sends more Dashboard calls than its budget, the message holds its call tree
+    #
+    def __init__(self, profile):
+        self.profile = profile
+        self.message = '{0} sent {1} Dashboard calls, budget is {2}\n{3}'.format(
+            profile.name or 'profile', profile.count(), profile.budget, profile.render())
+
+    def __str__(self):
+        return self.message
+
+
+class RateLimiter(object):
+    #
+    # Token bucket scheduler keyed per organization. Each call reserves a token and is told how long to wait for it,
+    # so bursts queue up and drain at the sustainable rate instead of being rejected by Dashboard with HTTP 429.
+    # Requests that do not name an organization in their URL are charged to the last organization used with the
+    # same API key, or to the API key itself until an organization has been seen.
+    #
+    orgpattern = re.compile(r'/organizations?/([^/?]+)')
+
+    def __init__(self, rate=5, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or rate)
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.orgs = {}
+        self.queued = {}
+        self.waited = {}
+        self.lastwait = {}
+        self.throttled = {}
+
+    def keyfor(self, apikey, url):
+        apikey = format(str(apikey))
+        match = self.orgpattern.search(url)
+        if match:
+            self.orgs[apikey] = match.group(1)
+            return match.group(1)
+        return self.orgs.get(apikey, apikey)
+
+    def __take(self, key, cost):
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate) - cost
+        self.buckets[key] = (tokens, now)
+        return tokens
+
+    def reserve(self, key):
+        #
+        # Take one token for key and return the seconds the caller must wait before sending, callers that are
+        # told to wait must call release(key) once they have
+        #
+        with self.lock:
+            tokens = self.__take(key, 1)
+            wait = -tokens / self.rate if tokens < 0 else 0.0
+            self.lastwait[key] = wait
+            if wait > 0:
+                self.queued[key] = self.queued.get(key, 0) + 1
+                self.waited[key] = self.waited.get(key, 0.0) + wait
+            return wait
+
+    def release(self, key):
+        with self.lock:
+            self.queued[key] = self.queued.get(key, 1) - 1
+
+    def acquire(self, key):
+        wait = self.reserve(key)
+        if wait > 0:
+            time.sleep(wait)
+            self.release(key)
+        return wait
+
+    def throttle(self, key, retryafter):
+        #
+        # Dashboard answered 429, drain the bucket so the next token is only available after Retry-After seconds
+        #
+        with self.lock:
+            tokens = self.__take(key, 0)
+            self.buckets[key] = (min(tokens, 0.0) - retryafter * self.rate, time.monotonic())
+            self.throttled[key] = self.throttled.get(key, 0) + 1
+
+    def stats(self, key=None):
+        #
+        # Queue depth and wait time per organization, or for one organization if key is passed
+        #
+        with self.lock:
+            keys = [key] if key is not None else list(self.buckets)
+            return dict((k, {
+                'queued': self.queued.get(k, 0),
+                'waited': self.waited.get(k, 0.0),
+                'lastwait': self.lastwait.get(k, 0.0),
+                'throttled': self.throttled.get(k, 0)
+            }) for k in keys)
+
+
+#
+# Minimal response object carrying the attributes the return handler reads, used for cached and asyncio responses
+#
+DashboardResponse = collections.namedtuple('DashboardResponse', ['status_code', 'text', 'headers'])
+
+
+class ResponseCache(object):
+    #
+    # Read-through LRU cache of successful GET responses, keyed by API key and URL and expiring after ttl seconds.
+    # Passing path also persists entries to a shelve database so they survive restarts. Any write through the client
+    # invalidates cached URLs that are ancestors or descendants of the written URL, so updating a device drops its
+    # detail and its network's device list.
+    #
+    def __init__(self, maxsize=1024, ttl=60, path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+        self.disk = shelve.open(path) if path is not None else None
+
+    @staticmethod
+    def key(apikey, url):
+        return '{0} {1}'.format(url, format(str(apikey)))
+
+    def get(self, apikey, url):
+        key = self.key(apikey, url)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None and self.disk is not None:
+                entry = self.disk.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                self.__drop(key)
+                return None
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            return DashboardResponse(entry[1], entry[2], {})
+
+    def set(self, apikey, url, response):
+        if response.status_code != 200:
+            return
+        key = self.key(apikey, url)
+        entry = (time.time() + self.ttl, response.status_code, response.text)
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            if self.disk is not None:
+                self.disk[key] = entry
+            while len(self.entries) > self.maxsize:
+                oldest = next(iter(self.entries))
+                self.__drop(oldest)
+
+    def invalidate(self, url):
+        path = url.split('?', 1)[0].rstrip('/')
+        with self.lock:
+            keys = list(self.entries)
+            if self.disk is not None:
+                keys = set(keys).union(self.disk.keys())
+            for key in keys:
+                cached = key.split(' ', 1)[0].split('?', 1)[0]
+                if cached == path or path.startswith(cached + '/') or cached.startswith(path + '/'):
+                    self.__drop(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            if self.disk is not None:
+                self.disk.clear()
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+    def __drop(self, key):
+        self.entries.pop(key, None)
+        if self.disk is not None and key in self.disk:
+            del self.disk[key]
+
+
+def retryafter(response, default=1.0):
+    #
+    # Seconds to back off after a 429 response, from its Retry-After header when present
     #
     try:
-        json_object = json.loads(myjson)
-    except ValueError:
-        return False
-    return True
+        return max(float(response.headers.get('Retry-After', default)), 0.0)
+    except (TypeError, ValueError):
+        return default
 
 
-def __isvalidtz(tz):
+class RetryPolicy(object):
     #
-    # Validates if TZ exists in accepted TZ list
+    # Exponential backoff with full jitter for transient failures (5xx responses, connection errors and timeouts).
+    # A call is retried at most retries times and never past deadline seconds after its first attempt.
     #
-    validtz = False
+    retrystatus = frozenset([500, 502, 503, 504])
 
-    for zone in tzlist:
-        if validtz is False and format(str(tz)) == zone:
-            validtz = True
-            break
+    def __init__(self, retries=3, backoff=0.5, maxbackoff=8.0, deadline=30.0):
+        self.retries = retries
+        self.backoff = backoff
+        self.maxbackoff = maxbackoff
+        self.deadline = deadline
+
+    def retryable(self, statuscode):
+        return statuscode in self.retrystatus
+
+    def nextdelay(self, attempt, started):
+        #
+        # Seconds to sleep before retry number attempt + 1, or None once the retry budget or deadline is spent
+        #
+        if attempt >= self.retries:
+            return None
+        delay = random.uniform(0, min(self.maxbackoff, self.backoff * 2 ** attempt))
+        if time.monotonic() - started + delay > self.deadline:
+            return None
+        return delay
+
+
+class Metrics(object):
+    #
+    # Collects per-endpoint Dashboard API latency histograms, response status counts, retries, cache hits and bytes
+    # transferred, plus result counts per calltype from the return handler. Install one with setmetrics() and every
+    # client in the process records into it. URLs are reduced to endpoint templates by replacing path segments that
+    # contain digits (organization, network and template IDs, serials, port numbers) with {id}.
+    #
+    buckets = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    idpattern = re.compile(r'^[^/]*\d[^/]*$')
+    prefixpattern = re.compile(r'^(?:[a-z]+://[^/]+)?(?:/api/v\d+)?')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.latency = {}
+            self.responses = {}
+            self.retries = {}
+            self.cachehits = {}
+            self.sent = {}
+            self.received = {}
+            self.calls = {}
+
+    @classmethod
+    def endpoint(cls, url):
+        path = cls.prefixpattern.sub('', url.split('?', 1)[0], 1)
+        return '/'.join('{id}' if cls.idpattern.match(segment) else segment for segment in path.split('/'))
+
+    @staticmethod
+    def payloadsize(data):
+        #
+        # Bytes on the wire for a request body, str payloads are sent UTF-8 encoded
+        #
+        if data is None:
+            return 0
+        if isinstance(data, str):
+            return len(data.encode('utf-8'))
+        return len(data)
+
+    def observe(self, method, url, status, seconds, sent=0, received=0):
+        #
+        # Record one HTTP attempt, status is the response code or 'error' if no response arrived
+        #
+        key = (method, self.endpoint(url))
+        with self.lock:
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+            statuskey = key + (str(status),)
+            self.responses[statuskey] = self.responses.get(statuskey, 0) + 1
+            self.sent[key] = self.sent.get(key, 0) + sent
+            self.received[key] = self.received.get(key, 0) + received
+
+    def retried(self, method, url, reason):
+        #
+        # reason is 'throttled' for 429s, 'status' for retryable 5xx responses and 'connection' for network errors
+        #
+        key = (method, self.endpoint(url), reason)
+        with self.lock:
+            self.retries[key] = self.retries.get(key, 0) + 1
+
+    def cachehit(self, url):
+        key = ('GET', self.endpoint(url))
+        with self.lock:
+            self.cachehits[key] = self.cachehits.get(key, 0) + 1
+
+    def handled(self, calltype, statuscode):
+        key = (str(calltype), str(statuscode))
+        with self.lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+
+    def render(self):
+        #
+        # Prometheus text exposition format
+        #
+        lines = []
+
+        def header(name, kind, text):
+            lines.append('# HELP {0} {1}'.format(name, text))
+            lines.append('# TYPE {0} {1}'.format(name, kind))
+
+        def sample(name, labels, value):
+            lines.append('{0}{{{1}}} {2}'.format(name, ','.join('{0}="{1}"'.format(
+                label, str(labelvalue).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                for label, labelvalue in labels), value))
+
+        def counter(name, text, series, labelnames):
+            header(name, 'counter', text)
+            for key, value in sorted(series.items()):
+                sample(name, zip(labelnames, key), value)
+
+        with self.lock:
+            name = 'meraki_api_request_duration_seconds'
+            header(name, 'histogram', 'Dashboard API request latency per attempt')
+            for (method, endpoint), (counts, total, count) in sorted(self.latency.items()):
+                labels = [('method', method), ('endpoint', endpoint)]
+                for bound, bucketcount in zip(self.buckets, counts):
+                    sample(name + '_bucket', labels + [('le', repr(bound))], bucketcount)
+                sample(name + '_bucket', labels + [('le', '+Inf')], count)
+                sample(name + '_sum', labels, total)
+                sample(name + '_count', labels, count)
+            counter('meraki_api_responses_total', 'Dashboard API responses by status code', self.responses,
+                    ['method', 'endpoint', 'status'])
+            counter('meraki_api_retries_total', 'Dashboard API requests sent again, by reason', self.retries,
+                    ['method', 'endpoint', 'reason'])
+            counter('meraki_api_cache_hits_total', 'Dashboard API reads served from the response cache',
+                    self.cachehits, ['method', 'endpoint'])
+            counter('meraki_api_sent_bytes_total', 'Request body bytes sent to the Dashboard API', self.sent,
+                    ['method', 'endpoint'])
+            counter('meraki_api_received_bytes_total', 'Response body bytes received from the Dashboard API',
+                    self.received, ['method', 'endpoint'])
+            counter('meraki_api_calls_total', 'Dashboard API results by calltype and status code', self.calls,
+                    ['calltype', 'status'])
+        return '\n'.join(lines) + '\n'
+
+
+class DashboardClient(object):
+    #
+    # Owns a pooled keep-alive requests.Session so consecutive Dashboard calls reuse open TCP/TLS connections
+    # instead of handshaking with dashboard.meraki.com on every call. Request headers are built once per API key.
+    # Every request waits for a token from the per-organization RateLimiter and 429 responses are re-sent after
+    # their Retry-After delay, up to throttleretries times. Transient failures are retried under retrypolicy for
+    # GETs and for writes the caller marks retry=True because repeating them is harmless (the PUT updates).
+    # With a ResponseCache installed, GETs made with cache=True are served from it and every write invalidates it.
+    # Every attempt is recorded in the Metrics collector installed with setmetrics(), if any, and every call in the
+    # enclosing profile() block, if there is one.
+    #
+    def __init__(self, poolsize=10, session=None, ratelimiter=None, throttleretries=5, retrypolicy=None,
+                 timeout=60, cache=None):
+        self.poolsize = poolsize
+        self.ratelimiter = ratelimiter if ratelimiter is not None else RateLimiter()
+        self.throttleretries = throttleretries
+        self.retrypolicy = retrypolicy if retrypolicy is not None else RetryPolicy()
+        self.timeout = timeout
+        self.cache = cache
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=poolsize, pool_maxsize=poolsize)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        self.session = session
+        self.headers = {}
+
+    def getheaders(self, apikey):
+        apikey = format(str(apikey))
+        headers = self.headers.get(apikey)
+        if headers is None:
+            headers = {
+                'x-cisco-meraki-api-key': apikey,
+                'Content-Type': 'application/json'
+            }
+            self.headers[apikey] = headers
+        return headers
+
+    def request(self, method, apikey, url, data=None, retry=None, cache=False):
+        current = currentprofile()
+        started = time.monotonic()
+        cached = cache and method == 'GET' and self.cache is not None
+        response = self.cache.get(apikey, url) if cached else None
+        if response is None:
+            try:
+                response = self.send(method, apikey, url, data=data, retry=retry)
+            except Exception:
+                if current is not None:
+                    current.record(method, url, 'error', time.monotonic() - started, False)
+                raise
+            if cached:
+                self.cache.set(apikey, url, response)
+            elif self.cache is not None and method != 'GET':
+                self.cache.invalidate(url)
+            cached = False
+        elif getmetrics() is not None:
+            getmetrics().cachehit(url)
+        if current is not None:
+            current.record(method, url, response.status_code, time.monotonic() - started, cached)
+        return response
+
+    def send(self, method, apikey, url, data=None, retry=None):
+        if retry is None:
+            retry = method == 'GET'
+        key = self.ratelimiter.keyfor(apikey, url)
+        started = time.monotonic()
+        attempt = 0
+        throttled = 0
+        while True:
+            self.ratelimiter.acquire(key)
+            metrics = getmetrics()
+            sent = time.monotonic()
+            try:
+                response = self.session.request(method, url, data=data, headers=self.getheaders(apikey),
+                                                timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if metrics is not None:
+                    metrics.observe(method, url, 'error', time.monotonic() - sent, Metrics.payloadsize(data))
+                if logger.isEnabledFor(logging.DEBUG):
+                    logattempt(method, url, 'error', time.monotonic() - sent, attempt + throttled)
+                delay = self.retrypolicy.nextdelay(attempt, started) if retry else None
+                if delay is None:
+                    raise
+                if metrics is not None:
+                    metrics.retried(method, url, 'connection')
+                if logger.isEnabledFor(logging.INFO):
+                    logretry(method, url, 'connection', delay)
+                attempt += 1
+                time.sleep(delay)
+                continue
+            if metrics is not None:
+                metrics.observe(method, url, response.status_code, time.monotonic() - sent, Metrics.payloadsize(data),
+                                len(response.content))
+            if logger.isEnabledFor(logging.DEBUG):
+                logattempt(method, url, response.status_code, time.monotonic() - sent, attempt + throttled)
+            if response.status_code == 429 and throttled < self.throttleretries:
+                throttled += 1
+                if metrics is not None:
+                    metrics.retried(method, url, 'throttled')
+                if logger.isEnabledFor(logging.INFO):
+                    logretry(method, url, 'throttled', retryafter(response))
+                self.ratelimiter.throttle(key, retryafter(response))
+                continue
+            if retry and self.retrypolicy.retryable(response.status_code):
+                delay = self.retrypolicy.nextdelay(attempt, started)
+                if delay is not None:
+                    if metrics is not None:
+                        metrics.retried(method, url, 'status')
+                    if logger.isEnabledFor(logging.INFO):
+                        logretry(method, url, 'status', delay)
+                    attempt += 1
+                    time.sleep(delay)
+                    continue
+            return response
+
+    def get(self, apikey, url, cache=False):
+        return self.request('GET', apikey, url, cache=cache)
+
+    def post(self, apikey, url, data=None, retry=False):
+        return self.request('POST', apikey, url, data=data, retry=retry)
+
+    def put(self, apikey, url, data=None, retry=False):
+        return self.request('PUT', apikey, url, data=data, retry=retry)
+
+    def delete(self, apikey, url, retry=False):
+        return self.request('DELETE', apikey, url, retry=retry)
+
+    def invalidate(self, url=None):
+        #
+        # Drop cached responses related to url, or the whole cache if no url is passed
+        #
+        if self.cache is None:
+            return
+        if url is None:
+            self.cache.clear()
         else:
-            validtz = False
+            self.cache.invalidate(url)
+
+    def close(self):
+        self.session.close()
+
+
+__client = None
+
 
-    if validtz is False:
-        raise ValueError(
-            'Please enter a valid tz value from https://en.wikipedia.org/wiki/List_of_tz_database_time_zones')
+def getclient():
+    #
+    # Return the DashboardClient every API call in this module is routed through, creating a default one on first use
+    #
+    global __client
+    if __client is None:
+        __client = DashboardClient()
+    return __client
+
+
+def setclient(client):
+    #
+    # Inject the DashboardClient used by every API call in this module, returns the previously installed client
+    #
+    global __client
+    previous = __client
+    __client = client
+    return previous
+
+
+__metrics = None
+
+
+def getmetrics():
+    #
+    # Return the installed Metrics collector, or None when instrumentation is off (the default)
+    #
+    return __metrics
+
+
+def setmetrics(metrics):
+    #
+    # Install the Metrics collector every Dashboard client in the process records into, None turns recording off.
+    # Returns the previously installed collector.
+    #
+    global __metrics
+    previous = __metrics
+    __metrics = metrics
+    return previous
+
+
+#
+# Every Dashboard call and result is logged to the 'merakiapi' logger instead of printed. Nothing is emitted until the
+# application configures logging, for example with enablelogging(). Each record carries the correlation ID of the
+# request or job that made the call, set with correlation() and carried into worker threads by contextsubmit().
+#
+logger = logging.getLogger('merakiapi')
+logger.addHandler(logging.NullHandler())
+
+__correlationid = contextvars.ContextVar('merakiapi_correlationid', default=None)
+__logging = None
+
+
+def getcorrelationid():
+    return __correlationid.get()
+
+
+def setcorrelationid(value):
+    #
+    # Set the correlation ID for the current thread or asyncio task, returns a token for resetcorrelationid()
+    #
+    return __correlationid.set(value)
+
+
+def resetcorrelationid(token):
+    __correlationid.reset(token)
+
+
+@contextlib.contextmanager
+def correlation(value=None):
+    #
+    # Tag every record logged inside the block with value, a new random ID if none is passed
+    #
+    token = __correlationid.set(value if value is not None else '{0:016x}'.format(random.getrandbits(64)))
+    try:
+        yield __correlationid.get()
+    finally:
+        __correlationid.reset(token)
+
+
+def contextsubmit(pool, fn, *args, **kwargs):
+    #
+    # pool.submit() that runs fn with the caller's correlation ID, executor threads do not inherit it on their own
+    #
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def logattempt(method, url, status, seconds, attempt=0, level=logging.DEBUG):
+    #
+    # Log one HTTP attempt with its templated endpoint, status ('error' if no response arrived) and duration.
+    # Callers check logger.isEnabledFor(level) first so disabled logging costs nothing on the request path.
+    #
+    endpoint = Metrics.endpoint(url)
+    logger.log(level, '%s %s %s %.3fs', method, endpoint, status, seconds,
+               extra={'method': method, 'endpoint': endpoint, 'status': status, 'duration': round(seconds, 4),
+                      'attempt': attempt})
+
+
+def logretry(method, url, reason, delay):
+    #
+    # Log a call about to be re-sent after delay seconds, reason as for Metrics.retried()
+    #
+    logger.info('Retrying %s %s after %.2fs (%s)', method, Metrics.endpoint(url), delay, reason,
+                extra={'method': method, 'endpoint': Metrics.endpoint(url), 'reason': reason})
+
+
+class CorrelationFilter(logging.Filter):
+    #
+    # Copies the current correlation ID onto each record. Runs on the logging thread, before a QueueHandler hands the
+    # record to the listener thread where the ID would no longer be visible.
+    #
+    def filter(self, record):
+        if not hasattr(record, 'correlationid'):
+            record.correlationid = getcorrelationid()
+        return True
+
+
+class StructuredFormatter(logging.Formatter):
+    #
+    # One logfmt line per record: time, level, logger and message followed by whichever structured fields it carries
+    #
+    fields = ['correlationid', 'calltype', 'method', 'endpoint', 'status', 'duration', 'attempt', 'reason']
+
+    def format(self, record):
+        parts = [
+            'time={0}'.format(self.formatTime(record, '%Y-%m-%dT%H:%M:%S')),
+            'level={0}'.format(record.levelname.lower()),
+            'logger={0}'.format(record.name),
+            'msg={0}'.format(self.quote(record.getMessage()))
+        ]
+        for field in self.fields:
+            value = getattr(record, field, None)
+            if value is not None:
+                parts.append('{0}={1}'.format(field, self.quote(value)))
+        if record.exc_info:
+            parts.append('exc={0}'.format(self.quote(self.formatException(record.exc_info))))
+        return ' '.join(parts)
+
+    @staticmethod
+    def quote(value):
+        value = str(value)
+        if not value or any(c in value for c in ' "=\n'):
+            return '"{0}"'.format(value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        return value
+
+
+def enablelogging(level=logging.INFO, handler=None, queued=True):
+    #
+    # Send 'merakiapi' records at level and above to handler (stderr by default) as StructuredFormatter lines. With
+    # queued, callers only put records on an in-memory queue and a background QueueListener thread does the I/O, so
+    # worker threads never block on the output. Replaces any handler installed by an earlier call.
+    #
+    global __logging
+    disablelogging()
+    if handler is None:
+        handler = logging.StreamHandler(sys.stderr)
+    if handler.formatter is None:
+        handler.setFormatter(StructuredFormatter())
+    listener = None
+    installed = handler
+    if queued:
+        installed = logging.handlers.QueueHandler(queue.SimpleQueue())
+        listener = logging.handlers.QueueListener(installed.queue, handler, respect_handler_level=True)
+        listener.start()
+    installed.addFilter(CorrelationFilter())
+    logger.addHandler(installed)
+    logger.setLevel(level)
+    __logging = (installed, listener)
+    return handler
+
+
+def disablelogging():
+    #
+    # Remove the handler installed by enablelogging(), flushing records still queued for it
+    #
+    global __logging
+    if __logging is None:
+        return
+    installed, listener = __logging
+    __logging = None
+    logger.removeHandler(installed)
+    logger.setLevel(logging.NOTSET)
+    if listener is not None:
+        listener.stop()
+
+
+#
+# Profiling: profile() records every Dashboard call made inside it, from any thread started with contextsubmit(), with
+# the merakiapi function that made it, its duration and whether the response cache served it. Blocks nest into a call
+# tree. A budget caps the calls actually sent, so a test can fail when a workflow picks up an extra call per item:
+#
+#   with merakiapi.profile('AddDevice', budget=18) as calls:
+#       provisiondevices(...)
+#   print(calls.render())
+#
+__profile = contextvars.ContextVar('merakiapi_profile', default=None)
+
+
+class Profile(object):
+    #
+    # The calls of one profile() block. Calls from nested blocks are kept on those children and included in every
+    # total of this profile.
+    #
+    clientmethods = frozenset(['request', 'send', 'get', 'post', 'put', 'delete'])
+
+    def __init__(self, name=None, budget=None):
+        self.name = name
+        self.budget = budget
+        self.calls = []
+        self.children = []
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.elapsed = None
+
+    def record(self, method, url, status, seconds, cached):
+        #
+        # Called by the Dashboard clients for each call, the caller is the first frame outside the client methods
+        #
+        frame = sys._getframe(1)
+        while frame is not None and frame.f_code.co_name in self.clientmethods:
+            frame = frame.f_back
+        call = {
+            'function': frame.f_code.co_name if frame is not None else None,
+            'method': method,
+            'url': url,
+            'endpoint': Metrics.endpoint(url),
+            'status': status,
+            'seconds': seconds,
+            'cached': cached
+        }
+        with self.lock:
+            self.calls.append(call)
+
+    def adopt(self, child):
+        with self.lock:
+            self.children.append(child)
+
+    def allcalls(self):
+        with self.lock:
+            calls, children = list(self.calls), list(self.children)
+        for child in children:
+            calls.extend(child.allcalls())
+        return calls
+
+    def count(self, cached=False):
+        #
+        # Number of calls sent to the Dashboard, cached=True counts cache hits instead and None counts both
+        #
+        return sum(1 for call in self.allcalls() if cached is None or call['cached'] == cached)
+
+    def repeated(self):
+        #
+        # GETs of the same URL sent more than once, the usual sign of a lookup repeated inside a loop.
+        # Returns {(method, url): times sent}.
+        #
+        counts = collections.Counter((call['method'], call['url']) for call in self.allcalls()
+                                     if call['method'] == 'GET' and not call['cached'])
+        return dict((key, count) for key, count in counts.items() if count > 1)
+
+    def tree(self):
+        with self.lock:
+            calls, children = list(self.calls), list(self.children)
+        return {
+            'name': self.name,
+            'budget': self.budget,
+            'sent': self.count(),
+            'cached': self.count(cached=True),
+            'seconds': self.elapsed if self.elapsed is not None else time.monotonic() - self.started,
+            'calls': calls,
+            'children': [child.tree() for child in children]
+        }
+
+    def render(self, tree=None, depth=0):
+        #
+        # The call tree as indented text, one line per profile block and per call in the order they finished
+        #
+        tree = tree if tree is not None else self.tree()
+        pad = '  ' * depth
+        lines = ['{0}{1}: {2} sent, {3} cached, {4:.3f} s{5}'.format(
+            pad, tree['name'] or 'profile', tree['sent'], tree['cached'], tree['seconds'],
+            ', budget {0}'.format(tree['budget']) if tree['budget'] is not None else '')]
+        for call in tree['calls']:
+            lines.append('{0}  {1:<24} {2:<6} {3:<48} {4:>5} {5:>8.3f} s{6}'.format(
+                pad, call['function'], call['method'], call['endpoint'], call['status'], call['seconds'],
+                ' cached' if call['cached'] else ''))
+        for child in tree['children']:
+            lines.append(self.render(child, depth + 1))
+        return '\n'.join(lines)
+
+    def check(self):
+        if self.budget is not None and self.count() > self.budget:
+            raise CallBudgetExceeded(self)
+
+
+def currentprofile():
+    return __profile.get()
+
+
+@contextlib.contextmanager
+def profile(name=None, budget=None):
+    #
+    # Record the Dashboard calls made inside the block, yields the Profile. Raises CallBudgetExceeded on leaving the
+    # block if more than budget calls were sent. Calls still running in other threads when the block ends are recorded
+    # but not checked.
+    #
+    parent = __profile.get()
+    current = Profile(name, budget)
+    if parent is not None:
+        parent.adopt(current)
+    token = __profile.set(current)
+    try:
+        yield current
+    finally:
+        __profile.reset(token)
+        current.elapsed = time.monotonic() - current.started
+    current.check()
+
+
+def profiled(name=None, budget=None):
+    #
+    # Decorator form of profile(), each call of the function runs in its own profile named after it by default
+    #
+    def decorate(function):
+        @functools.wraps(function)
+        def run(*args, **kwargs):
+            with profile(name or function.__name__, budget):
+                return function(*args, **kwargs)
+        return run
+    return decorate
+
+
+def setjsonbackend(loads, dumps, name='custom'):
+    #
+    # Install a different JSON loads/dumps pair for every response and payload handled by this module
+    #
+    global jsonbackend, __jsonloads, __jsondumps
+    jsonbackend = name
+    __jsonloads = loads
+    __jsondumps = dumps
+
+
+def jsondecode(text):
+    return __jsonloads(text)
+
+
+def jsonencode(obj):
+    return __jsondumps(obj)
+
+
+#
+# Result of decoding a Dashboard response body once: data is the parsed body when valid is True, errors holds the
+# body's 'errors' entry when it has one and is None otherwise
+#
+DecodedResponse = collections.namedtuple('DecodedResponse', ['statuscode', 'data', 'valid', 'errors'])
+
+
+def decoderesponse(statuscode, returntext):
+    #
+    # Parse a response body exactly once, invalid or empty bodies are returned undecoded with valid set to False
+    #
+    try:
+        data = __jsonloads(returntext)
+    except (ValueError, TypeError):
+        return DecodedResponse(statuscode, returntext, False, None)
+    errors = None
+    if isinstance(data, dict) and 'errors' in data:
+        errors = data['errors']
+    return DecodedResponse(statuscode, data, True, errors)
+
+
+def __isvalidtz(tz):
+    #
+    # Validates if TZ exists in accepted TZ list
+    #
+    validation.validtz(tz)
 
     return None
 
@@ -725,34 +1041,362 @@ def __comparelist(*args):
 
 def __hasorgaccess(apikey, targetorg):
     #
-    # Validate if API Key has access to passed Organization ID
+    # Validate if API Key has access to passed Organization ID. The organizations visible to each API key are
+    # memoized for orgaccessttl seconds so a burst of org-level calls only fetches /organizations once
     #
-    geturl = '{0}/organizations'.format(str(base_url))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
+    orgs = cachedorgaccess(apikey)
+    if orgs is None:
+        dashboard = getclient().get(apikey, organizationsurl())
+        orgs = recordorgaccess(apikey, dashboard.text)
+        if orgs is None:
+            return None
 
-    dashboard = requests.get(geturl, headers=headers)
-    currentorgs = json.loads(dashboard.text)
-    orgs = []
-    validjson = __isjson(dashboard.text)
-    if validjson is True:
-        for org in currentorgs:
-            if int(org['id']) == int(targetorg):
-                orgs.append(org['id'])
-                return None
-            else:
-                pass
-        raise OrgPermissionError
+    if int(targetorg) in orgs:
+        return None
+    raise OrgPermissionError
+
+
+def cachedorgaccess(apikey):
+    #
+    # Return the memoized organization ID set for an API key, or None if it is missing or older than orgaccessttl
+    #
+    cached = __orgaccesscache.get(format(str(apikey)))
+    if cached is not None and time.monotonic() - cached[0] < orgaccessttl:
+        return cached[1]
+    return None
+
+
+def recordorgaccess(apikey, returntext):
+    #
+    # Memoize the organization IDs in a /organizations response body, returns None if the body is not an org list
+    #
+    try:
+        currentorgs = __jsonloads(returntext)
+    except ValueError:
+        return None
+    if not isinstance(currentorgs, list):
+        return None
+    orgs = frozenset(int(org['id']) for org in currentorgs)
+    __orgaccesscache[format(str(apikey))] = (time.monotonic(), orgs)
+    return orgs
+
+
+def setorgaccessttl(seconds):
+    #
+    # Set how long organization access checks are memoized, 0 disables memoization
+    #
+    global orgaccessttl
+    orgaccessttl = seconds
+
+
+def invalidateorgaccess(apikey=None):
+    #
+    # Drop memoized organization access for one API key, or for every key if none is passed
+    #
+    if apikey is None:
+        __orgaccesscache.clear()
+    else:
+        __orgaccesscache.pop(format(str(apikey)), None)
+
+
+def indexnetworks(orgid, networks):
+    #
+    # Replace an organization's network name index with the networks in a getnetworklist result
+    #
+    index = dict((network['name'], network['id']) for network in networks)
+    with __networkindexlock:
+        __networkindex[format(str(orgid))] = index
+
+
+def recordnetwork(network, orgid=None):
+    #
+    # Add or rename one network in its organization's name index, orgid is only needed if the network object does not
+    # carry an organizationId. Organizations that have not been indexed yet are left alone.
+    #
+    orgid = format(str(network.get('organizationId', orgid)))
+    with __networkindexlock:
+        index = __networkindex.get(orgid)
+        if index is None:
+            return
+        for name in [name for name, networkid in index.items() if networkid == network['id']]:
+            del index[name]
+        index[network['name']] = network['id']
+
+
+def forgetnetwork(networkid):
+    #
+    # Remove a deleted network from every organization's name index
+    #
+    with __networkindexlock:
+        for index in __networkindex.values():
+            for name in [name for name, indexed in index.items() if indexed == networkid]:
+                del index[name]
+
+
+def networkidforname(apikey, orgid, name, suppressprint=True):
+    #
+    # Look up a network ID by name, listing the organization's networks only the first time it is asked about.
+    # Concurrent first lookups share one listing. Returns None if no network has that name.
+    #
+    return __loadnetworkindex(apikey, orgid, suppressprint).get(name)
+
+
+def networknameforid(apikey, orgid, networkid, suppressprint=True):
+    #
+    # Reverse of networkidforname from the same index, returns None if the organization has no such network
+    #
+    for name, indexed in __loadnetworkindex(apikey, orgid, suppressprint).items():
+        if indexed == networkid:
+            return name
     return None
 
 
+def __loadnetworkindex(apikey, orgid, suppressprint):
+    with __networkindexlock:
+        index = __networkindex.get(format(str(orgid)))
+    if index is None:
+        with __networkloadlock:
+            with __networkindexlock:
+                index = __networkindex.get(format(str(orgid)))
+            if index is None:
+                getnetworklist(apikey, orgid, suppressprint=suppressprint)
+        with __networkindexlock:
+            index = dict(__networkindex.get(format(str(orgid)), {}))
+    return index
+
+
+def invalidatenetworkindex(orgid=None):
+    #
+    # Drop the network name index for one organization, or for every organization if none is passed
+    #
+    with __networkindexlock:
+        if orgid is None:
+            __networkindex.clear()
+        else:
+            __networkindex.pop(format(str(orgid)), None)
+
+
+#
+# Where a serial is and how it is set up, as held by the serial index. networkid is None for a serial in the
+# organization's inventory but not in any network. name, tags, lat, lng and address are the network device's settings,
+# None until the device has been seen in a network. checked is the wall clock time the record was last read from the
+# Dashboard or written by this process.
+#
+DeviceRecord = collections.namedtuple('DeviceRecord', ['serial', 'orgid', 'networkid', 'model', 'name', 'tags', 'lat',
+                                                       'lng', 'address', 'checked'])
+
+
+def indexdevices(apikey, orgid, maxworkers=8, suppressprint=True):
+    #
+    # Replace an organization's serial index with one organization inventory listing plus the device lists of every
+    # network that holds a device, fetched up to maxworkers at once. Returns the number of serials indexed. Raises
+    # PageError if any listing fails, leaving the previous index in place.
+    #
+    orgid = format(str(orgid))
+    index = {}
+    checked = time.time()
+    for device in iterorginventory(apikey, orgid, suppressprint=suppressprint):
+        index[device['serial']] = DeviceRecord(device['serial'], orgid, device.get('networkId'), device.get('model'),
+                                               None, None, None, None, None, checked)
+    networkids = sorted(set(record.networkid for record in index.values() if record.networkid is not None))
+    if networkids:
+        def fetch(networkid):
+            return networkid, list(iternetworkdevices(apikey, networkid, suppressprint=suppressprint))
+
+        with ThreadPoolExecutor(max_workers=min(maxworkers, len(networkids))) as pool:
+            futures = [contextsubmit(pool, fetch, networkid) for networkid in networkids]
+            for future in futures:
+                networkid, devices = future.result()
+                for device in devices:
+                    index[device['serial']] = __devicerecord(index.get(device['serial']), device, orgid, networkid,
+                                                             checked)
+    with __deviceindexlock:
+        __deviceindex[orgid] = index
+    return len(index)
+
+
+def loaddevices(apikey, orgid, suppressprint=True):
+    #
+    # Build an organization's serial index unless it already is, concurrent callers share one build
+    #
+    orgid = format(str(orgid))
+    if not devicesindexed(orgid):
+        with __deviceloadlock:
+            if not devicesindexed(orgid):
+                indexdevices(apikey, orgid, suppressprint=suppressprint)
+
+
+def deviceforserial(apikey, orgid, serial, refresh=True, suppressprint=True):
+    #
+    # Look up a serial's DeviceRecord, building the organization's serial index the first time it is asked about.
+    # Other processes and Dashboard users change devices too, so with refresh a serial the index does not hold, or
+    # whose record is older than deviceindexttl seconds, is read again with refreshdevice. Without refresh the index
+    # answers alone. Returns None if the serial is not in the organization's inventory.
+    #
+    loaddevices(apikey, orgid, suppressprint)
+    with __deviceindexlock:
+        record = __deviceindex.get(format(str(orgid)), {}).get(serial)
+    if refresh and (record is None or record.checked < time.time() - deviceindexttl):
+        record = refreshdevice(apikey, orgid, serial, record, suppressprint)
+    return record
+
+
+def refreshdevice(apikey, orgid, serial, record=None, suppressprint=True):
+    #
+    # Read one serial's DeviceRecord from the Dashboard and store it in the organization's serial index if there is
+    # one. The device is read in the network record, or else the index, last saw it in, and if it is not there the
+    # organization inventory is scanned for it. Returns None if the serial is not in the organization's inventory.
+    #
+    orgid = format(str(orgid))
+    if record is None:
+        with __deviceindexlock:
+            record = __deviceindex.get(orgid, {}).get(serial)
+    if record is not None and record.networkid is not None:
+        device = __readdevice(apikey, record.networkid, serial, suppressprint)
+        if device is not None:
+            return __storedevice(orgid, serial, __devicerecord(record, device, orgid, record.networkid, time.time()))
+    for device in iterorginventory(apikey, orgid, suppressprint=suppressprint):
+        if device['serial'] == serial:
+            break
+    else:
+        return __storedevice(orgid, serial, None)
+    record = DeviceRecord(serial, orgid, device.get('networkId'), device.get('model'), None, None, None, None, None,
+                          time.time())
+    if record.networkid is not None:
+        detail = __readdevice(apikey, record.networkid, serial, suppressprint)
+        if detail is not None:
+            record = __devicerecord(record, detail, orgid, record.networkid, time.time())
+    return __storedevice(orgid, serial, record)
+
+
+def setdeviceindexttl(seconds):
+    #
+    # Set how old a serial index record may be before deviceforserial reads it again, 0 reads every lookup again
+    #
+    global deviceindexttl
+    deviceindexttl = seconds
+
+
+def devicesindexed(orgid):
+    with __deviceindexlock:
+        return format(str(orgid)) in __deviceindex
+
+
+def recorddevice(device, networkid=None, orgid=None):
+    #
+    # Merge a Dashboard device object, as returned by getdevicedetail or updatedevice, into the serial index. orgid is
+    # only needed for a serial the index has not seen. Organizations that have not been indexed yet are left alone.
+    #
+    with __deviceindexlock:
+        orgid, index = __deviceindexfor(device['serial'], networkid, orgid)
+        if index is not None:
+            index[device['serial']] = __devicerecord(index.get(device['serial']), device, orgid,
+                                                     networkid or device.get('networkId'), time.time())
+
+
+def claimeddevice(serial, orgid):
+    #
+    # Add a serial just claimed into an indexed organization's inventory, a serial already held is left as it is
+    #
+    orgid = format(str(orgid))
+    with __deviceindexlock:
+        index = __deviceindex.get(orgid)
+        if index is not None and serial not in index:
+            index[serial] = DeviceRecord(serial, orgid, None, None, None, None, None, None, None, time.time())
+
+
+def movedevice(serial, networkid, orgid=None):
+    #
+    # Record a serial joining networkid, or leaving its network when networkid is None
+    #
+    with __deviceindexlock:
+        orgid, index = __deviceindexfor(serial, networkid, orgid)
+        if index is not None:
+            record = index.get(serial) or DeviceRecord(serial, orgid, None, None, None, None, None, None, None, 0.0)
+            index[serial] = record._replace(networkid=networkid)
+
+
+def forgetdevices(networkid):
+    #
+    # A deleted network's devices go back to unassigned inventory
+    #
+    with __deviceindexlock:
+        for index in __deviceindex.values():
+            for serial, record in list(index.items()):
+                if record.networkid == networkid:
+                    index[serial] = record._replace(networkid=None)
+
+
+def invalidatedeviceindex(orgid=None):
+    #
+    # Drop the serial index for one organization, or for every organization if none is passed
+    #
+    with __deviceindexlock:
+        if orgid is None:
+            __deviceindex.clear()
+        else:
+            __deviceindex.pop(format(str(orgid)), None)
+
+
+def __devicerecord(record, device, orgid, networkid, checked):
+    #
+    # DeviceRecord for a network device object, keeping what the index already knew for keys the object lacks
+    #
+    if record is None:
+        record = DeviceRecord(device['serial'], orgid, networkid, None, None, None, None, None, None, checked)
+    return record._replace(networkid=networkid, checked=checked,
+                           **dict((field, device[field]) for field in ('model', 'name', 'tags', 'lat', 'lng', 'address')
+                                  if field in device))
+
+
+def __readdevice(apikey, networkid, serial, suppressprint):
+    #
+    # The device object of serial in networkid, bypassing the response cache, None if it is not in that network
+    #
+    getclient().invalidate(devicedetailurl(networkid, serial))
+    device = getdevicedetail(apikey, networkid, serial, suppressprint=suppressprint)
+    return device if isinstance(device, dict) and device.get('serial') == serial else None
+
+
+def __storedevice(orgid, serial, record):
+    #
+    # Put a freshly read record into an indexed organization's serial index, None drops the serial. Returns record.
+    #
+    with __deviceindexlock:
+        index = __deviceindex.get(orgid)
+        if index is not None:
+            if record is None:
+                index.pop(serial, None)
+            else:
+                index[serial] = record
+    return record
+
+
+def __deviceindexfor(serial, networkid, orgid):
+    #
+    # The indexed organization a serial belongs to: the one already holding it, orgid, or the one whose network name
+    # index lists networkid. Called with __deviceindexlock held, returns (orgid, its serial index), the index is None
+    # if that organization is not indexed.
+    #
+    for indexedorg, index in __deviceindex.items():
+        if serial in index:
+            return indexedorg, index
+    if orgid is None and networkid is not None:
+        with __networkindexlock:
+            for indexedorg, networks in __networkindex.items():
+                if networkid in networks.values():
+                    orgid = indexedorg
+                    break
+    if orgid is None:
+        return None, None
+    return format(str(orgid)), __deviceindex.get(format(str(orgid)))
+
+
 def __validemail(emailaddress):
     #
     # Validate email address format
     #
-    if not re.match(r"[^@]+@[^@]+\.[^@]+", emailaddress):
+    if not validation.emailpattern.match(emailaddress):
         raise EmailFormatError
 
 
@@ -760,27 +1404,14 @@ def __validip(ip):
     #
     # Validate IP format
     #
-    try:
-        ip_address(ip)
-    except ValueError:
-        raise ValueError('Invalid IP Address')
+    validation.validip(ip)
 
 
 def __validsubnetip(subnetip):
     #
     # Validate correct subnet entry
     #
-    if not re.match(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}[/]\d{1,2}$", subnetip):
-        raise ValueError('Invalid Subnet IP Address {0} - Address must be formatted as #.#.#.#/#'.format(str(subnetip)))
-    else:
-        ip, netmask = str.split(subnetip, '/')
-
-    if int(netmask) < 1 or int(netmask) > 30:
-        raise ValueError('Invalid Subnet Mask Length {0} - Must be between 1 and 30'.format(str(subnetip)))
-    try:
-        ip_address(ip)
-    except ValueError:
-        raise ValueError('Invalid Subnet IP Address {0}'.format(str(subnetip)))
+    validation.validsubnet(subnetip)
 
 
 def __listtotag(taglist):
@@ -799,86 +1430,271 @@ def __listtotag(taglist):
     return liststr
 
 
-def __returnhandler(statuscode, returntext, objtype, suppressprint):
-    #
-    # Parses Dashboard return information and returns error data based on status code and error JSON
-    #
+def __report(suppressprint, level, objtype, statuscode, message):
+    #
+    # Log one __returnhandler outcome, message is formatted with objtype and statuscode. Calls made with suppressprint
+    # are logged at DEBUG instead of level. Costs a single level check when the record would be dropped.
+    #
+    if suppressprint is not False:
+        level = logging.DEBUG
+    if logger.isEnabledFor(level):
+        logger.log(level, message.format(objtype, statuscode), extra={'calltype': objtype, 'status': statuscode})
+
+
+def __returnhandler(statuscode, returntext, objtype, suppressprint):
+    #
+    # Parses Dashboard return information and returns error data based on status code and error JSON
+    #
+
+    if __metrics is not None:
+        __metrics.handled(objtype, statuscode)
+
+    decoded = decoderesponse(statuscode, returntext)
+    validreturn = decoded.valid
+    returntext = decoded.data
+    noerr = validreturn and decoded.errors is None
+    errmesg = decoded.errors if decoded.errors is not None else ''
+
+    if str(statuscode) == '200' and validreturn:
+        __report(suppressprint, logging.INFO, objtype, statuscode,
+                 '{0} Operation Successful - See returned data for results')
+        return returntext
+    elif str(statuscode) == '200':
+        __report(suppressprint, logging.INFO, objtype, statuscode, '{0} Operation Successful')
+        return None
+    elif str(statuscode) == '201' and validreturn:
+        __report(suppressprint, logging.INFO, objtype, statuscode,
+                 '{0} Added Successfully - See returned data for results')
+        return returntext
+    elif str(statuscode) == '201':
+        __report(suppressprint, logging.INFO, objtype, statuscode, '{0} Added Successfully')
+        return None
+    elif str(statuscode) == '204' and validreturn:
+        __report(suppressprint, logging.INFO, objtype, statuscode,
+                 '{0} Deleted Successfully - See returned data for results')
+        return returntext
+    elif str(statuscode) == '204':
+        __report(suppressprint, logging.INFO, objtype, statuscode, '{0} Deleted Successfully')
+        return None
+    elif str(statuscode) == '400' and validreturn and noerr is False:
+        __report(suppressprint, logging.WARNING, objtype, statuscode,
+                 'Bad Request - See returned data for error details')
+        return errmesg
+    elif str(statuscode) == '400' and validreturn and noerr:
+        __report(suppressprint, logging.WARNING, objtype, statuscode, 'Bad Request - See returned data for details')
+        return returntext
+    elif str(statuscode) == '400':
+        __report(suppressprint, logging.WARNING, objtype, statuscode,
+                 'Bad Request - No additional error data available')
+    elif str(statuscode) == '401' and validreturn and noerr is False:
+        __report(suppressprint, logging.WARNING, objtype, statuscode,
+                 'Unauthorized Access - See returned data for error details')
+        return errmesg
+    elif str(statuscode) == '401' and validreturn:
+        __report(suppressprint, logging.WARNING, objtype, statuscode, 'Unauthorized Access')
+        return returntext
+    elif str(statuscode) == '404' and validreturn and noerr is False:
+        __report(suppressprint, logging.WARNING, objtype, statuscode,
+                 'Resource Not Found - See returned data for error details')
+        return errmesg
+    elif str(statuscode) == '404' and validreturn:
+        __report(suppressprint, logging.WARNING, objtype, statuscode, 'Resource Not Found')
+        return returntext
+    elif str(statuscode) == '429' and validreturn and noerr is False:
+        __report(suppressprint, logging.WARNING, objtype, statuscode,
+                 'Rate Limit Exceeded - See returned data for error details')
+        return errmesg
+    elif str(statuscode) == '429':
+        __report(suppressprint, logging.WARNING, objtype, statuscode, 'Rate Limit Exceeded')
+        return 'HTTP 429 - Rate limit exceeded'
+    elif str(statuscode) == '500':
+        __report(suppressprint, logging.WARNING, objtype, statuscode, 'HTTP 500 - Server Error')
+        return returntext
+    elif validreturn and noerr is False:
+        __report(suppressprint, logging.WARNING, objtype, statuscode,
+                 'HTTP Status Code: {1} - See returned data for error details')
+        return errmesg
+    else:
+        __report(suppressprint, logging.WARNING, objtype, statuscode, 'HTTP Status Code: {1} - No returned data')
+        return 'noserial'
+
+
+def handleresponse(statuscode, returntext, objtype, suppressprint=False):
+    #
+    # Public entry point to __returnhandler, shared with merakiapi_async so both clients parse responses identically
+    #
+    return __returnhandler(statuscode, returntext, objtype, suppressprint)
+
+
+#
+# URL and payload builders shared by the blocking functions below and their merakiapi_async counterparts
+#
+def organizationsurl():
+    return '{0}/organizations'.format(str(base_url))
+
+
+def orginventoryurl(orgid):
+    return '{0}/organizations/{1}/inventory'.format(str(base_url), str(orgid))
+
+
+def networklisturl(orgid):
+    return '{0}/organizations/{1}/networks'.format(str(base_url), str(orgid))
+
+
+def templatesurl(orgid):
+    return '{0}/organizations/{1}/configTemplates'.format(str(base_url), str(orgid))
+
+
+def claimurl(orgid):
+    return '{0}/organization/{1}/claim'.format(str(base_url), str(orgid))
+
+
+def networkdetailurl(networkid):
+    return '{0}/networks/{1}'.format(str(base_url), str(networkid))
+
+
+def networkdevicesurl(networkid):
+    return '{0}/networks/{1}/devices'.format(str(base_url), str(networkid))
+
+
+def devicedetailurl(networkid, serial):
+    return '{0}/networks/{1}/devices/{2}'.format(str(base_url), str(networkid), str(serial))
+
+
+def adddevtoneturl(networkid):
+    return '{0}/networks/{1}/devices/claim'.format(str(base_url), str(networkid))
+
+
+def removedevfromneturl(networkid, serial):
+    return '{0}/networks/{1}/devices/{2}/remove'.format(str(base_url), str(networkid), str(serial))
+
+
+def bindtotemplateurl(networkid):
+    return '{0}/networks/{1}/bind'.format(str(base_url), str(networkid))
+
+
+def switchportsurl(serialnum):
+    return '{0}/devices/{1}/switchPorts'.format(str(base_url), str(serialnum))
+
+
+def switchportdetailurl(serialnum, portnum):
+    return '{0}/devices/{1}/switchPorts/{2}'.format(str(base_url), str(serialnum), str(portnum))
+
+
+def clientsurl(serialnum, timestamp):
+    return '{0}/devices/{1}/clients?timespan={2}'.format(str(base_url), str(serialnum), str(timestamp))
+
+
+def claimdata(serial=None, licensekey=None, licensemode=None, orderid=None):
+    postdata = {}
+    if (licensekey is None and licensemode is not None) or (licensemode is None and licensekey is not None):
+        raise AttributeError('If claiming a license key both license and licensemode attributes must be passed')
+
+    if serial is not None:
+        postdata['serial'] = serial
+    elif licensekey is not None and licensemode is not None:
+        postdata['license'] = serial
+        postdata['licenseMode'] = serial
+    elif orderid is not None:
+        postdata['orderId'] = orderid
+
+    return jsonencode(postdata)
+
+
+def networkdata(name, nettype, tags, tz):
+    __isvalidtz(tz)
+
+    postdata = {
+        'name': format(str(name)),
+        'type': format(str(nettype)),
+        'tags': format(str(tags)),
+        'timeZone': format(str(tz))
+    }
+    return jsonencode(postdata)
+
+
+def devicedata(name=None, tags=None, lat=None, lng=None, address=None, move=None):
+    # move needs to be str and not boolean 'true' or 'false' to work
+    putdata = {}
+
+    if name is not None:
+        putdata['name'] = name
+
+    if tags is not None:
+        putdata['tags'] = __listtotag(tags)
+
+    if lat and not lng:
+        raise ValueError('If latitude is entered a longitude '
+                         'value must also be entered')
+    elif lng and not lat:
+        raise ValueError('If longitude is entered a latitude '
+                         'value must also be entered')
+    else:
+        putdata['lat'] = lat
+        putdata['lng'] = lng
+
+    if address is not None:
+        putdata['address'] = address
+
+    if move:
+        putdata['moveMapMarker'] = move
+
+    return jsonencode(putdata)
+
+
+def switchportdata(name=None, tags=None, enabled=None, porttype=None, vlan=None, voicevlan=None, allowedvlans=None,
+                   poe=None, isolation=None, rstp=None, stpguard=None, accesspolicynum=None):
+    putdata = {}
+
+    if name:
+        putdata['name'] = str(name)
+
+    if tags:
+        putdata['tags'] = __listtotag(tags)
+
+    if enabled and (enabled is False or True):
+        putdata['enabled'] = str(enabled)
+    else:
+        raise ValueError("Enabled must be a boolean variable: %s" % enabled)
+
+    if porttype and porttype not in ['access', 'trunk']:
+        raise ValueError("Type must be either 'access' or 'trunk'")
+    elif porttype:
+        putdata['type'] = str(porttype)
+
+    if vlan:
+        putdata['vlan'] = str(vlan)
+
+    if voicevlan:
+        putdata['voiceVlan'] = voicevlan
+
+    if allowedvlans:
+        putdata['allowedVlans'] = allowedvlans
+
+    if poe and (poe is False or True):
+        putdata['poeEnabled'] = str(poe)
+    else:
+        raise ValueError("PoE enabled must be a boolean variable")
+
+    if isolation and (isolation is not False or not True):
+        raise ValueError("Port isolation enabled must be a bolean variable")
+    elif isolation:
+        putdata['isolation'] = isolation
 
-    validreturn = __isjson(returntext)
-    noerr = False
-    errmesg = ''
+    if rstp and (rstp is False or True):
+        putdata['rstpEnabled'] = rstp
+    else:
+        raise ValueError("RSTP enabled must be a boolean variable")
 
-    if validreturn:
-        returntext = json.loads(returntext)
+    if stpguard and stpguard not in ['disabled', 'root guard', 'BPDU guard']:
+        raise ValueError("Valid values for STP Guard are 'disabled', 'root guard',  or 'BPDU Guard'")
+    elif stpguard:
+        putdata['stpGuard'] = stpguard
 
-        try:
-            errmesg = returntext['errors']
-        except KeyError:
-            noerr = True
-        except TypeError:
-            noerr = True
+    if accesspolicynum:
+        putdata['accessPolicyNumber'] = accesspolicynum
 
-    if str(statuscode) == '200' and validreturn:
-        if suppressprint is False:
-            print('{0} Operation Successful - See returned data for results\n'.format(str(objtype)))
-        return returntext
-    elif str(statuscode) == '200':
-        if suppressprint is False:
-            print('{0} Operation Successful\n'.format(str(objtype)))
-        return None
-    elif str(statuscode) == '201' and validreturn:
-        if suppressprint is False:
-            print('{0} Added Successfully - See returned data for results\n'.format(str(objtype)))
-        return returntext
-    elif str(statuscode) == '201':
-        if suppressprint is False:
-            print('{0} Added Successfully\n'.format(str(objtype)))
-        return None
-    elif str(statuscode) == '204' and validreturn:
-        if suppressprint is False:
-            print('{0} Deleted Successfully - See returned data for results\n'.format(str(objtype)))
-        return returntext
-    elif str(statuscode) == '204':
-        print('{0} Deleted Successfully\n'.format(str(objtype)))
-        return None
-    elif str(statuscode) == '400' and validreturn and noerr is False:
-        if suppressprint is False:
-            print('Bad Request - See returned data for error details\n')
-        return errmesg
-    elif str(statuscode) == '400' and validreturn and noerr:
-        if suppressprint is False:
-            print('Bad Request - See returned data for details\n')
-        return returntext
-    elif str(statuscode) == '400':
-        if suppressprint is False:
-            print('Bad Request - No additional error data available\n')
-    elif str(statuscode) == '401' and validreturn and noerr is False:
-        if suppressprint is False:
-            print('Unauthorized Access - See returned data for error details\n')
-        return errmesg
-    elif str(statuscode) == '401' and validreturn:
-        if suppressprint is False:
-            print('Unauthorized Access')
-        return returntext
-    elif str(statuscode) == '404' and validreturn and noerr is False:
-        if suppressprint is False:
-            print('Resource Not Found - See returned data for error details\n')
-        return errmesg
-    elif str(statuscode) == '404' and validreturn:
-        if suppressprint is False:
-            print('Resource Not Found')
-        return returntext
-    elif str(statuscode) == '500':
-        if suppressprint is False:
-            print('HTTP 500 - Server Error')
-        return returntext
-    elif validreturn and noerr is False:
-        if suppressprint is False:
-            print('HTTP Status Code: {0} - See returned data for error details\n'.format(str(statuscode)))
-        return errmesg
-    else:
-        print('HTTP Status Code: {0} - No returned data\n'.format(str(statuscode)))
-        return 'noserial'
+    return jsonencode(putdata)
 
 
 def myorgaccess(apikey, suppressprint=False):
@@ -887,11 +1703,7 @@ def myorgaccess(apikey, suppressprint=False):
     #
     calltype = 'Organization'
     geturl = '{0}/organizations'.format(str(base_url))
-    headers = {
-        'X-Cisco-Meraki-API-Key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -902,11 +1714,7 @@ def myorgaccess(apikey, suppressprint=False):
 def getorg(apikey, orgid, suppressprint=False):
     calltype = 'Organization'
     geturl = '{0}/organizations/{1}'.format(str(base_url), str(orgid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -924,12 +1732,8 @@ def getorginventory(apikey, orgid, suppressprint=False):
     __hasorgaccess(apikey, orgid)
     calltype = 'Inventory'
 
-    geturl = '{0}/organizations/{1}/inventory'.format(str(base_url), str(orgid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    geturl = orginventoryurl(orgid)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -942,12 +1746,8 @@ def getnetworkdevices(apikey, networkid, suppressprint=True):
     # Get network inventory and return as decoded JSON string
     #
     calltype = 'Network'
-    geturl = '{0}/networks/{1}/devices'.format(str(base_url), str(networkid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    geturl = networkdevicesurl(networkid)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -966,11 +1766,7 @@ def getorgadmins(apikey, orgid, suppressprint=False):
     calltype = 'Organization'
 
     geturl = '{0}/organizations/{1}/admins'.format(str(base_url), str(orgid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -985,16 +1781,14 @@ def getnetworklist(apikey, orgid, suppressprint=False):
     __hasorgaccess(apikey, orgid)
     calltype = 'Network'
 
-    geturl = '{0}/organizations/{1}/networks'.format(str(base_url), str(orgid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    geturl = networklisturl(orgid)
+    dashboard = getclient().get(apikey, geturl, cache=True)
     #
     # Call return handler function to parse Dashboard response
     #
     result = __returnhandler(dashboard.status_code, dashboard.text, calltype, suppressprint)
+    if isinstance(result, list):
+        indexnetworks(orgid, result)
     return result
 
 
@@ -1006,11 +1800,7 @@ def getlicensestate(apikey, orgid, suppressprint=False):
     calltype = 'License'
 
     geturl = '{0}/organizations/{1}/licenseState'.format(str(base_url), str(orgid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1021,29 +1811,22 @@ def getlicensestate(apikey, orgid, suppressprint=False):
 def getdevicedetail(apikey, networkid, serialnumber, suppressprint=False):
 
     calltype = 'Device Detail'
-    geturl = '{0}/networks/{1}/devices/{2}'.format(str(base_url), str(networkid), str(serialnumber))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-
-    dashboard = requests.get(geturl, headers=headers)
+    geturl = devicedetailurl(networkid, serialnumber)
+    dashboard = getclient().get(apikey, geturl, cache=True)
     #
     # Call return handler function to parse Dashboard response
     #
     result = __returnhandler(dashboard.status_code, dashboard.text, calltype, suppressprint)
+    if isinstance(result, dict) and 'serial' in result:
+        recorddevice(result, networkid)
     return result
 
 def getdeviceuplinkdetail(apikey, networkid, serialnumber, suppressprint=False):
 
     calltype = 'Device Detail'
     geturl = '{0}/networks/{1}/devices/{2}/uplink'.format(str(base_url), str(networkid), str(serialnumber))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
 
-    dashboard = requests.get(geturl, headers=headers)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1053,12 +1836,8 @@ def getdeviceuplinkdetail(apikey, networkid, serialnumber, suppressprint=False):
 def getnetworkdetail(apikey, networkid, suppressprint=False):
 
     calltype = 'Network Detail'
-    geturl = '{0}/networks/{1}'.format(str(base_url), str(networkid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    geturl = networkdetailurl(networkid)
+    dashboard = getclient().get(apikey, geturl, cache=True)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1071,11 +1850,7 @@ def getnetworktrafficstats(apikey, networkid, timespan=86400, devicetype='combin
     calltype = 'Network Detail'
     geturl = '{0}/networks/{1}/traffic?timespan={2}&deviceType={3}'.format(str(base_url), str(networkid), str(timespan),
                                                                            str(devicetype))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1091,11 +1866,7 @@ def getnonmerakivpnpeers(apikey, orgid, suppressprint=False):
     calltype = 'Non-Meraki VPN'
 
     geturl = '{0}/organizations/{1}/thirdPartyVPNPeers'.format(str(base_url), str(orgid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1111,11 +1882,7 @@ def getsnmpsettings(apikey, orgid, suppressprint=False):
     calltype = 'SNMP Settings'
 
     geturl = '{0}/organizations/{1}/snmp'.format(str(base_url), str(orgid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1131,11 +1898,7 @@ def getsamlroles(apikey, orgid, suppressprint=False):
     calltype = 'SAML Roles'
 
     geturl = '{0}/organizations/{1}/samlRoles'.format(str(base_url), str(orgid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1151,11 +1914,7 @@ def getsamlroledetail(apikey, orgid, roleid, suppressprint=False):
     calltype = 'SAML Role Detail'
 
     geturl = '{0}/organizations/{1}/samlRoles/{2}'.format(str(base_url), str(orgid), str(roleid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1166,11 +1925,7 @@ def getsamlroledetail(apikey, orgid, roleid, suppressprint=False):
 def getswitchstacks(apikey, networkid, suppressprint=False):
     calltype = 'Switch Stacks'
     geturl = '{0}/networks/{1}/switchStacks'.format(str(base_url), str(networkid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1181,11 +1936,7 @@ def getswitchstacks(apikey, networkid, suppressprint=False):
 def getswitchstackmembers(apikey, networkid, stackid, suppressprint=False):
     calltype = 'Switch Stack Members'
     geturl = '{0}/networks/{1}/switchStacks/{2}'.format(str(base_url), str(networkid), str(stackid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1195,12 +1946,8 @@ def getswitchstackmembers(apikey, networkid, stackid, suppressprint=False):
 
 def getswitchports(apikey, serialnum, suppressprint=False):
     calltype = 'Switch Port'
-    geturl = '{0}/devices/{1}/switchPorts'.format(str(base_url), str(serialnum))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    geturl = switchportsurl(serialnum)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1210,12 +1957,8 @@ def getswitchports(apikey, serialnum, suppressprint=False):
 
 def getswitchportdetail(apikey, serialnum, portnum, suppressprint=False):
     calltype = 'Switch Port Detail'
-    geturl = '{0}/devices/{1}/switchPorts/{2}'.format(str(base_url), str(serialnum), str(portnum))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    geturl = switchportdetailurl(serialnum, portnum)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1226,11 +1969,7 @@ def getswitchportdetail(apikey, serialnum, portnum, suppressprint=False):
 def getssids(apikey, networkid, suppressprint=False):
     calltype = 'SSID'
     geturl = '{0}/networks/{1}/ssids'.format(str(base_url), str(networkid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    dashboard = getclient().get(apikey, geturl, cache=True)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1241,11 +1980,7 @@ def getssids(apikey, networkid, suppressprint=False):
 def getssiddetail(apikey, networkid, ssidnum, suppressprint=False):
     calltype = 'SSID Detail'
     geturl = '{0}/networks/{1}/ssids/{2}'.format(str(base_url), str(networkid), str(ssidnum))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1256,11 +1991,7 @@ def getssiddetail(apikey, networkid, ssidnum, suppressprint=False):
 def getvlans(apikey, networkid, suppressprint=False):
     calltype = 'VLANs'
     geturl = '{0}/networks/{1}/vlans'.format(str(base_url), str(networkid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    dashboard = getclient().get(apikey, geturl, cache=True)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1271,11 +2002,7 @@ def getvlans(apikey, networkid, suppressprint=False):
 def getvlandetail(apikey, networkid, vlanid, suppressprint=False):
     calltype = 'VLAN Detail'
     geturl = '{0}/networks/{1}/vlans/{2}'.format(str(base_url), str(networkid), str(vlanid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1290,12 +2017,8 @@ def gettemplates(apikey, orgid, suppressprint=False):
     __hasorgaccess(apikey, orgid)
     calltype = 'Templates'
 
-    geturl = '{0}/organizations/{1}/configTemplates'.format(str(base_url), str(orgid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    geturl = templatesurl(orgid)
+    dashboard = getclient().get(apikey, geturl, cache=True)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1305,12 +2028,8 @@ def gettemplates(apikey, orgid, suppressprint=False):
 
 def getclients(apikey, serialnum, timestamp=86400, suppressprint=True):
     calltype = 'Device Clients'
-    geturl = '{0}/devices/{1}/clients?timespan={2}'.format(str(base_url), str(serialnum), str(timestamp))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    geturl = clientsurl(serialnum, timestamp)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1318,17 +2037,63 @@ def getclients(apikey, serialnum, timestamp=86400, suppressprint=True):
     return result
 
 
+def nextpageurl(linkheader):
+    #
+    # Return the rel=next URL from a Link response header, or None on the last page
+    #
+    if not linkheader:
+        return None
+    match = __nextlinkpattern.search(linkheader)
+    if match:
+        return match.group(1)
+    return None
+
+
+def __iterpages(apikey, geturl, perpage, calltype, suppressprint):
+    #
+    # Follow Link header pagination from geturl, yielding records as each page arrives so only one page is held in
+    # memory at a time
+    #
+    geturl = '{0}{1}perPage={2}'.format(geturl, '&' if '?' in geturl else '?', str(perpage))
+    while geturl:
+        dashboard = getclient().get(apikey, geturl)
+        result = __returnhandler(dashboard.status_code, dashboard.text, calltype, suppressprint)
+        if not isinstance(result, list):
+            raise PageError('{0} page {1} returned {2}'.format(calltype, geturl, result))
+        for record in result:
+            yield record
+        geturl = nextpageurl(dashboard.headers.get('Link'))
+
+
+def iterorginventory(apikey, orgid, perpage=1000, suppressprint=True):
+    #
+    # Stream organization inventory one page at a time
+    #
+    __hasorgaccess(apikey, orgid)
+    return __iterpages(apikey, orginventoryurl(orgid), perpage, 'Inventory', suppressprint)
+
+
+def iternetworkdevices(apikey, networkid, perpage=1000, suppressprint=True):
+    #
+    # Stream network devices one page at a time
+    #
+    return __iterpages(apikey, networkdevicesurl(networkid), perpage, 'Network', suppressprint)
+
+
+def iterclients(apikey, serialnum, timestamp=86400, perpage=1000, suppressprint=True):
+    #
+    # Stream device clients one page at a time
+    #
+    return __iterpages(apikey, clientsurl(serialnum, timestamp), perpage, 'Device Clients', suppressprint)
+
+
 def bindtotemplate(apikey, networkid, templateid, autobind='false', suppressprint=False):
     calltype = 'Template Bind'
-    posturl = '{0}/networks/{1}/bind'.format(str(base_url), str(networkid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
+    posturl = bindtotemplateurl(networkid)
     postdata = {
         'configTemplateId': format(str(templateid))
     }
-    dashboard = requests.post(posturl, data=json.dumps(postdata), headers=headers)
+    dashboard = getclient().post(apikey, posturl, data=jsonencode(postdata))
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1338,57 +2103,38 @@ def bindtotemplate(apikey, networkid, templateid, autobind='false', suppressprin
 
 def adddevtonet(apikey, networkid, serial, suppressprint=False):
     calltype = 'Device'
-    posturl = '{0}/networks/{1}/devices/claim'.format(str(base_url), str(networkid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
+    posturl = adddevtoneturl(networkid)
     postdata = {
         'serial': format(str(serial))
     }
-    dashboard = requests.post(posturl, data=json.dumps(postdata), headers=headers)
+    dashboard = getclient().post(apikey, posturl, data=jsonencode(postdata))
     #
     # Call return handler function to parse Dashboard response
     #
     result = __returnhandler(dashboard.status_code, dashboard.text, calltype, suppressprint)
+    if str(dashboard.status_code) in ('200', '201', '204'):
+        movedevice(format(str(serial)), networkid)
     return result
 
 
 def claim(apikey, orgid, serial=None, licensekey=None, licensemode=None, orderid=None, suppressprint=False):
     calltype = 'Claim'
-    posturl = '{0}/organization/{1}/claim'.format(str(base_url), str(orgid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    postdata = {}
-    if (licensekey is None and licensemode is not None) or (licensemode is None and licensekey is not None):
-        raise AttributeError('If claiming a license key both license and licensemode attributes must be passed')
-
-    if serial is not None:
-        postdata['serial'] = serial
-    elif licensekey is not None and licensemode is not None:
-        postdata['license'] = serial
-        postdata['licenseMode'] = serial
-    elif orderid is not None:
-        postdata['orderId'] = orderid
-
-    dashboard = requests.post(posturl, data=json.dumps(postdata), headers=headers)
+    posturl = claimurl(orgid)
+    postdata = claimdata(serial, licensekey, licensemode, orderid)
+    dashboard = getclient().post(apikey, posturl, data=postdata)
     #
     # Call return handler function to parse Dashboard response
     #
     result = __returnhandler(dashboard.status_code, dashboard.text, calltype, suppressprint)
+    if serial is not None and str(dashboard.status_code) in ('200', '201', '204'):
+        claimeddevice(serial, orgid)
     return result
 
 
 def unbindfromtemplate(apikey, networkid, suppressprint=False):
     calltype = 'Network Unbind'
     posturl = '{0}/networks/{1}/unbind'.format(str(base_url), str(networkid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.post(posturl, headers=headers)
+    dashboard = getclient().post(apikey, posturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1404,11 +2150,7 @@ def deltemplate(apikey, orgid, templateid, suppressprint=False):
     calltype = 'Template'
 
     delurl = '{0}/organizations/{1}/configTemplates/{2}'.format(str(base_url), str(orgid), str(templateid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.delete(delurl, headers=headers)
+    dashboard = getclient().delete(apikey, delurl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1424,11 +2166,7 @@ def delsamlrole(apikey, orgid, roleid, suppressprint=False):
     calltype = 'SAML Role'
 
     delurl = '{0}/organizations/{1}/samlRoles/{2}'.format(str(base_url), str(orgid), str(roleid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.delete(delurl, headers=headers)
+    dashboard = getclient().delete(apikey, delurl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1439,10 +2177,6 @@ def delsamlrole(apikey, orgid, roleid, suppressprint=False):
 def updatevlan(apikey, networkid, vlanid, vlanname=None, mxip=None, subnetip=None, suppressprint=False):
     calltype = 'VLAN'
     puturl = '{0}/networks/{1}/vlans/{2}'.format(str(base_url), str(networkid), str(vlanid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
     putdata = {}
     if vlanname is not None:
         putdata['name'] = format(str(vlanname))
@@ -1451,8 +2185,8 @@ def updatevlan(apikey, networkid, vlanid, vlanname=None, mxip=None, subnetip=Non
     if subnetip is not None:
         putdata['subnet'] = format(str(subnetip))
 
-    putdata = json.dumps(putdata)
-    dashboard = requests.put(puturl, data=putdata, headers=headers)
+    putdata = jsonencode(putdata)
+    dashboard = getclient().put(apikey, puturl, data=putdata, retry=True)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1463,18 +2197,14 @@ def updatevlan(apikey, networkid, vlanid, vlanname=None, mxip=None, subnetip=Non
 def addvlan(apikey, networkid, vlanid, vlanname, mxip, subnetip, suppressprint=False):
     calltype = 'VLAN'
     posturl = '{0}/networks/{1}/vlans'.format(str(base_url), str(networkid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
     postdata = {
         'id': format(str(vlanid)),
         'name': format(str(vlanname)),
         'applianceIp': format(str(mxip)),
         'subnet': format(str(subnetip))
     }
-    postdata = json.dumps(postdata)
-    dashboard = requests.post(posturl, data=postdata, headers=headers)
+    postdata = jsonencode(postdata)
+    dashboard = getclient().post(apikey, posturl, data=postdata)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1485,11 +2215,7 @@ def addvlan(apikey, networkid, vlanid, vlanname, mxip, subnetip, suppressprint=F
 def delvlan(apikey, networkid, vlanid, suppressprint=False):
     calltype = 'VLAN'
     delurl = '{0}/networks/{1}/vlans/{2}'.format(str(base_url), str(networkid), str(vlanid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.delete(delurl, headers=headers)
+    dashboard = getclient().delete(apikey, delurl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1506,31 +2232,26 @@ def addadmin(apikey, orgid, email, name, orgaccess=None, tags=None, tagaccess=No
     calltype = 'Administrator'
 
     posturl = '{0}/organizations/{1}/admins'.format(str(base_url), str(orgid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
 
     posttags = []
 
     if orgaccess is None and tags is None and networks is None:
-        print("Administrator accounts must be granted access to either an Organization, Networks, or Tags")
+        logger.warning("Administrator accounts must be granted access to either an Organization, Networks, or Tags")
         return None
 
     if tags is not None and tagaccess is None:
-        print("If tags are defined you must define matching access arguments.\nFor example, tags = ['tag1', 'tag2'], "
-              "must have matching access arguments: tagaccess = 'full', 'read-only'")
+        logger.warning("If tags are defined you must define matching access arguments.\nFor example, tags = ['tag1', "
+                       "'tag2'], must have matching access arguments: tagaccess = 'full', 'read-only'")
         return None
     elif tagaccess is not None and tags is None:
-        print("If tag access levels are defined you must define matching tag arguments\nFor example, tags = "
-              "['tag1', 'tag2'] must have matching access arguments: tagaccess = 'full', 'read-only'")
+        logger.warning("If tag access levels are defined you must define matching tag arguments\nFor example, tags = "
+                       "['tag1', 'tag2'] must have matching access arguments: tagaccess = 'full', 'read-only'")
         return None
     elif tagaccess is None and tags is None:
         pass
     elif len(tags) != len(tagaccess):
-        print("The number of tags and access arguments must match.\n")
-        print("For example, tags = ['tag1', 'tag2'] must have matching access arguments: tagaccess = "
-              "['full', 'read-only']")
+        logger.warning("The number of tags and access arguments must match.\nFor example, tags = ['tag1', 'tag2'] "
+                       "must have matching access arguments: tagaccess = ['full', 'read-only']")
         return None
     elif tags is not None and tagaccess is not None:
         x = 0
@@ -1543,19 +2264,19 @@ def addadmin(apikey, orgid, email, name, orgaccess=None, tags=None, tagaccess=No
     postnets = []
 
     if networks is not None and netaccess is None:
-        print("If networks are defined you must define matching access arguments\nFor example networks = "
-              "['net1', 'net2'] must have matching access arguments: netaccess = 'full', 'read-only'")
+        logger.warning("If networks are defined you must define matching access arguments\nFor example networks = "
+                       "['net1', 'net2'] must have matching access arguments: netaccess = 'full', 'read-only'")
         return None
     elif netaccess is not None and networks is None:
-        print("If network access levels are defined you must define matching network arguments\nFor example, networks"
-              " = ['net1', 'net2'] must have matching access arguments: netaccess = 'full', 'read-only'")
+        logger.warning("If network access levels are defined you must define matching network arguments\nFor "
+                       "example, networks = ['net1', 'net2'] must have matching access arguments: netaccess = 'full', "
+                       "'read-only'")
         return None
     elif netaccess is None and networks is None:
         pass
     elif len(networks) != len(netaccess):
-        print("The number of networks and access arguments must match.\n")
-        print("For example, networks = ['net1', 'net2'] must have matching access arguments: netaccess = "
-              "['full', 'read-only']")
+        logger.warning("The number of networks and access arguments must match.\nFor example, networks = ['net1', "
+                       "'net2'] must have matching access arguments: netaccess = ['full', 'read-only']")
         return None
     elif networks is not None and netaccess is not None:
         x = 0
@@ -1596,7 +2317,7 @@ def addadmin(apikey, orgid, email, name, orgaccess=None, tags=None, tagaccess=No
             'tags': posttags,
             'networks': postnets
         }
-    dashboard = requests.post(posturl, data=json.dumps(postdata), headers=headers)
+    dashboard = getclient().post(apikey, posturl, data=jsonencode(postdata))
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1612,11 +2333,7 @@ def deladmin(apikey, orgid, adminid, suppressprint=False):
     calltype = 'Administrator'
 
     delurl = '{0}/organizations/{1}/admins/{2}'.format(str(base_url), str(orgid), str(adminid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.delete(delurl, headers=headers)
+    dashboard = getclient().delete(apikey, delurl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1631,41 +2348,48 @@ def addnetwork(apikey, orgid, name, nettype, tags, tz, suppressprint=False):
     __hasorgaccess(apikey, orgid)
     calltype = 'Network'
 
-    posturl = '{0}/organizations/{1}/networks'.format(str(base_url), str(orgid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-
-    __isvalidtz(tz)
-
-    postdata = {
-        'name': format(str(name)),
-        'type': format(str(nettype)),
-        'tags': format(str(tags)),
-        'timeZone': format(str(tz))
-    }
-    postdata = json.dumps(postdata)
-    dashboard = requests.post(posturl, data=postdata, headers=headers)
+    posturl = networklisturl(orgid)
+    postdata = networkdata(name, nettype, tags, tz)
+    dashboard = getclient().post(apikey, posturl, data=postdata)
     #
-    # Call return handler function to parse Dashboard response
+    # Call return handler function to parse Dashboard response, on success this is the created network object
     #
     result = __returnhandler(dashboard.status_code, dashboard.text, calltype, suppressprint)
+    if isinstance(result, dict) and 'id' in result:
+        recordnetwork(result, orgid)
     return result
 
 
+def addnetworkandbind(apikey, orgid, name, nettype, tags, tz, templateid=None, autobind='false',
+                      suppressprint=False):
+    #
+    # Create a network and, if templateid is passed, bind it to that configuration template. Returns the created
+    # network object with configTemplateId set once the bind succeeds, or the Dashboard error if creation failed.
+    #
+    network = addnetwork(apikey, orgid, name, nettype, tags, tz, suppressprint=suppressprint)
+    if not isinstance(network, dict) or 'id' not in network or not templateid:
+        return network
+    result = bindtotemplate(apikey, network['id'], templateid, autobind, suppressprint=suppressprint)
+    if result is None or isinstance(result, dict):
+        network['configTemplateId'] = format(str(templateid))
+    return network
+
+
 def delnetwork(apikey, networkid, suppressprint=False):
     calltype = 'Network'
     delurl = '{0}/networks/{1}'.format(str(base_url), str(networkid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.delete(delurl, headers=headers)
+    dashboard = getclient().delete(apikey, delurl)
     #
     # Call return handler function to parse Dashboard response
     #
     result = __returnhandler(dashboard.status_code, dashboard.text, calltype, suppressprint)
+    #
+    # Organization network lists are not under the network URL, drop every cached read
+    #
+    getclient().invalidate()
+    if str(dashboard.status_code) in ('200', '204'):
+        forgetnetwork(networkid)
+        forgetdevices(networkid)
     return result
 
 
@@ -1678,32 +2402,26 @@ def updateadmin(apikey, orgid, adminid, email, name=None, orgaccess=None, tags=N
     calltype = 'Administrator'
 
     puturl = '{0}/organizations/{1}/admins/{2}'.format(str(base_url), str(orgid), str(adminid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-        }
-
     puttags = []
 
     if orgaccess is None and tags is None and networks is None and name is None:
-        print("Administrator account updates must include Organization, Networks, or Tags permission changes or an "
-              "updated name attribute")
+        logger.warning("Administrator account updates must include Organization, Networks, or Tags permission changes "
+                       "or an updated name attribute")
         return None
 
     if tags is not None and tagaccess is None:
-        print("If tags are defined you must define matching access arguments.\nFor example, tags = ['tag1', 'tag2'], "
-              "must have matching access arguments: tagaccess = 'full', 'read-only'")
+        logger.warning("If tags are defined you must define matching access arguments.\nFor example, tags = ['tag1', "
+                       "'tag2'], must have matching access arguments: tagaccess = 'full', 'read-only'")
         return None
     elif tagaccess is not None and tags is None:
-        print("If tag access levels are defined you must define matching tag arguments\nFor example, tags = "
-              "['tag1', 'tag2'] must have matching access arguments: tagaccess = 'full', 'read-only'")
+        logger.warning("If tag access levels are defined you must define matching tag arguments\nFor example, tags = "
+                       "['tag1', 'tag2'] must have matching access arguments: tagaccess = 'full', 'read-only'")
         return None
     elif tagaccess is None and tags is None:
         pass
     elif len(tags) != len(tagaccess):
-        print("The number of tags and access arguments must match.\n")
-        print("For example, tags = ['tag1', 'tag2'] must have matching access arguments: tagaccess = "
-              "['full', 'read-only']")
+        logger.warning("The number of tags and access arguments must match.\nFor example, tags = ['tag1', 'tag2'] "
+                       "must have matching access arguments: tagaccess = ['full', 'read-only']")
         return None
     elif tags is not None and tagaccess is not None:
         x = 0
@@ -1716,19 +2434,19 @@ def updateadmin(apikey, orgid, adminid, email, name=None, orgaccess=None, tags=N
     putnets = []
 
     if networks is not None and netaccess is None:
-        print("If networks are defined you must define matching access arguments\nFor example networks = "
-              "['net1', 'net2'] must have matching access arguments: netaccess = 'full', 'read-only'")
+        logger.warning("If networks are defined you must define matching access arguments\nFor example networks = "
+                       "['net1', 'net2'] must have matching access arguments: netaccess = 'full', 'read-only'")
         return None
     elif netaccess is not None and networks is None:
-        print("If network access levels are defined you must define matching network arguments\nFor example, networks"
-              " = ['net1', 'net2'] must have matching access arguments: netaccess = 'full', 'read-only'")
+        logger.warning("If network access levels are defined you must define matching network arguments\nFor "
+                       "example, networks = ['net1', 'net2'] must have matching access arguments: netaccess = 'full', "
+                       "'read-only'")
         return None
     elif netaccess is None and networks is None:
         pass
     elif len(networks) != len(netaccess):
-        print("The number of networks and access arguments must match.\n")
-        print("For example, networks = ['net1', 'net2'] must have matching access arguments: netaccess = "
-              "['full', 'read-only']")
+        logger.warning("The number of networks and access arguments must match.\nFor example, networks = ['net1', "
+                       "'net2'] must have matching access arguments: netaccess = ['full', 'read-only']")
         return None
     elif networks is not None and netaccess is not None:
         x = 0
@@ -1795,7 +2513,7 @@ def updateadmin(apikey, orgid, adminid, email, name=None, orgaccess=None, tags=N
                 'networks': putnets
                 }
 
-    dashboard = requests.put(puturl, data=json.dumps(putdata), headers=headers)
+    dashboard = getclient().put(apikey, puturl, data=jsonencode(putdata), retry=True)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1806,11 +2524,7 @@ def updateadmin(apikey, orgid, adminid, email, name=None, orgaccess=None, tags=N
 def getvpnsettings(apikey, networkid, suppressprint=False):
     calltype = 'AutoVPN'
     geturl = '{0}/networks/{1}/siteToSiteVpn'.format(str(base_url), str(networkid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1822,10 +2536,6 @@ def updatevpnsettings(apikey, networkid, mode='None', subnets=None, usevpn=None,
                       suppressprint=False):
     calltype = 'AutoVPN'
     puturl = '{0}/networks/{1}/siteToSiteVpn'.format(str(base_url), str(networkid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
     __comparelist(hubnetworks, defaultroute)
     if hubnetworks is not None and defaultroute is not None:
         hubmodes = zip(hubnetworks, defaultroute)
@@ -1845,10 +2555,10 @@ def updatevpnsettings(apikey, networkid, mode='None', subnets=None, usevpn=None,
         subnets.append({'localSubnet': s, 'useVpn': i})
 
     putdata = {'mode': mode, 'hubs': hubs, 'subnets': subnets}
-    print(putdata)
+    logger.debug('Site-to-site VPN update: %s', putdata)
 
-    putdata = json.dumps(putdata)
-    dashboard = requests.put(puturl, data=putdata, headers=headers)
+    putdata = jsonencode(putdata)
+    dashboard = getclient().put(apikey, puturl, data=putdata, retry=True)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1870,10 +2580,6 @@ def updatenonmerakivpn(apikey, orgid, names, ips, secrets, remotenets, tags=None
     calltype = 'Non-Meraki VPN'
 
     puturl = '{0}/organizations/{1}/thirdPartyVPNPeers'.format(str(base_url), str(orgid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
 
     #
     # Will only upload peer information if lists are passed to the function, otherwise will fail.  If tags argument is
@@ -1908,8 +2614,8 @@ def updatenonmerakivpn(apikey, orgid, names, ips, secrets, remotenets, tags=None
     else:
         raise TypeError('All peer arguments must be passed as lists, tags argument may be excluded')
 
-    putdata = json.dumps(putdata)
-    dashboard = requests.put(puturl, data=putdata, headers=headers)
+    putdata = jsonencode(putdata)
+    dashboard = getclient().put(apikey, puturl, data=putdata, retry=True)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1920,11 +2626,7 @@ def updatenonmerakivpn(apikey, orgid, names, ips, secrets, remotenets, tags=None
 def getnonmerakivpn(apikey, orgid, suppressprint=False):
     calltype = 'Non-Meraki VPN'
     geturl = '{0}/organizations/{1}/thirdPartyVPNPeers'.format(str(base_url), str(orgid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.get(geturl, headers=headers)
+    dashboard = getclient().get(apikey, geturl)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -1947,12 +2649,8 @@ def appendnonmerakivpn(apikey, orgid, names, ips, secrets, remotenets, tags=None
 
     puturl = '{0}/organizations/{1}/thirdPartyVPNPeers'.format(str(base_url), str(orgid))
     geturl = '{0}/organizations/{1}/thirdPartyVPNPeers'.format(str(base_url), str(orgid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
 
-    currentpeers = json.loads(requests.get(geturl, headers=headers).text)
+    currentpeers = jsondecode(getclient().get(apikey, geturl).text)
 
     #
     # Will only upload peer information if lists are passed to the function, otherwise will fail.  If tags argument is
@@ -1997,8 +2695,8 @@ def appendnonmerakivpn(apikey, orgid, names, ips, secrets, remotenets, tags=None
             peer.clear()
     else:
         raise TypeError('All peer arguments must be passed as lists, tags argument may be excluded')
-    putdata = json.dumps(putdata)
-    dashboard = requests.put(puturl, data=putdata, headers=headers)
+    putdata = jsonencode(putdata)
+    dashboard = getclient().put(apikey, puturl, data=putdata, retry=True)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -2014,10 +2712,6 @@ def updatesnmpsettings(apikey, orgid, v2c=False, v3=False, v3authmode='SHA', v3a
     __hasorgaccess(apikey, orgid)
     calltype = 'SNMP'
     puturl = '{0}/organizations/{1}/snmp'.format(str(base_url), str(orgid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
     putdata = {}
 
     if v3authmode not in ['SHA', 'MD5']:
@@ -2053,8 +2747,8 @@ def updatesnmpsettings(apikey, orgid, v2c=False, v3=False, v3authmode='SHA', v3a
     else:
         putdata['peerIps'] = None
 
-    putdata = json.dumps(putdata)
-    dashboard = requests.put(puturl, data=putdata, headers=headers)
+    putdata = jsonencode(putdata)
+    dashboard = getclient().put(apikey, puturl, data=putdata, retry=True)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -2064,34 +2758,32 @@ def updatesnmpsettings(apikey, orgid, v2c=False, v3=False, v3authmode='SHA', v3a
 
 def removedevfromnet(apikey, networkid, serial, suppressprint=False):
     calltype = 'Device'
-    posturl = '{0}/networks/{1}/devices/{2}/remove'.format(str(base_url), str(networkid), str(serial))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-    dashboard = requests.post(posturl, headers=headers)
+    posturl = removedevfromneturl(networkid, serial)
+    dashboard = getclient().post(apikey, posturl)
     #
     # Call return handler function to parse Dashboard response
     #
     result = __returnhandler(dashboard.status_code, dashboard.text, calltype, suppressprint)
+    if str(dashboard.status_code) in ('200', '204'):
+        movedevice(format(str(serial)), None)
     return result
 
 
 def addorg(apikey, neworgname, suppressprint=False):
     calltype = 'Organization'
     posturl = '{0}/organizations/'.format(str(base_url))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
     postdata = {
         'name': format(str(neworgname))
     }
-    dashboard = requests.post(posturl, data=json.dumps(postdata), headers=headers)
+    dashboard = getclient().post(apikey, posturl, data=jsonencode(postdata))
     #
     # Call return handler function to parse Dashboard response
     #
     result = __returnhandler(dashboard.status_code, dashboard.text, calltype, suppressprint)
+    #
+    # New organization is missing from any memoized access list for this key
+    #
+    invalidateorgaccess(apikey)
     return result
 
 
@@ -2099,18 +2791,18 @@ def cloneorg(apikey, orgid, neworgname, suppressprint=False):
     __hasorgaccess(apikey, orgid)
     calltype = 'Organization Clone'
     posturl = '{0}/organizations/{1}/clone'.format(str(base_url), str(orgid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
     postdata = {
         'name': format(str(neworgname))
     }
-    dashboard = requests.post(posturl, data=json.dumps(postdata), headers=headers)
+    dashboard = getclient().post(apikey, posturl, data=jsonencode(postdata))
     #
     # Call return handler function to parse Dashboard response
     #
     result = __returnhandler(dashboard.status_code, dashboard.text, calltype, suppressprint)
+    #
+    # New organization is missing from any memoized access list for this key
+    #
+    invalidateorgaccess(apikey)
     return result
 
 
@@ -2118,14 +2810,10 @@ def renameorg(apikey, orgid, neworgname, suppressprint=False):
     __hasorgaccess(apikey, orgid)
     calltype = 'Organization Rename'
     puturl = '{0}/organizations/{1}'.format(str(base_url), str(orgid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
     putdata = {
         'name': format(str(neworgname))
     }
-    dashboard = requests.put(puturl, data=json.dumps(putdata), headers=headers)
+    dashboard = getclient().put(apikey, puturl, data=jsonencode(putdata), retry=True)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -2137,10 +2825,6 @@ def updatenetwork(apikey, networkid, name, tz, tags, suppressprint=False):
 
     calltype = 'Network'
     puturl = '{0}/organizations/{1}'.format(str(base_url), str(networkid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
 
     putdata = {}
 
@@ -2154,11 +2838,13 @@ def updatenetwork(apikey, networkid, name, tz, tags, suppressprint=False):
     if tags:
         putdata['tags'] = __listtotag(tags)
 
-    dashboard = requests.put(puturl, data=json.dumps(putdata), headers=headers)
+    dashboard = getclient().put(apikey, puturl, data=jsonencode(putdata), retry=True)
     #
     # Call return handler function to parse Dashboard response
     #
     result = __returnhandler(dashboard.status_code, dashboard.text, calltype, suppressprint)
+    if isinstance(result, dict) and 'id' in result and 'name' in result:
+        recordnetwork(result)
     return result
 
 
@@ -2168,53 +2854,71 @@ def updatedevice(apikey, networkid, serial, name=None, tags=None, lat=None,
                  lng=None, address=None, move=None, suppressprint=False):
     # move needs to be str and not boolean 'true' or 'false' to work
     calltype = 'Device'
-    posturl = '{0}/networks/{1}/devices/{2}'.format(
-        str(base_url), str(networkid), str(serial))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-
-    putdata = {}
-
-    if name is not None:
-        putdata['name'] = name
-
-    if tags is not None:
-        putdata['tags'] = __listtotag(tags)
-
-    if lat and not lng:
-        raise ValueError('If latitude is entered a longitude '
-                         'value must also be entered')
-    elif lng and not lat:
-        raise ValueError('If longitude is entered a latitude '
-                         'value must also be entered')
-    else:
-        putdata['lat'] = lat
-        putdata['lng'] = lng
-
-    if address is not None:
-        putdata['address'] = address
+    posturl = devicedetailurl(networkid, serial)
+    putdata = devicedata(name, tags, lat, lng, address, move)
 
-    if move:
-        putdata['moveMapMarker'] = move
-
-    dashboard = requests.put(
-        posturl, data=json.dumps(putdata), headers=headers)
+    dashboard = getclient().put(
+        apikey, posturl, data=putdata, retry=True)
     # Call return handler function to parse Dashboard response
     result = __returnhandler(
         dashboard.status_code, dashboard.text, calltype, suppressprint)
+    if isinstance(result, dict) and 'serial' in result:
+        recorddevice(result, networkid)
     return result
 
 
+#
+# Per-serial outcome of adddevice and bulkadddevices: status is 'added', 'invalid' (serial not claimable), 'unnamed'
+# (added but the name/address update failed) or 'error', detail carries the Dashboard error or exception text
+#
+DeviceOutcome = collections.namedtuple('DeviceOutcome', ['serial', 'status', 'detail'])
+
+
+def adddevice(apikey, networkid, serial, name=None, address=None, suppressprint=True):
+    #
+    # Claim one serial into a network and set its name and address, returns a DeviceOutcome instead of raising
+    #
+    try:
+        result = adddevtonet(apikey, networkid, serial, suppressprint=suppressprint)
+        if result == 'noserial':
+            return DeviceOutcome(serial, 'invalid', None)
+        if result is not None:
+            return DeviceOutcome(serial, 'error', result)
+        result = updatedevice(apikey, networkid, serial, name=name, address=address, move='true',
+                              suppressprint=suppressprint)
+        if result is not None and not isinstance(result, dict):
+            return DeviceOutcome(serial, 'unnamed', result)
+        return DeviceOutcome(serial, 'added', None)
+    except (Error, ValueError, requests.exceptions.RequestException) as e:
+        return DeviceOutcome(serial, 'error', str(e))
+
+
+def bulkadddevices(apikey, networkid, devices, maxworkers=8, suppressprint=True, progress=None):
+    #
+    # Claim (serial, name, address) entries into a network and set their name and address, running up to maxworkers
+    # serials at once. All calls share the client's per-organization rate limiter. Returns one DeviceOutcome per
+    # entry, in input order. progress, if passed, is called with each DeviceOutcome from its worker thread as soon as
+    # that serial finishes.
+    #
+    devices = list(devices)
+    if not devices:
+        return []
+
+    def task(serial, name, address):
+        outcome = adddevice(apikey, networkid, serial, name, address, suppressprint)
+        if progress is not None:
+            progress(outcome)
+        return outcome
+
+    with ThreadPoolExecutor(max_workers=min(maxworkers, len(devices))) as pool:
+        futures = [contextsubmit(pool, task, serial, name, address) for serial, name, address in devices]
+        return [f.result() for f in futures]
+
+
 def updatessid(apikey, networkid, ssidnum, name, enabled, authmode, encryptionmode, psk, suppressprint=False):
 
     calltype = 'SSID'
     puturl = '{0}/networks/{1}/ssids/{2}'.format(str(base_url), str(networkid), str(ssidnum))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
 
     putdata = {}
 
@@ -2247,7 +2951,7 @@ def updatessid(apikey, networkid, ssidnum, name, enabled, authmode, encryptionmo
     elif psk:
         putdata['psk'] = str(psk)
 
-    dashboard = requests.put(puturl, data=json.dumps(putdata), headers=headers)
+    dashboard = getclient().put(apikey, puturl, data=jsonencode(putdata), retry=True)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -2261,69 +2965,75 @@ def updateswitchport(apikey, serialnum, portnum, name=None, tags=None,
                      stpguard=None, accesspolicynum=None, suppressprint=False):
 
     calltype = 'Switch Port'
-    puturl = '{0}/devices/{1}/switchPorts/{2}'.format(str(base_url), str(serialnum), str(portnum))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
-
-    putdata = {}
-
-    if name:
-        putdata['name'] = str(name)
-
-    if tags:
-        putdata['tags'] = __listtotag(tags)
-
-    if enabled and (enabled is False or True):
-        putdata['enabled'] = str(enabled)
-    else:
-        raise ValueError("Enabled must be a boolean variable: %s" % enabled)
-        
-
-    if porttype and porttype not in ['access', 'trunk']:
-        raise ValueError("Type must be either 'access' or 'trunk'")
-    elif porttype:
-        putdata['type'] = str(porttype)
-
-    if vlan:
-        putdata['vlan'] = str(vlan)
-
-    if voicevlan:
-        putdata['voiceVlan'] = voicevlan
+    puturl = switchportdetailurl(serialnum, portnum)
+    putdata = switchportdata(name, tags, enabled, porttype, vlan, voicevlan, allowedvlans, poe, isolation, rstp,
+                             stpguard, accesspolicynum)
 
-    if allowedvlans:
-        putdata['allowedVlans'] = allowedvlans
+    dashboard = getclient().put(apikey, puturl, data=putdata, retry=True)
+    #
+    # Call return handler function to parse Dashboard response
+    #
+    result = __returnhandler(dashboard.status_code, dashboard.text, calltype, suppressprint)
+    return result
 
-    if poe and (poe is False or True):
-        putdata['poeEnabled'] = str(poe)
-    else:
-        raise ValueError("PoE enabled must be a boolean variable")
 
-    if isolation and (isolation is not False or not True):
-        raise ValueError("Port isolation enabled must be a bolean variable")
-    elif isolation:
-        putdata['isolation'] = isolation
+#
+# Per-port outcome of cloneswitchports: status is 'cloned', 'skipped' (port type not cloned) or 'error', detail
+# carries the Dashboard error or exception text
+#
+PortOutcome = collections.namedtuple('PortOutcome', ['number', 'status', 'detail'])
 
-    if rstp and (rstp is False or True):
-        putdata['rstpEnabled'] = rstp
-    else:
-        raise ValueError("RSTP enabled must be a boolean variable")
 
-    if stpguard and stpguard not in ['disabled', 'root guard', 'BPDU guard']:
-        raise ValueError("Valid values for STP Guard are 'disabled', 'root guard',  or 'BPDU Guard'")
-    elif stpguard:
-        putdata['stpGuard'] = stpguard
+def __cloneport(apikey, newserial, port, suppressprint):
+    number = port['number']
+    #
+    # Tags are not carried over, the Dashboard returns them as a string but updateswitchport expects a list
+    #
+    try:
+        if port['type'] == 'access':
+            result = updateswitchport(apikey, newserial, number, name=port['name'], tags=[], enabled=port['enabled'],
+                                      porttype=port['type'], vlan=port['vlan'], voicevlan=port['voiceVlan'],
+                                      poe='true', isolation=port['isolationEnabled'], rstp=port['rstpEnabled'],
+                                      stpguard=port['stpGuard'], accesspolicynum=port['accessPolicyNumber'],
+                                      suppressprint=suppressprint)
+        elif port['type'] == 'trunk':
+            result = updateswitchport(apikey, newserial, number, name=port['name'], tags=[], enabled=port['enabled'],
+                                      porttype=port['type'], vlan=port['vlan'], allowedvlans=port['allowedVlans'],
+                                      poe='true', isolation=port['isolationEnabled'], rstp=port['rstpEnabled'],
+                                      stpguard=port['stpGuard'], suppressprint=suppressprint)
+        else:
+            return PortOutcome(number, 'skipped', port['type'])
+    except (Error, KeyError, ValueError, requests.exceptions.RequestException) as e:
+        return PortOutcome(number, 'error', str(e))
+    if result is not None and not isinstance(result, dict):
+        return PortOutcome(number, 'error', result)
+    return PortOutcome(number, 'cloned', None)
 
-    if accesspolicynum:
-        putdata['accessPolicyNumber'] = accesspolicynum
 
-    dashboard = requests.put(puturl, data=json.dumps(putdata), headers=headers)
+def cloneswitchports(apikey, oldserial, newserial, maxworkers=8, suppressprint=True, progress=None, ports=None):
     #
-    # Call return handler function to parse Dashboard response
+    # Copy the L2 port configuration of switch oldserial onto newserial. The old switch's port table is read with a
+    # single getswitchports call, then the per-port updates run up to maxworkers at once under the client's
+    # per-organization rate limiter. Returns one PortOutcome per port of the old switch, in port order. progress, if
+    # passed, is called with each PortOutcome from its worker thread as soon as that port finishes. ports, if passed,
+    # is the old switch's port table as returned by getswitchports, so callers can read it before changing anything.
     #
-    result = __returnhandler(dashboard.status_code, dashboard.text, calltype, suppressprint)
-    return result
+    if ports is None:
+        ports = getswitchports(apikey, oldserial, suppressprint=suppressprint)
+    if not isinstance(ports, list):
+        raise Error('Unable to read switch ports of {0}: {1}'.format(oldserial, ports))
+    if not ports:
+        return []
+
+    def task(port):
+        outcome = __cloneport(apikey, newserial, port, suppressprint)
+        if progress is not None:
+            progress(outcome)
+        return outcome
+
+    with ThreadPoolExecutor(max_workers=min(maxworkers, len(ports))) as pool:
+        futures = [contextsubmit(pool, task, port) for port in ports]
+        return [f.result() for f in futures]
 
 
 def addsamlrole(apikey, orgid, rolename, orgaccess, tags, tagaccess, networks, netaccess, suppressprint=False):
@@ -2334,10 +3044,6 @@ def addsamlrole(apikey, orgid, rolename, orgaccess, tags, tagaccess, networks, n
     calltype = 'SAML Role'
 
     posturl = '{0}/organizations/{1}/samlRoles'.format(str(base_url), str(orgid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
 
     if not orgaccess and not tags and not networks:
         raise AttributeError("At least one of organization access, tag based access, or network based access must be "
@@ -2411,7 +3117,7 @@ def addsamlrole(apikey, orgid, rolename, orgaccess, tags, tagaccess, networks, n
     if netlist is True:
         postdata['networks'] = postnets
 
-    dashboard = requests.post(posturl, data=json.dumps(postdata), headers=headers)
+    dashboard = getclient().post(apikey, posturl, data=jsonencode(postdata))
     #
     # Call return handler function to parse Dashboard response
     #
@@ -2428,10 +3134,6 @@ def updatesamlrole(apikey, orgid, roleid, rolename, orgaccess, tags, tagaccess,
     calltype = 'SAML Role'
 
     puturl = '{0}/organizations/{1}/samlRoles/{2}'.format(str(base_url), str(orgid), str(roleid))
-    headers = {
-        'x-cisco-meraki-api-key': format(str(apikey)),
-        'Content-Type': 'application/json'
-    }
 
     if orgaccess and orgaccess not in ['read-only', 'full', 'none']:
         raise ValueError("Organization access must be either 'read-only' or 'full' or 'none")
@@ -2500,9 +3202,8 @@ def updatesamlrole(apikey, orgid, roleid, rolename, orgaccess, tags, tagaccess,
     if netlist is True:
         roledata['networks'] = putnets
 
-    putdata = [roledata]
-    print(roledata, putdata, sep='\n')
-    dashboard = requests.put(puturl, data=json.dumps(roledata), headers=headers)
+    logger.debug('SAML role update: %s', roledata)
+    dashboard = getclient().put(apikey, puturl, data=jsonencode(roledata), retry=True)
     #
     # Call return handler function to parse Dashboard response
     #
@@ -0,0 +1,354 @@
+#
+# Title: Customer | Meraki Full-stack Deployment
+#
+#  Cisco Meraki Provisioning API Python 3.x asyncio Module
+#
+# Overview
+# asyncio counterpart to merakiapi for the device and network provisioning calls. Each coroutine mirrors the blocking
+# function of the same name in merakiapi, building its URL and payload with the same merakiapi builders and parsing
+# the Dashboard response with the same return handler, so results are identical. Because calls are awaitable many of
+# them can be in flight at once from one process, for example:
+#
+#   results = await asyncio.gather(*[merakiapi_async.adddevtonet(apikey, networkid, s) for s in serials])
+#
+# Writes share merakiapi's bookkeeping: they invalidate the blocking client's ResponseCache and update the network
+# name and device serial indexes exactly as the blocking function of the same name does.
+#
+# Dependencies
+# - Python 3.7+
+# - 'aiohttp' module
+#
+
+import asyncio
+import logging
+import time
+import merakiapi
+
+#
+# Failures a request is retried on. Bound here so the except clauses below still work when aiohttp is missing and
+# getsession() raises ImportError.
+#
+try:
+    import aiohttp
+    transienterrors = (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+except ImportError:
+    aiohttp = None
+    transienterrors = (asyncio.TimeoutError,)
+
+
+DashboardResponse = merakiapi.DashboardResponse
+
+
+class AsyncDashboardClient(object):
+    #
+    # Owns a pooled aiohttp.ClientSession shared by every coroutine in this module. The session is created lazily so
+    # the client can be constructed outside of a running event loop. Requests are scheduled through a
+    # merakiapi.RateLimiter, pass the blocking client's limiter to share one budget between both clients.
+    # Transient failures are retried under a merakiapi.RetryPolicy for GETs and writes marked retry=True.
+    #
+    def __init__(self, poolsize=100, session=None, ratelimiter=None, throttleretries=5, retrypolicy=None,
+                 timeout=60):
+        self.poolsize = poolsize
+        self.session = session
+        self.ratelimiter = ratelimiter if ratelimiter is not None else merakiapi.RateLimiter()
+        self.throttleretries = throttleretries
+        self.retrypolicy = retrypolicy if retrypolicy is not None else merakiapi.RetryPolicy()
+        self.timeout = timeout
+        self.headers = {}
+
+    def getsession(self):
+        if self.session is None:
+            if aiohttp is None:
+                raise ImportError("merakiapi_async requires the 'aiohttp' module")
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.poolsize),
+                                                 timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self.session
+
+    def getheaders(self, apikey):
+        apikey = format(str(apikey))
+        headers = self.headers.get(apikey)
+        if headers is None:
+            headers = {
+                'x-cisco-meraki-api-key': apikey,
+                'Content-Type': 'application/json'
+            }
+            self.headers[apikey] = headers
+        return headers
+
+    async def send(self, method, apikey, url, data=None):
+        metrics = merakiapi.getmetrics()
+        sent = time.monotonic()
+        try:
+            async with self.getsession().request(method, url, data=data, headers=self.getheaders(apikey)) as response:
+                body = await response.read()
+        except transienterrors:
+            if metrics is not None:
+                metrics.observe(method, url, 'error', time.monotonic() - sent, merakiapi.Metrics.payloadsize(data))
+            if merakiapi.logger.isEnabledFor(logging.DEBUG):
+                merakiapi.logattempt(method, url, 'error', time.monotonic() - sent)
+            raise
+        if metrics is not None:
+            metrics.observe(method, url, response.status, time.monotonic() - sent, merakiapi.Metrics.payloadsize(data),
+                            len(body))
+        if merakiapi.logger.isEnabledFor(logging.DEBUG):
+            merakiapi.logattempt(method, url, response.status, time.monotonic() - sent)
+        return DashboardResponse(response.status, body.decode(response.get_encoding()), response.headers)
+
+    async def request(self, method, apikey, url, data=None, retry=None):
+        current = merakiapi.currentprofile()
+        started = time.monotonic()
+        try:
+            response = await self.__request(method, apikey, url, data, retry)
+        except Exception:
+            if current is not None:
+                current.record(method, url, 'error', time.monotonic() - started, False)
+            raise
+        #
+        # Writes drop the blocking client's cached reads of the written URL, as merakiapi's own writes do, so a
+        # cached GET made after an awaited write never returns the state from before it
+        #
+        if method != 'GET':
+            merakiapi.getclient().invalidate(url)
+        if current is not None:
+            current.record(method, url, response.status_code, time.monotonic() - started, False)
+        return response
+
+    async def __request(self, method, apikey, url, data, retry):
+        if retry is None:
+            retry = method == 'GET'
+        key = self.ratelimiter.keyfor(apikey, url)
+        started = time.monotonic()
+        attempt = 0
+        throttled = 0
+        while True:
+            wait = self.ratelimiter.reserve(key)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                self.ratelimiter.release(key)
+            try:
+                response = await self.send(method, apikey, url, data=data)
+            except transienterrors:
+                delay = self.retrypolicy.nextdelay(attempt, started) if retry else None
+                if delay is None:
+                    raise
+                self.retried(method, url, 'connection', delay)
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            if response.status_code == 429 and throttled < self.throttleretries:
+                throttled += 1
+                self.retried(method, url, 'throttled', merakiapi.retryafter(response))
+                self.ratelimiter.throttle(key, merakiapi.retryafter(response))
+                continue
+            if retry and self.retrypolicy.retryable(response.status_code):
+                delay = self.retrypolicy.nextdelay(attempt, started)
+                if delay is not None:
+                    self.retried(method, url, 'status', delay)
+                    attempt += 1
+                    await asyncio.sleep(delay)
+                    continue
+            return response
+
+    @staticmethod
+    def retried(method, url, reason, delay):
+        metrics = merakiapi.getmetrics()
+        if metrics is not None:
+            metrics.retried(method, url, reason)
+        if merakiapi.logger.isEnabledFor(logging.INFO):
+            merakiapi.logretry(method, url, reason, delay)
+
+    async def get(self, apikey, url):
+        return await self.request('GET', apikey, url)
+
+    async def post(self, apikey, url, data=None, retry=False):
+        return await self.request('POST', apikey, url, data=data, retry=retry)
+
+    async def put(self, apikey, url, data=None, retry=False):
+        return await self.request('PUT', apikey, url, data=data, retry=retry)
+
+    async def delete(self, apikey, url, retry=False):
+        return await self.request('DELETE', apikey, url, retry=retry)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+__client = None
+
+
+def getclient():
+    #
+    # Return the AsyncDashboardClient every coroutine in this module is routed through, creating one on first use
+    #
+    global __client
+    if __client is None:
+        __client = AsyncDashboardClient()
+    return __client
+
+
+def setclient(client):
+    #
+    # Inject the AsyncDashboardClient used by every coroutine in this module, returns the previously installed client
+    #
+    global __client
+    previous = __client
+    __client = client
+    return previous
+
+
+async def __hasorgaccess(apikey, targetorg):
+    #
+    # Validate if API Key has access to passed Organization ID, sharing merakiapi's memoized access lists
+    #
+    orgs = merakiapi.cachedorgaccess(apikey)
+    if orgs is None:
+        dashboard = await getclient().get(apikey, merakiapi.organizationsurl())
+        orgs = merakiapi.recordorgaccess(apikey, dashboard.text)
+        if orgs is None:
+            return None
+
+    if int(targetorg) in orgs:
+        return None
+    raise merakiapi.OrgPermissionError
+
+
+async def getorginventory(apikey, orgid, suppressprint=False):
+    await __hasorgaccess(apikey, orgid)
+    calltype = 'Inventory'
+    dashboard = await getclient().get(apikey, merakiapi.orginventoryurl(orgid))
+    return merakiapi.handleresponse(dashboard.status_code, dashboard.text, calltype, suppressprint)
+
+
+async def getnetworklist(apikey, orgid, suppressprint=False):
+    await __hasorgaccess(apikey, orgid)
+    calltype = 'Network'
+    dashboard = await getclient().get(apikey, merakiapi.networklisturl(orgid))
+    result = merakiapi.handleresponse(dashboard.status_code, dashboard.text, calltype, suppressprint)
+    if isinstance(result, list):
+        merakiapi.indexnetworks(orgid, result)
+    return result
+
+
+async def gettemplates(apikey, orgid, suppressprint=False):
+    await __hasorgaccess(apikey, orgid)
+    calltype = 'Templates'
+    dashboard = await getclient().get(apikey, merakiapi.templatesurl(orgid))
+    return merakiapi.handleresponse(dashboard.status_code, dashboard.text, calltype, suppressprint)
+
+
+async def getnetworkdevices(apikey, networkid, suppressprint=True):
+    calltype = 'Network'
+    dashboard = await getclient().get(apikey, merakiapi.networkdevicesurl(networkid))
+    return merakiapi.handleresponse(dashboard.status_code, dashboard.text, calltype, suppressprint)
+
+
+async def getnetworkdetail(apikey, networkid, suppressprint=False):
+    calltype = 'Network Detail'
+    dashboard = await getclient().get(apikey, merakiapi.networkdetailurl(networkid))
+    return merakiapi.handleresponse(dashboard.status_code, dashboard.text, calltype, suppressprint)
+
+
+async def getdevicedetail(apikey, networkid, serialnumber, suppressprint=False):
+    calltype = 'Device Detail'
+    dashboard = await getclient().get(apikey, merakiapi.devicedetailurl(networkid, serialnumber))
+    result = merakiapi.handleresponse(dashboard.status_code, dashboard.text, calltype, suppressprint)
+    if isinstance(result, dict) and 'serial' in result:
+        merakiapi.recorddevice(result, networkid)
+    return result
+
+
+async def getswitchports(apikey, serialnum, suppressprint=False):
+    calltype = 'Switch Port'
+    dashboard = await getclient().get(apikey, merakiapi.switchportsurl(serialnum))
+    return merakiapi.handleresponse(dashboard.status_code, dashboard.text, calltype, suppressprint)
+
+
+async def getswitchportdetail(apikey, serialnum, portnum, suppressprint=False):
+    calltype = 'Switch Port Detail'
+    dashboard = await getclient().get(apikey, merakiapi.switchportdetailurl(serialnum, portnum))
+    return merakiapi.handleresponse(dashboard.status_code, dashboard.text, calltype, suppressprint)
+
+
+async def getclients(apikey, serialnum, timestamp=86400, suppressprint=True):
+    calltype = 'Device Clients'
+    dashboard = await getclient().get(apikey, merakiapi.clientsurl(serialnum, timestamp))
+    return merakiapi.handleresponse(dashboard.status_code, dashboard.text, calltype, suppressprint)
+
+
+async def bindtotemplate(apikey, networkid, templateid, autobind='false', suppressprint=False):
+    calltype = 'Template Bind'
+    postdata = merakiapi.jsonencode({'configTemplateId': format(str(templateid))})
+    dashboard = await getclient().post(apikey, merakiapi.bindtotemplateurl(networkid), data=postdata)
+    return merakiapi.handleresponse(dashboard.status_code, dashboard.text, calltype, suppressprint)
+
+
+async def adddevtonet(apikey, networkid, serial, suppressprint=False):
+    calltype = 'Device'
+    postdata = merakiapi.jsonencode({'serial': format(str(serial))})
+    dashboard = await getclient().post(apikey, merakiapi.adddevtoneturl(networkid), data=postdata)
+    result = merakiapi.handleresponse(dashboard.status_code, dashboard.text, calltype, suppressprint)
+    if str(dashboard.status_code) in ('200', '201', '204'):
+        merakiapi.movedevice(format(str(serial)), networkid)
+    return result
+
+
+async def removedevfromnet(apikey, networkid, serial, suppressprint=False):
+    calltype = 'Device'
+    dashboard = await getclient().post(apikey, merakiapi.removedevfromneturl(networkid, serial))
+    result = merakiapi.handleresponse(dashboard.status_code, dashboard.text, calltype, suppressprint)
+    if str(dashboard.status_code) in ('200', '204'):
+        merakiapi.movedevice(format(str(serial)), None)
+    return result
+
+
+async def claim(apikey, orgid, serial=None, licensekey=None, licensemode=None, orderid=None, suppressprint=False):
+    calltype = 'Claim'
+    postdata = merakiapi.claimdata(serial, licensekey, licensemode, orderid)
+    dashboard = await getclient().post(apikey, merakiapi.claimurl(orgid), data=postdata)
+    result = merakiapi.handleresponse(dashboard.status_code, dashboard.text, calltype, suppressprint)
+    if serial is not None and str(dashboard.status_code) in ('200', '201', '204'):
+        merakiapi.claimeddevice(serial, orgid)
+    return result
+
+
+async def addnetwork(apikey, orgid, name, nettype, tags, tz, suppressprint=False):
+    await __hasorgaccess(apikey, orgid)
+    calltype = 'Network'
+    postdata = merakiapi.networkdata(name, nettype, tags, tz)
+    dashboard = await getclient().post(apikey, merakiapi.networklisturl(orgid), data=postdata)
+    result = merakiapi.handleresponse(dashboard.status_code, dashboard.text, calltype, suppressprint)
+    if isinstance(result, dict) and 'id' in result:
+        merakiapi.recordnetwork(result, orgid)
+    return result
+
+
+async def updatedevice(apikey, networkid, serial, name=None, tags=None, lat=None,
+                       lng=None, address=None, move=None, suppressprint=False):
+    calltype = 'Device'
+    putdata = merakiapi.devicedata(name, tags, lat, lng, address, move)
+    dashboard = await getclient().put(apikey, merakiapi.devicedetailurl(networkid, serial), data=putdata,
+                                      retry=True)
+    result = merakiapi.handleresponse(dashboard.status_code, dashboard.text, calltype, suppressprint)
+    if isinstance(result, dict) and 'serial' in result:
+        merakiapi.recorddevice(result, networkid)
+    return result
+
+
+async def updateswitchport(apikey, serialnum, portnum, name=None, tags=None,
+                           enabled=None, porttype=None, vlan=None, voicevlan=None,
+                           allowedvlans=None, poe=None, isolation=None, rstp=None,
+                           stpguard=None, accesspolicynum=None, suppressprint=False):
+    calltype = 'Switch Port'
+    putdata = merakiapi.switchportdata(name, tags, enabled, porttype, vlan, voicevlan, allowedvlans, poe, isolation,
+                                       rstp, stpguard, accesspolicynum)
+    dashboard = await getclient().put(apikey, merakiapi.switchportdetailurl(serialnum, portnum), data=putdata,
+                                      retry=True)
+    return merakiapi.handleresponse(dashboard.status_code, dashboard.text, calltype, suppressprint)
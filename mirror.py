@@ -0,0 +1,308 @@
+#
+# Title: Customer | Meraki Full-stack Deployment
+#
+#  Local SQLite mirror of an organization's networks, inventory and devices
+#
+# Overview
+# Questions like "which network is this serial in?" or "what model is this device?" are answered from an indexed
+# SQLite file instead of a Dashboard round trip. sync() keeps the file current incrementally: each pass lists the
+# networks and streams the inventory, two listings however large the organization is, and writes only the rows that
+# changed. Device details are fetched again only for networks whose inventory changed, networks new to the mirror and
+# networks not refreshed for maxage seconds. One database file mirrors one organization. When several worker processes
+# open the same file and start() it, a lease row elects one of them to run the syncs, the others only read.
+#
+#   inventory = mirror.Mirror('/var/tmp/meraki-mirror.db', apikey, orgid)
+#   inventory.sync()
+#   inventory.device('Q2XX-AAAA-0001')['networkName']
+#
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import merakiapi
+from sharedstore import Database
+
+logger = logging.getLogger('merakiapi.mirror')
+
+
+class Mirror(Database):
+    #
+    # Rows keep the Dashboard's JSON for each object in data, with the columns lookups filter on copied out and
+    # indexed. networks.synced is when the network's devices were last fetched, 0 when they never were.
+    #
+    schema = [
+        'CREATE TABLE IF NOT EXISTS networks (id TEXT PRIMARY KEY, name TEXT, data TEXT NOT NULL, '
+        'synced REAL NOT NULL DEFAULT 0)',
+        'CREATE INDEX IF NOT EXISTS networksname ON networks (name)',
+        'CREATE TABLE IF NOT EXISTS inventory (serial TEXT PRIMARY KEY, networkid TEXT, model TEXT, '
+        'data TEXT NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS inventorynetwork ON inventory (networkid)',
+        'CREATE INDEX IF NOT EXISTS inventorymodel ON inventory (model)',
+        'CREATE TABLE IF NOT EXISTS devices (serial TEXT PRIMARY KEY, networkid TEXT NOT NULL, name TEXT, '
+        'data TEXT NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS devicesnetwork ON devices (networkid)',
+        'CREATE INDEX IF NOT EXISTS devicesname ON devices (name)',
+        'CREATE TABLE IF NOT EXISTS syncstate (key TEXT PRIMARY KEY, value REAL NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS lease (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)'
+    ]
+
+    def __init__(self, path, apikey, orgid, maxage=3600, maxworkers=8, timeout=30):
+        super(Mirror, self).__init__(path, timeout)
+        self.apikey = apikey
+        self.orgid = orgid
+        self.maxage = maxage
+        self.maxworkers = maxworkers
+        self.synclock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.owner = '{0}:{1}:{2}'.format(socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+
+    def sync(self, full=False):
+        #
+        # Bring the mirror up to date, full=True fetches the devices of every network. Returns added, updated and
+        # removed counts per table, the number of networks whose devices were fetched and how many of those failed.
+        #
+        started = time.monotonic()
+        with self.synclock:
+            merakiapi.getclient().invalidate(merakiapi.networklisturl(self.orgid))
+            networks = merakiapi.getnetworklist(self.apikey, self.orgid, suppressprint=True)
+            if not isinstance(networks, list):
+                raise merakiapi.Error('Unable to list networks of {0}: {1}'.format(self.orgid, networks))
+            inventory = list(merakiapi.iterorginventory(self.apikey, self.orgid))
+            result = {}
+            with self.transaction() as db:
+                result['networks'], changed = self.__apply(
+                    db, 'networks', 'id', ['name'], dict((n['id'], n) for n in networks))
+                removed = [key for key, old, new in changed if new is None]
+                devicesremoved = 0
+                for networkid in removed:
+                    devicesremoved += db.execute('DELETE FROM devices WHERE networkid = ?', (networkid,)).rowcount
+                result['inventory'], changed = self.__apply(
+                    db, 'inventory', 'serial', ['networkId', 'model'], dict((d['serial'], d) for d in inventory))
+                #
+                # A serial claimed into, moved between or removed from networks changes both networks' device lists
+                #
+                for serial, old, new in changed:
+                    for record in (old, new):
+                        if record is not None and record.get('networkId'):
+                            db.execute('UPDATE networks SET synced = 0 WHERE id = ?', (record['networkId'],))
+                if full:
+                    stale = [row[0] for row in db.execute('SELECT id FROM networks')]
+                else:
+                    stale = [row[0] for row in db.execute('SELECT id FROM networks WHERE synced <= ?',
+                                                          (time.time() - self.maxage,))]
+
+            fetched, failed = self.__fetchdevices(stale)
+
+            with self.transaction() as db:
+                counts = {'added': 0, 'updated': 0, 'removed': devicesremoved}
+                for networkid, devices in fetched.items():
+                    networkcounts, changed = self.__apply(
+                        db, 'devices', 'serial', ['networkId', 'name'], dict((d['serial'], d) for d in devices),
+                        'networkid', networkid)
+                    for key in counts:
+                        counts[key] += networkcounts[key]
+                    db.execute('UPDATE networks SET synced = ? WHERE id = ?', (time.time(), networkid))
+                db.execute('INSERT OR REPLACE INTO syncstate (key, value) VALUES (?, ?)', ('synced', time.time()))
+            result['devices'] = counts
+            result['refreshed'] = len(fetched)
+            result['failed'] = failed
+            result['seconds'] = time.monotonic() - started
+        return result
+
+    def invalidate(self, networkid=None):
+        #
+        # Fetch the devices of networkid, or of every network, on the next sync whatever their age
+        #
+        with self.transaction() as db:
+            if networkid is None:
+                db.execute('UPDATE networks SET synced = 0')
+            else:
+                db.execute('UPDATE networks SET synced = 0 WHERE id = ?', (networkid,))
+
+    def start(self, interval=300):
+        #
+        # Sync now and then every interval seconds from a background thread, failures are logged and retried. Only the
+        # process holding the sync lease syncs, another takes the lease over if it is not renewed for two intervals.
+        #
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.__run, args=(interval,), name='mirror')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def refresh(self):
+        self.start()
+        self.wakeup.set()
+
+    def lease(self, seconds):
+        #
+        # Take or renew the sync lease for seconds, returns whether this Mirror holds it
+        #
+        now = time.time()
+        with self.transaction() as db:
+            row = db.execute('SELECT owner, expires FROM lease WHERE name = ?', ('sync',)).fetchone()
+            if row is not None and row[0] != self.owner and row[1] > now:
+                return False
+            db.execute('INSERT OR REPLACE INTO lease (name, owner, expires) VALUES (?, ?, ?)',
+                       ('sync', self.owner, now + seconds))
+            return True
+
+    def synced(self):
+        #
+        # Wall clock time of the last completed sync, None if there has not been one
+        #
+        row = self.connect().execute('SELECT value FROM syncstate WHERE key = ?', ('synced',)).fetchone()
+        return row[0] if row is not None else None
+
+    def network(self, networkid):
+        row = self.connect().execute('SELECT data FROM networks WHERE id = ?', (networkid,)).fetchone()
+        return merakiapi.jsondecode(row[0]) if row is not None else None
+
+    def networkbyname(self, name):
+        row = self.connect().execute('SELECT data FROM networks WHERE name = ?', (name,)).fetchone()
+        return merakiapi.jsondecode(row[0]) if row is not None else None
+
+    def networks(self):
+        rows = self.connect().execute('SELECT data FROM networks ORDER BY name').fetchall()
+        return [merakiapi.jsondecode(row[0]) for row in rows]
+
+    def networkforserial(self, serial):
+        row = self.connect().execute('SELECT n.data FROM inventory i JOIN networks n ON n.id = i.networkid '
+                                     'WHERE i.serial = ?', (serial,)).fetchone()
+        return merakiapi.jsondecode(row[0]) if row is not None else None
+
+    def device(self, serial):
+        #
+        # The serial's inventory record merged with its network device record, if it is in a network, plus the
+        # network's name as networkName. None if the serial is not in the organization's inventory.
+        #
+        row = self.connect().execute('SELECT i.data, d.data, n.name FROM inventory i '
+                                     'LEFT JOIN devices d ON d.serial = i.serial '
+                                     'LEFT JOIN networks n ON n.id = i.networkid WHERE i.serial = ?',
+                                     (serial,)).fetchone()
+        return self.__device(row) if row is not None else None
+
+    def record(self, serial):
+        #
+        # The serial as a merakiapi.DeviceRecord, checked is when the last sync confirmed its network and its device
+        # settings were last fetched. None if the serial is not in the mirrored inventory.
+        #
+        device = self.device(serial)
+        if device is None:
+            return None
+        checked = self.synced() or 0.0
+        if device.get('networkId'):
+            row = self.connect().execute('SELECT synced FROM networks WHERE id = ?', (device['networkId'],)).fetchone()
+            checked = min(checked, row[0] if row is not None else 0.0)
+        return merakiapi.DeviceRecord(serial, self.orgid, device.get('networkId'), device.get('model'),
+                                      device.get('name'), device.get('tags'), device.get('lat'), device.get('lng'),
+                                      device.get('address'), checked)
+
+    def devices(self, networkid):
+        rows = self.connect().execute('SELECT i.data, d.data, n.name FROM inventory i '
+                                      'LEFT JOIN devices d ON d.serial = i.serial '
+                                      'LEFT JOIN networks n ON n.id = i.networkid WHERE i.networkid = ? '
+                                      'ORDER BY i.serial', (networkid,)).fetchall()
+        return [self.__device(row) for row in rows]
+
+    def inventory(self, model=None, unassigned=False):
+        #
+        # Inventory records, optionally only models starting with model and only serials not in any network
+        #
+        query = 'SELECT data FROM inventory WHERE 1 = 1'
+        args = []
+        if model is not None:
+            query += ' AND model LIKE ?'
+            args.append(model.replace('%', '').replace('_', '') + '%')
+        if unassigned:
+            query += ' AND networkid IS NULL'
+        rows = self.connect().execute(query + ' ORDER BY serial', args).fetchall()
+        return [merakiapi.jsondecode(row[0]) for row in rows]
+
+    def stats(self):
+        db = self.connect()
+        return {
+            'networks': db.execute('SELECT COUNT(*) FROM networks').fetchone()[0],
+            'inventory': db.execute('SELECT COUNT(*) FROM inventory').fetchone()[0],
+            'devices': db.execute('SELECT COUNT(*) FROM devices').fetchone()[0],
+            'synced': self.synced()
+        }
+
+    def __device(self, row):
+        device = merakiapi.jsondecode(row[0])
+        if row[1] is not None:
+            device.update(merakiapi.jsondecode(row[1]))
+        device['networkName'] = row[2]
+        return device
+
+    def __apply(self, db, table, key, columns, records, scope=None, scopevalue=None):
+        #
+        # Make table hold exactly records, {key value: Dashboard object}, writing only rows whose JSON changed. With
+        # scope, only rows where scope = scopevalue are compared and removed. columns are the object keys copied into
+        # the indexed columns after key, named in lower case. Returns the counts and (key, old, new) per changed row.
+        #
+        query = 'SELECT {0}, data FROM {1}'.format(key, table)
+        if scope is not None:
+            existing = dict(db.execute(query + ' WHERE {0} = ?'.format(scope), (scopevalue,)).fetchall())
+        else:
+            existing = dict(db.execute(query).fetchall())
+        names = [key] + [column.lower() for column in columns] + ['data']
+        upsert = 'INSERT INTO {0} ({1}) VALUES ({2}) ON CONFLICT({3}) DO UPDATE SET {4}'.format(
+            table, ', '.join(names), ', '.join('?' * len(names)), key,
+            ', '.join('{0} = excluded.{0}'.format(name) for name in names[1:]))
+        counts = {'added': 0, 'updated': 0, 'removed': 0}
+        changed = []
+        rows = []
+        for value, record in records.items():
+            data = json.dumps(record, sort_keys=True, separators=(',', ':'))
+            old = existing.pop(value, None)
+            if old == data:
+                continue
+            counts['updated' if old is not None else 'added'] += 1
+            changed.append((value, merakiapi.jsondecode(old) if old is not None else None, record))
+            rows.append([value] + [record.get(column) for column in columns] + [data])
+        db.executemany(upsert, rows)
+        for value, old in existing.items():
+            db.execute('DELETE FROM {0} WHERE {1} = ?'.format(table, key), (value,))
+            changed.append((value, merakiapi.jsondecode(old), None))
+        counts['removed'] = len(existing)
+        return counts, changed
+
+    def __fetchdevices(self, networkids):
+        #
+        # Fetch the device lists of networkids concurrently, returns ({network ID: devices}, failed count). A network
+        # that fails keeps its old devices and stays stale so the next sync tries it again.
+        #
+        fetched = {}
+        failed = 0
+        if not networkids:
+            return fetched, failed
+
+        def fetch(networkid):
+            return list(merakiapi.iternetworkdevices(self.apikey, networkid))
+
+        with ThreadPoolExecutor(max_workers=min(self.maxworkers, len(networkids))) as pool:
+            futures = [(networkid, merakiapi.contextsubmit(pool, fetch, networkid)) for networkid in networkids]
+            for networkid, future in futures:
+                try:
+                    fetched[networkid] = future.result()
+                except (merakiapi.Error, ValueError, OSError) as e:
+                    failed += 1
+                    logger.warning('Could not fetch devices of network %s: %s', networkid, e)
+        return fetched, failed
+
+    def __run(self, interval):
+        while True:
+            try:
+                if self.lease(interval * 2):
+                    self.sync()
+            except Exception as e:
+                logger.warning('Mirror sync of organization %s failed: %s', self.orgid, e)
+            self.wakeup.wait(interval)
+            self.wakeup.clear()
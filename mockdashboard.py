@@ -0,0 +1,533 @@
+#
+# Title: Customer | Meraki Full-stack Deployment
+#
+#  Local stand-in for the Meraki Dashboard API
+#
+# Overview
+# Serves the /api/v0 endpoints merakiapi.py uses from in-memory state so workflows can be exercised and timed
+# without a live Meraki organization. Latency, per API key rate limiting and error injection (HTTP 5xx and dropped
+# connections) are configurable, and every request is counted per endpoint.
+#
+#   python mockdashboard.py --port 8080 --latency 0.05 --ratelimit 5
+#
+# then point merakiapi.base_url at http://127.0.0.1:8080/api/v0 and use organization ID 549236.
+#
+
+import argparse
+import collections
+import http.server
+import json
+import random
+import re
+import threading
+import time
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+orgid = '549236'
+
+#
+# Ports the webapp clones for each switch size, keyed by the port count in the model name
+#
+switchports = collections.OrderedDict([('48', 53), ('24', 29), ('16', 21), ('32', 37), ('8', 9)])
+claimmodels = {'Q2MX': 'MX68', 'Q2SW': 'MS220-24P', 'Q2AP': 'MR33'}
+
+
+class MockDashboard(object):
+    #
+    # In-memory organization state shared by all request handler threads
+    #
+    def __init__(self, latency=0.0, jitter=0.0, ratelimit=None, errorrate=0.0, resetrate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.ratelimit = ratelimit
+        self.errorrate = errorrate
+        self.resetrate = resetrate
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+        self.buckets = {}
+        self.calls = collections.Counter()
+        self.statuses = collections.Counter()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.org = {'id': orgid, 'name': 'Mock Organization'}
+            self.networks = collections.OrderedDict()
+            self.templates = collections.OrderedDict()
+            self.devices = collections.OrderedDict()
+            self.ports = {}
+            self.nextid = 646829496481090000
+            self.resetstats()
+
+    def resetstats(self):
+        with self.lock:
+            self.calls.clear()
+            self.statuses.clear()
+            self.buckets.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'calls': sum(self.calls.values()),
+                'endpoints': dict(self.calls),
+                'statuses': dict((str(k), v) for k, v in self.statuses.items())
+            }
+
+    #
+    # Seeding helpers
+    #
+    def newid(self, prefix):
+        with self.lock:
+            self.nextid += 1
+            return '{0}_{1}'.format(prefix, self.nextid)
+
+    def addnetwork(self, name, nettype='appliance switch wireless', tz='America/Los_Angeles', tags=''):
+        with self.lock:
+            network = {
+                'id': self.newid('N'),
+                'organizationId': orgid,
+                'name': name,
+                'timeZone': tz,
+                'tags': tags,
+                'type': nettype
+            }
+            self.networks[network['id']] = network
+            return network
+
+    def addtemplate(self, name):
+        with self.lock:
+            template = {'id': self.newid('L'), 'name': name}
+            self.templates[template['id']] = template
+            return template
+
+    def adddevice(self, serial, model=None, networkid=None, name=None):
+        with self.lock:
+            if model is None:
+                model = claimmodels.get(serial[:4], 'MR33')
+            index = len(self.devices)
+            device = {
+                'serial': serial,
+                'model': model,
+                'mac': '00:18:0a:{0:02x}:{1:02x}:{2:02x}'.format((index >> 16) & 255, (index >> 8) & 255, index & 255),
+                'name': name,
+                'networkId': networkid,
+                'lat': 37.4180951010362,
+                'lng': -122.098531723022,
+                'address': '',
+                'tags': ' ',
+                'lanIp': None,
+                'claimedAt': '2019-05-20T17:30:00.000000Z'
+            }
+            self.devices[serial] = device
+            return device
+
+    def seed(self, networks=10, templates=3, devicespernetwork=3, spares=20):
+        #
+        # Populate a deterministic organization: networks with an MX, a switch and an AP each, plus unassigned
+        # inventory serials named Q2SP-XXXX-XXXX for add and replace workflows
+        #
+        with self.lock:
+            for t in range(templates):
+                self.addtemplate('Template {0}'.format(t + 1))
+            for n in range(networks):
+                network = self.addnetwork('Store {0:04d}'.format(n + 1))
+                for d, (prefix, model) in enumerate(sorted(claimmodels.items())[:devicespernetwork]):
+                    serial = '{0}-{1:04d}-{2:04d}'.format(prefix, n, d)
+                    self.adddevice(serial, model, network['id'], '{0} {1}'.format(network['name'], model))
+            for s in range(spares):
+                self.adddevice('Q2SP-{0:04d}-{1:04d}'.format(s // 10000, s % 10000), 'MR33')
+
+    def portsfor(self, serial):
+        with self.lock:
+            ports = self.ports.get(serial)
+            if ports is None:
+                device = self.devices.get(serial)
+                if device is None or not device['model'].startswith('MS'):
+                    return None
+                count = next((c for size, c in switchports.items() if size in device['model']), 8)
+                ports = collections.OrderedDict()
+                for number in range(1, count + 1):
+                    ports[number] = {
+                        'number': number,
+                        'name': 'Port {0}'.format(number),
+                        'tags': None,
+                        'enabled': True,
+                        'poeEnabled': True,
+                        'type': 'trunk' if number > count - 4 else 'access',
+                        'vlan': 1 if number > count - 4 else 10 + number % 4,
+                        'voiceVlan': None if number > count - 4 else 100,
+                        'allowedVlans': 'all',
+                        'isolationEnabled': False,
+                        'rstpEnabled': True,
+                        'stpGuard': 'disabled',
+                        'accessPolicyNumber': None,
+                        'linkNegotiation': 'Auto negotiate'
+                    }
+                self.ports[serial] = ports
+            return ports
+
+    #
+    # Traffic shaping
+    #
+    def throttle(self, apikey):
+        #
+        # Token bucket per API key, returns seconds until a token is available or 0 if the call may proceed
+        #
+        if not self.ratelimit:
+            return 0
+        with self.lock:
+            now = time.monotonic()
+            tokens, updated = self.buckets.get(apikey, (float(self.ratelimit), now))
+            tokens = min(float(self.ratelimit), tokens + (now - updated) * self.ratelimit)
+            if tokens < 1:
+                self.buckets[apikey] = (tokens, now)
+                return (1 - tokens) / self.ratelimit
+            self.buckets[apikey] = (tokens - 1, now)
+            return 0
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(self.latency + self.random.uniform(0, self.jitter))
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    wbufsize = 65536
+    routes = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PUT(self):
+        self.dispatch('PUT')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    def dispatch(self, method):
+        mock = self.server.mock
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        parts = urlsplit(self.path)
+        path = parts.path
+        query = dict((k, v[0]) for k, v in parse_qs(parts.query).items())
+
+        if path.startswith('/_mock/'):
+            if path == '/_mock/stats':
+                return self.respond(200, mock.stats())
+            if path == '/_mock/reset':
+                mock.resetstats()
+                return self.respond(204, None)
+            return self.respond(404, None)
+
+        for routemethod, pattern, name, action in self.routes:
+            match = pattern.match(path)
+            if routemethod == method and match:
+                break
+        else:
+            return self.respond(404, {'errors': ['Unknown endpoint {0} {1}'.format(method, path)]})
+
+        with mock.lock:
+            mock.calls['{0} {1}'.format(method, name)] += 1
+        mock.delay()
+
+        apikey = self.headers.get('X-Cisco-Meraki-API-Key')
+        if not apikey:
+            return self.respond(401, {'errors': ['Invalid API key']})
+        wait = mock.throttle(apikey)
+        if wait:
+            return self.respond(429, {'errors': ['API rate limit exceeded for organization']},
+                                {'Retry-After': '{0:.3f}'.format(wait)})
+        if mock.resetrate and mock.random.random() < mock.resetrate:
+            with mock.lock:
+                mock.statuses['reset'] += 1
+            self.close_connection = True
+            self.connection.close()
+            return
+        if mock.errorrate and mock.random.random() < mock.errorrate:
+            return self.respond(mock.random.choice([500, 502, 503]), None)
+
+        try:
+            data = json.loads(body.decode('utf-8')) if body else {}
+        except ValueError:
+            return self.respond(400, {'errors': ['Malformed JSON body']})
+        with mock.lock:
+            status, result, headers = action(self, mock, query, data, *match.groups())
+        self.respond(status, result, headers)
+
+    def respond(self, status, result, headers=None):
+        with self.server.mock.lock:
+            self.server.mock.statuses[status] += 1
+        payload = b'' if result is None else json.dumps(result).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def page(self, records, query, key):
+        #
+        # Apply perPage/startingAfter pagination and build the rel=next Link header
+        #
+        if 'startingAfter' in query:
+            after = query['startingAfter']
+            keys = [r[key] for r in records]
+            records = records[keys.index(after) + 1:] if after in keys else []
+        if 'perPage' not in query:
+            return 200, records, None
+        perpage = int(query['perPage'])
+        page = records[:perpage]
+        if len(records) <= perpage:
+            return 200, page, None
+        nextquery = dict(query)
+        nextquery['startingAfter'] = page[-1][key]
+        nexturl = 'http://{0}{1}?{2}'.format(self.headers.get('Host'), urlsplit(self.path).path, urlencode(nextquery))
+        return 200, page, {'Link': '<{0}>; rel=next'.format(nexturl)}
+
+
+def route(method, pattern, name):
+    def register(action):
+        Handler.routes.append((method, re.compile('^/api/v0' + pattern + '$'), name, action))
+        return action
+    return register
+
+
+def notfound():
+    return 404, None, None
+
+
+@route('GET', r'/organizations', 'organizations')
+def getorganizations(handler, mock, query, data):
+    return 200, [mock.org], None
+
+
+@route('GET', r'/organizations/([^/]+)', 'organization')
+def getorganization(handler, mock, query, data, org):
+    return (200, mock.org, None) if org == orgid else notfound()
+
+
+@route('GET', r'/organizations/([^/]+)/inventory', 'inventory')
+def getinventory(handler, mock, query, data, org):
+    records = [dict((k, d[k]) for k in ('mac', 'serial', 'networkId', 'model', 'claimedAt')) for d in
+               mock.devices.values()]
+    return handler.page(records, query, 'serial')
+
+
+@route('GET', r'/organizations/([^/]+)/networks', 'networks')
+def getnetworks(handler, mock, query, data, org):
+    return 200, list(mock.networks.values()), None
+
+
+@route('POST', r'/organizations/([^/]+)/networks', 'networks')
+def postnetwork(handler, mock, query, data, org):
+    if not data.get('name'):
+        return 400, {'errors': ['Name is required']}, None
+    if any(n['name'] == data['name'] for n in mock.networks.values()):
+        return 400, {'errors': ['Name has already been taken']}, None
+    network = mock.addnetwork(data['name'], data.get('type', ''), data.get('timeZone', ''), data.get('tags', ''))
+    return 201, network, None
+
+
+@route('GET', r'/organizations/([^/]+)/configTemplates', 'configTemplates')
+def gettemplates(handler, mock, query, data, org):
+    return 200, list(mock.templates.values()), None
+
+
+@route('POST', r'/organization/([^/]+)/claim', 'claim')
+def postclaim(handler, mock, query, data, org):
+    serial = data.get('serial')
+    if not serial:
+        return 400, {'errors': ['Serial is required']}, None
+    if serial not in mock.devices:
+        mock.adddevice(serial)
+    return 200, None, None
+
+
+@route('GET', r'/networks/([^/]+)', 'network')
+def getnetwork(handler, mock, query, data, networkid):
+    network = mock.networks.get(networkid)
+    return (200, network, None) if network else notfound()
+
+
+@route('DELETE', r'/networks/([^/]+)', 'network')
+def deletenetwork(handler, mock, query, data, networkid):
+    if mock.networks.pop(networkid, None) is None:
+        return notfound()
+    for device in mock.devices.values():
+        if device['networkId'] == networkid:
+            device['networkId'] = None
+    return 204, None, None
+
+
+@route('POST', r'/networks/([^/]+)/bind', 'bind')
+def postbind(handler, mock, query, data, networkid):
+    network = mock.networks.get(networkid)
+    if network is None:
+        return notfound()
+    if data.get('configTemplateId') not in mock.templates:
+        return 400, {'errors': ['Invalid configTemplateId']}, None
+    network['configTemplateId'] = data['configTemplateId']
+    return 200, None, None
+
+
+@route('POST', r'/networks/([^/]+)/unbind', 'unbind')
+def postunbind(handler, mock, query, data, networkid):
+    network = mock.networks.get(networkid)
+    if network is None:
+        return notfound()
+    network.pop('configTemplateId', None)
+    return 200, None, None
+
+
+@route('GET', r'/networks/([^/]+)/devices', 'devices')
+def getdevices(handler, mock, query, data, networkid):
+    if networkid not in mock.networks:
+        return notfound()
+    records = [d for d in mock.devices.values() if d['networkId'] == networkid]
+    return handler.page(records, query, 'serial')
+
+
+@route('POST', r'/networks/([^/]+)/devices/claim', 'devices/claim')
+def postdeviceclaim(handler, mock, query, data, networkid):
+    device = mock.devices.get(data.get('serial'))
+    if networkid not in mock.networks or device is None:
+        return notfound()
+    if device['networkId'] not in (None, networkid):
+        return 400, {'errors': ['Device already claimed into another network']}, None
+    device['networkId'] = networkid
+    return 200, None, None
+
+
+@route('GET', r'/networks/([^/]+)/devices/([^/]+)', 'devices/serial')
+def getdevice(handler, mock, query, data, networkid, serial):
+    device = mock.devices.get(serial)
+    if device is None or device['networkId'] != networkid:
+        return notfound()
+    return 200, device, None
+
+
+@route('PUT', r'/networks/([^/]+)/devices/([^/]+)', 'devices/serial')
+def putdevice(handler, mock, query, data, networkid, serial):
+    device = mock.devices.get(serial)
+    if device is None or device['networkId'] != networkid:
+        return notfound()
+    for key in ('name', 'tags', 'lat', 'lng', 'address'):
+        if key in data:
+            device[key] = data[key]
+    return 200, device, None
+
+
+@route('POST', r'/networks/([^/]+)/devices/([^/]+)/remove', 'devices/serial/remove')
+def postdeviceremove(handler, mock, query, data, networkid, serial):
+    device = mock.devices.get(serial)
+    if device is None or device['networkId'] != networkid:
+        return notfound()
+    device['networkId'] = None
+    return 204, None, None
+
+
+@route('GET', r'/networks/([^/]+)/ssids', 'ssids')
+def getssids(handler, mock, query, data, networkid):
+    if networkid not in mock.networks:
+        return notfound()
+    return 200, [{'number': n, 'name': 'Unconfigured SSID {0}'.format(n + 1), 'enabled': False} for n in
+                 range(15)], None
+
+
+@route('GET', r'/networks/([^/]+)/vlans', 'vlans')
+def getvlans(handler, mock, query, data, networkid):
+    if networkid not in mock.networks:
+        return notfound()
+    return 200, [{'id': 1, 'networkId': networkid, 'name': 'Default', 'applianceIp': '192.168.128.1',
+                  'subnet': '192.168.128.0/24'}], None
+
+
+@route('GET', r'/devices/([^/]+)/switchPorts', 'switchPorts')
+def getswitchports(handler, mock, query, data, serial):
+    ports = mock.portsfor(serial)
+    return (200, list(ports.values()), None) if ports is not None else notfound()
+
+
+@route('GET', r'/devices/([^/]+)/switchPorts/(\d+)', 'switchPorts/number')
+def getswitchport(handler, mock, query, data, serial, number):
+    ports = mock.portsfor(serial)
+    if ports is None or int(number) not in ports:
+        return notfound()
+    return 200, ports[int(number)], None
+
+
+@route('PUT', r'/devices/([^/]+)/switchPorts/(\d+)', 'switchPorts/number')
+def putswitchport(handler, mock, query, data, serial, number):
+    ports = mock.portsfor(serial)
+    if ports is None or int(number) not in ports:
+        return notfound()
+    ports[int(number)].update(data)
+    return 200, ports[int(number)], None
+
+
+@route('GET', r'/devices/([^/]+)/clients', 'clients')
+def getclients(handler, mock, query, data, serial):
+    if serial not in mock.devices:
+        return notfound()
+    records = [{'id': 'k{0}'.format(c), 'mac': '22:33:44:55:66:{0:02x}'.format(c), 'description': None,
+                'usage': {'sent': 100 * c, 'recv': 200 * c}} for c in range(25)]
+    return handler.page(records, query, 'id')
+
+
+class MockServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, mock, host='127.0.0.1', port=0):
+        http.server.ThreadingHTTPServer.__init__(self, (host, port), Handler)
+        self.mock = mock
+
+    @property
+    def base_url(self):
+        return 'http://{0}:{1}/api/v0'.format(self.server_address[0], self.server_address[1])
+
+
+def start(mock=None, host='127.0.0.1', port=0):
+    #
+    # Serve a MockDashboard from a background thread and return the server, stop it with server.shutdown()
+    #
+    server = MockServer(mock if mock is not None else MockDashboard(), host, port)
+    thread = threading.Thread(target=server.serve_forever, name='mockdashboard')
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the Meraki Dashboard API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random extra latency up to this many seconds')
+    parser.add_argument('--ratelimit', type=float, default=None, help='requests per second per API key')
+    parser.add_argument('--errorrate', type=float, default=0.0, help='fraction of requests answered with 5xx')
+    parser.add_argument('--resetrate', type=float, default=0.0, help='fraction of connections dropped')
+    parser.add_argument('--networks', type=int, default=10)
+    parser.add_argument('--spares', type=int, default=20)
+    args = parser.parse_args()
+
+    mock = MockDashboard(args.latency, args.jitter, args.ratelimit, args.errorrate, args.resetrate)
+    mock.seed(networks=args.networks, spares=args.spares)
+    server = MockServer(mock, args.host, args.port)
+    print('Mock Dashboard serving {0} for organization {1}'.format(server.base_url, orgid))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
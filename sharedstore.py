@@ -0,0 +1,216 @@
+#
+# Title: Customer | Meraki Full-stack Deployment
+#
+#  Cross-process Dashboard cache, rate limit and job state in one SQLite database
+#
+# Overview
+# When the web app runs as several worker processes, each worker would otherwise keep its own response cache, its own
+# rate limit buckets and its own jobs. Caches then go stale independently and every worker spends the full Dashboard
+# budget. A SharedStore is a SQLite database in WAL mode that every worker on the host opens by path. Readers never
+# block the single writer, and each read-modify-write runs in one immediate transaction.
+#
+#   store = sharedstore.SharedStore('/var/tmp/meraki-shared.db')
+#   merakiapi.setclient(merakiapi.DashboardClient(cache=sharedstore.SharedResponseCache(store),
+#                                                 ratelimiter=sharedstore.SharedRateLimiter(store)))
+#
+
+import contextlib
+import json
+import sqlite3
+import threading
+import time
+
+import merakiapi
+
+
+class Database(object):
+    #
+    # A SQLite database in WAL mode with one connection per thread. The statements in schema are run on first open.
+    # timeout is how long a writer waits for the write lock held by another process before giving up.
+    #
+    schema = []
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self.local = threading.local()
+        with self.transaction() as db:
+            for statement in self.schema:
+                db.execute(statement)
+
+    def connect(self):
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self.local.db = db
+        return db
+
+    @contextlib.contextmanager
+    def transaction(self):
+        #
+        # Take the database write lock up front so concurrent read-modify-write cycles cannot interleave
+        #
+        db = self.connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def close(self):
+        db = getattr(self.local, 'db', None)
+        if db is not None:
+            db.close()
+            self.local.db = None
+
+
+class SharedStore(Database):
+    #
+    # Response cache, rate limit bucket and job tables shared by every worker process that opens the same path
+    #
+    schema = [
+        'CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, path TEXT NOT NULL, expires REAL NOT NULL, '
+        'status INTEGER NOT NULL, text TEXT NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS responsesexpires ON responses (expires)',
+        'CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, '
+        'queued INTEGER NOT NULL DEFAULT 0, waited REAL NOT NULL DEFAULT 0, lastwait REAL NOT NULL DEFAULT 0, '
+        'throttled INTEGER NOT NULL DEFAULT 0)',
+        'CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, created REAL NOT NULL, finished REAL, '
+        'version INTEGER NOT NULL, status TEXT NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS jobscreated ON jobs (created)'
+    ]
+
+    def savejob(self, status, version):
+        #
+        # Store a job's status() snapshot unless a newer one is already stored, version grows with every change
+        #
+        with self.transaction() as db:
+            db.execute('INSERT OR IGNORE INTO jobs (id, created, finished, version, status) VALUES (?, ?, ?, -1, ?)',
+                       (status['id'], status['created'], status['finished'], '{}'))
+            db.execute('UPDATE jobs SET finished = ?, version = ?, status = ? WHERE id = ? AND version < ?',
+                       (status['finished'], version, json.dumps(status), status['id'], version))
+
+    def loadjob(self, jobid):
+        row = self.connect().execute('SELECT status FROM jobs WHERE id = ?', (jobid,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def recentjobs(self, count=50):
+        rows = self.connect().execute('SELECT status FROM jobs ORDER BY created DESC LIMIT ?', (count,)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def prunejobs(self, keep):
+        #
+        # Drop the oldest finished jobs beyond the newest keep
+        #
+        with self.transaction() as db:
+            db.execute('DELETE FROM jobs WHERE finished IS NOT NULL AND id NOT IN '
+                       '(SELECT id FROM jobs ORDER BY created DESC LIMIT ?)', (keep,))
+
+
+class SharedResponseCache(object):
+    #
+    # Drop-in for merakiapi.ResponseCache backed by a SharedStore, so a response cached by one worker is served to all
+    # of them and a write through any worker invalidates the entry for every worker
+    #
+    def __init__(self, store, maxsize=4096, ttl=60):
+        self.store = store
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+    @staticmethod
+    def key(apikey, url):
+        return merakiapi.ResponseCache.key(apikey, url)
+
+    def get(self, apikey, url):
+        row = self.store.connect().execute('SELECT expires, status, text FROM responses WHERE key = ?',
+                                           (self.key(apikey, url),)).fetchone()
+        if row is None or row[0] < time.time():
+            return None
+        return merakiapi.DashboardResponse(row[1], row[2], {})
+
+    def set(self, apikey, url, response):
+        if response.status_code != 200:
+            return
+        with self.store.transaction() as db:
+            db.execute('INSERT OR REPLACE INTO responses (key, path, expires, status, text) VALUES (?, ?, ?, ?, ?)',
+                       (self.key(apikey, url), url.split('?', 1)[0].rstrip('/'), time.time() + self.ttl,
+                        response.status_code, response.text))
+            #
+            # Expired entries go first, then the ones closest to expiry once the cache is over maxsize
+            #
+            db.execute('DELETE FROM responses WHERE expires < ?', (time.time(),))
+            excess = db.execute('SELECT COUNT(*) FROM responses').fetchone()[0] - self.maxsize
+            if excess > 0:
+                db.execute('DELETE FROM responses WHERE key IN '
+                           '(SELECT key FROM responses ORDER BY expires LIMIT ?)', (excess,))
+
+    def invalidate(self, url):
+        #
+        # Same rule as ResponseCache: drop the written URL, its ancestors and its descendants
+        #
+        path = url.split('?', 1)[0].rstrip('/')
+        with self.store.transaction() as db:
+            db.execute('DELETE FROM responses WHERE path = ? '
+                       'OR substr(?, 1, length(path) + 1) = path || \'/\' '
+                       'OR substr(path, 1, ?) = ?',
+                       (path, path, len(path) + 1, path + '/'))
+
+    def clear(self):
+        with self.store.transaction() as db:
+            db.execute('DELETE FROM responses')
+
+    def close(self):
+        self.store.close()
+
+
+class SharedRateLimiter(merakiapi.RateLimiter):
+    #
+    # merakiapi.RateLimiter whose token buckets and counters live in a SharedStore, so all workers together stay within
+    # rate calls per second per organization. Buckets are timed with the wall clock, which every process shares.
+    #
+    def __init__(self, store, rate=5, burst=None):
+        super(SharedRateLimiter, self).__init__(rate, burst)
+        self.store = store
+
+    def __take(self, db, key, cost):
+        now = time.time()
+        db.execute('INSERT OR IGNORE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)', (key, self.burst, now))
+        tokens, updated = db.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+        tokens = min(self.burst, tokens + max(now - updated, 0.0) * self.rate) - cost
+        db.execute('UPDATE buckets SET tokens = ?, updated = ? WHERE key = ?', (tokens, now, key))
+        return tokens
+
+    def reserve(self, key):
+        with self.store.transaction() as db:
+            tokens = self.__take(db, key, 1)
+            wait = -tokens / self.rate if tokens < 0 else 0.0
+            db.execute('UPDATE buckets SET lastwait = ?, queued = queued + ?, waited = waited + ? WHERE key = ?',
+                       (wait, 1 if wait > 0 else 0, wait, key))
+            return wait
+
+    def release(self, key):
+        with self.store.transaction() as db:
+            db.execute('UPDATE buckets SET queued = queued - 1 WHERE key = ?', (key,))
+
+    def throttle(self, key, retryafter):
+        with self.store.transaction() as db:
+            tokens = self.__take(db, key, 0)
+            db.execute('UPDATE buckets SET tokens = ?, throttled = throttled + 1 WHERE key = ?',
+                       (min(tokens, 0.0) - retryafter * self.rate, key))
+
+    def stats(self, key=None):
+        db = self.store.connect()
+        if key is not None:
+            rows = db.execute('SELECT key, queued, waited, lastwait, throttled FROM buckets WHERE key = ?',
+                              (key,)).fetchall()
+        else:
+            rows = db.execute('SELECT key, queued, waited, lastwait, throttled FROM buckets').fetchall()
+        stats = dict((row[0], {'queued': row[1], 'waited': row[2], 'lastwait': row[3], 'throttled': row[4]})
+                     for row in rows)
+        if key is not None and key not in stats:
+            stats[key] = {'queued': 0, 'waited': 0.0, 'lastwait': 0.0, 'throttled': 0}
+        return stats